@@ -1,20 +1,42 @@
+import os
 import time
+import tempfile
 import threading
 import numpy as np
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 
-from speech_to_text import calibrate_silence, record_until_silence
-from sentiment import analyze_audio
-from google_sheets import ensure_headers, save_to_sheets
-from config import client as groq_client, sheet
-from config import SAMPLE_RATE, CHANNELS, SILENCE_LIMIT, sheet, client
+from speech_to_text import (calibrate_silence, record_until_silence, calibrate_channels,
+                            record_channels_until_silence)
+from sentiment import analyze_audio, analyze_channels, combine_channels, customer_turns, _to_mono_int16
+from audio_archive import get_archive
+from audio_buffer import RetainedAudio
+from jobs import get_executor, run_stage, CALL_SLO_S, DeadlineExceeded, DONE
+from crm import parse_products, crm_fingerprint, customer_view, SELECT_PLACEHOLDER
+from recommender import get_recommender
+from google_sheets import save_to_sheets, append_log_rows, HEADERS
+from live_sentiment import LiveSentiment, parse_timeline
+from call_log import CallQuery, matching_shard_rows, fetch_page
+from shards import get_router
+from sheet_cache import get_sheet_cache, start_prefetch, _months_back
+from export import ExportQuery, export, FORMATS
+from search_index import get_search_index, rebuild_from_sheets, highlight, index_summary
+from similar_calls import get_similar_calls, index_call as index_similar_call
+from google_sheets import CRM_SHEET_NAME, CRM_HEADERS, PRODUCT_PRICE_MAP
+from config import SAMPLE_RATE, CHANNELS, SILENCE_LIMIT, CAPTURE_SOURCE, get_sheet, get_groq_client
+from browser_capture import get_capture_server, capture_component, BROWSER_CONNECT_TIMEOUT_S
+import rerun_profile
 
 # ---------------- PAGE SETUP ----------------
 st.set_page_config(page_title="AI Speech Analysis Studio", page_icon="🎙️", layout="wide")
 
+# 🔬 Opt-in rerun profiling (PROFILE_RERUNS=1 or ?profile=1): sections are marked below
+rerun_profile.begin()
+rerun_profile.render_panel()
+
 # ---------------- CSS ----------------
+rerun_profile.mark("css")
 st.markdown(""" 
 <style>
 #MainMenu {visibility: hidden;}
@@ -42,10 +64,15 @@ div.block-container { padding-top: 2rem !important; }
 """, unsafe_allow_html=True)
 
 # ---------------- HEADER ----------------
+rerun_profile.mark("header")
 st.markdown('<div class="app-title">🎙️ AI Speech Analysis Studio</div>', unsafe_allow_html=True)
 st.markdown('<div class="app-subtitle">Real-time Speech-to-Text with Sentiment & Emotion Analysis</div>', unsafe_allow_html=True)
 
+# 🔥 Warm CRM / call log / Summaries in the background (once per server process)
+start_prefetch()
+
 # ---------------- TABS ----------------
+rerun_profile.mark("navigation")
 tab = st.session_state.get("tab", "Record")
 c1, c2, c3, c4, c5 = st.columns([1, 1, 1, 1, 1])
 with c1:
@@ -72,13 +99,86 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
+rerun_profile.set_tab(tab)
+rerun_profile.mark("definitions")
 # ---------------- Helpers ----------------
-def _background_capture(threshold, holder, stop_event):
-    audio_list, stop_reason = record_until_silence(threshold, stop_event=stop_event)
+def _background_capture(threshold, holder, stop_event, on_chunk=None):
+    if CHANNELS > 1:
+        audio_list, holder["channel_reasons"], stop_reason = record_channels_until_silence(
+            threshold, stop_event=stop_event, on_chunk=on_chunk)
+    else:
+        audio_list, stop_reason = record_until_silence(threshold, stop_event=stop_event, on_chunk=on_chunk)
     holder["audio_list"] = audio_list
     holder["stop_reason"] = stop_reason
     holder["done"] = True
 
+BROWSER_CAPTURE = CAPTURE_SOURCE == "browser"
+
+def browser_stream():
+    """This session's BrowserStream (its token is the socket path the page dials); the
+    server holds it weakly, so it is released with the session. Reopened if it expired."""
+    stream = st.session_state.get("capture_stream")
+    if stream is None or stream.closed:
+        st.session_state["capture_stream"] = get_capture_server().open_stream()
+    return st.session_state["capture_stream"]
+
+def _browser_capture(stream, holder, stop_event, live):
+    """Browser mode: wait for the page's microphone, calibrate on its audio, then record as usual."""
+    stream.on_disconnect.append(stop_event.set)  # closing the tab ends the call
+    deadline = time.time() + BROWSER_CONNECT_TIMEOUT_S
+    while not stream.wait_connected(0.25):
+        if stop_event.is_set() or time.time() > deadline:
+            holder["stop_reason"] = "Browser microphone not connected"
+            holder["done"] = True
+            return
+    holder["phase"] = "calibrating"
+    thr = calibrate_silence(read_chunk=stream.read_chunk)
+    live.threshold = thr
+    holder["phase"] = "recording"
+    audio_list, stop_reason = record_until_silence(thr, stop_event=stop_event, read_chunk=stream.read_chunk,
+                                                   on_chunk=live.feed)
+    holder["audio_list"] = audio_list
+    holder["stop_reason"] = stop_reason
+    holder["done"] = True
+
+@st.fragment(run_every=1)
+def recording_timer():
+    """Tick the recording timer without re-running the whole script; full rerun once capture ends."""
+    t = st.session_state.get("rec_thread")
+    if t is None or not t.is_alive():
+        st.rerun()  # capture finished → let the full script pick up the audio
+    elapsed = int(time.time() - (st.session_state.get("rec_start_ts") or time.time()))
+    st.markdown(f"**⏱️ Recording:** {elapsed:02d} sec")
+    phase = (st.session_state.get("rec_holder") or {}).get("phase")
+    st.caption({"connecting": "🌐 Waiting for this browser's microphone…",
+                "calibrating": "🤫 Calibrating… stay quiet for 3s."}.get(
+                    phase, "🎙️ Listening… stops automatically after silence."))
+    live = st.session_state.get("live")
+    if live is not None and live.latest():
+        t, _, sentiment, emotion = live.latest()
+        st.markdown(f"**📈 Live:** {sentiment} · {emotion} (at {t:.0f}s)")
+        timeline_chart(live.series())
+
+def timeline_chart(points, height=160):
+    """Sentiment score (−1 negative … +1 positive) over call time."""
+    if not points:
+        return
+    df = pd.DataFrame([p[:2] for p in points], columns=["Seconds", "Sentiment score"]).set_index("Seconds")
+    st.line_chart(df, height=height)
+
+def similar_calls_panel(text, exclude_phone="", k=5):
+    """Top-k most similar past calls (other customers) and how they resolved."""
+    hits = get_similar_calls().search(text or "", k=k, exclude_phone=exclude_phone)
+    with st.expander(f"🧭 Similar past calls ({len(hits)})", expanded=False):
+        if not hits:
+            st.caption("No similar calls indexed yet.")
+        for h in hits:
+            st.markdown(f"**{h['timestamp']}** · {h['phone'] or '—'} · {h['sentiment'] or 'N/A'} · "
+                        f"similarity {h['score']:.2f}  \n"
+                        f"📝 {h['summary'] or '—'}  \n"
+                        f"🎯 {h['action_items'] or '—'}  \n"
+                        f"🧩 {h['products'] or 'NA'}")
+
 def refresh_animation(flag_key="_do_refresh"):
     if st.session_state.get(flag_key):
         with st.status("Refreshing data…", expanded=False) as s:
@@ -110,35 +210,6 @@ def _clear_last_analysis():
     st.session_state["sentiment"] = "—"
     st.session_state["emotion"] = "—"
 
-# ==== CRM CONFIG ====
-CRM_SHEET_NAME = "CRM"
-SUMMARIES_SHEET_NAME = "Summaries"
-
-CRM_HEADERS = [
-    "CustomerName", "Company", "Industry",
-    "Budget", "InterestLevel", "Email", "Phone","RecommendedProducts"
-]
-
-SUMMARIES_HEADERS = [
-    "Timestamp", "CustomerPhone",
-    "Summary", "ActionItems", "Sentiment", "Emotion",
-    "RecommendedProducts", "ProductPrice", "PurchaseDate"
-]
-
-PRODUCT_PRICE_MAP = {
-    "CRM Suite": 12000,
-    "Analytics Dashboard": 8000,
-    "POS System": 7000,
-    "Loyalty App": 4000,
-    "Telehealth Platform": 15000,
-    "Patient CRM": 9000,
-    "LMS Platform": 10000,
-    "Online Classrooms": 6000,
-    "ERP Suite": 20000,
-    "Predictive Maintenance": 12000,
-    "IoT Sensors": 5000,
-    "Yield Prediction AI": 7000
-}
 # ---- LLM Summary generator (safe, JSON-only) ----
 def generate_llm_summary(transcript: str, customer: dict, sentiment: str, emotion: str) -> tuple[str, str]:
     """Return (summary, action_items_str). If transcript is empty, return a silent-call message."""
@@ -165,12 +236,13 @@ def generate_llm_summary(transcript: str, customer: dict, sentiment: str, emotio
     )
 
     try:
-        resp = client.chat.completions.create(
+        resp = run_stage("summary", "groq", lambda timeout: get_groq_client().chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[{"role": "system", "content": sys},
                       {"role": "user", "content": user}],
             temperature=0.2,
-        )
+            timeout=timeout,
+        ))
         content = (resp.choices[0].message.content or "").strip()
         import json, re as _re
         data = {}
@@ -187,6 +259,8 @@ def generate_llm_summary(transcript: str, customer: dict, sentiment: str, emotio
             items = [str(items)]
         ai = "; ".join([str(x).strip() for x in items if str(x).strip()])[:400]
         return (summary, ai)
+    except DeadlineExceeded:
+        return ("Summary timed out; transcript saved without a summary.", "")
     except Exception as e:
         return (f"Summary error: {e}", "")
 
@@ -198,17 +272,20 @@ def save_summary_row(timestamp: str,
                      action_items: str,
                      sentiment: str,
                      emotion: str,
-                     ranked_products: list):
+                     ranked_products: list,
+                     no_speech: bool = None,
+                     transcript: str = ""):
     """
     Writes one row to the Summaries sheet. If no speech was detected, writes a clean
     fallback row with NAs and no product recommendations.
+    Pass `no_speech` explicitly when calling outside the script thread (post-call jobs).
+    `transcript` (optional) is only used for the similar-calls index.
     """
-    ws = ensure_summaries_ready()
-
     # Determine if the call had speech using your existing stop_reason + transcript
-    stop_reason = (st.session_state.get("stop_reason", "") or "").lower()
-    transcript_txt = (st.session_state.get("transcript", "") or "").strip()
-    no_speech = (not transcript_txt) or ("no speech" in stop_reason) or stop_reason.startswith("silent")
+    if no_speech is None:
+        stop_reason = (st.session_state.get("stop_reason", "") or "").lower()
+        transcript_txt = (st.session_state.get("transcript", "") or "").strip()
+        no_speech = (not transcript_txt) or ("no speech" in stop_reason) or stop_reason.startswith("silent")
 
     if no_speech:
         # Fallback (no recommendations saved)
@@ -247,13 +324,25 @@ def save_summary_row(timestamp: str,
             datetime.today().strftime("%Y-%m-%d"),
         ]
 
-    ws.append_row(row)
+    append_log_rows("summaries", [row])  # this month's Summaries shard
+    index_summary(row[0], row[1], row[2], row[3])
+    if not no_speech:
+        index_similar_call(row[0], row[1], transcript, row[2], row[3], row[4], row[6])
+
+    # 🎯 Fold the purchase into the recommender (counts update in place, no rebuild)
+    if not no_speech and ranked_products:
+        try:
+            reco = get_recommender()
+            reco.observe((customer or {}).get("Phone", "NA"), (customer or {}).get("Industry", ""), ranked_products)
+            reco.schedule_save()
+        except Exception:
+            pass
 
 
 
 # ---- Sheet Helpers ----
 def _get_ws(title: str):
-    ss = sheet.spreadsheet
+    ss = get_sheet().spreadsheet
     try: return ss.worksheet(title)
     except Exception: return ss.add_worksheet(title=title, rows=1000, cols=20)
 
@@ -268,52 +357,29 @@ def _ensure_ws_headers(ws, headers):
 def ensure_crm_ready():
     ws = _get_ws(CRM_SHEET_NAME); _ensure_ws_headers(ws, CRM_HEADERS); return ws
 
-def ensure_summaries_ready():
-    ws = _get_ws(SUMMARIES_SHEET_NAME); _ensure_ws_headers(ws, SUMMARIES_HEADERS); return ws
-
 @st.cache_data(ttl=300)
 def load_crm_df() -> pd.DataFrame:
-    ws = ensure_crm_ready()
-    values = ws.get_all_values()
+    cache = get_sheet_cache()
+    try: values = cache.values(CRM_SHEET_NAME)
+    except Exception: values = []  # CRM worksheet doesn't exist yet
+    if not values or values[0] != CRM_HEADERS:
+        ensure_crm_ready(); cache.invalidate(CRM_SHEET_NAME)
+        values = cache.values(CRM_SHEET_NAME)
     if not values or len(values) < 2: return pd.DataFrame(columns=CRM_HEADERS)
     df = pd.DataFrame(values[1:], columns=values[0])
     if "Budget" in df.columns: df["Budget"] = pd.to_numeric(df["Budget"], errors="coerce")
+    df.attrs["fingerprint"] = crm_fingerprint(df)  # lets customer_view() reuse its precomputed picker
     return df
 
-def get_customer_options(df: pd.DataFrame):
-    labels, id_map = [], {}
-    for _, row in df.iterrows():
-        name, company, email = row.get("CustomerName",""), row.get("Company",""), row.get("Email","")
-        label = f"{name} — {company}" if company else name
-        labels.append(label); id_map[label] = email
-    return labels, id_map
-
-def get_customer_by_email(df: pd.DataFrame, email: str) -> dict:
-    if not email: return {}
-    hit = df.loc[df["Email"] == email]
-    if hit.empty: return {}
-    return hit.iloc[0].to_dict()
-
-def parse_products(cell: str):
-    if not cell: return []
-    parts = [p.strip() for p in str(cell).split(",") if p.strip()]
-    seen, out = set(), []
-    for p in parts:
-        low = p.lower()
-        if low not in seen: out.append(p); seen.add(low)
-    return out
+@st.cache_data(ttl=60)
+def load_history_rows(query: CallQuery):
+    """Matching (shard, row) refs for the History filters (cached per query)."""
+    return matching_shard_rows(get_router(), query)
+
+@st.cache_data(ttl=60)
+def load_history_page(query: CallQuery, cursor: int, page_size: int):
+    return fetch_page(get_router(), query, cursor, page_size, row_numbers=load_history_rows(query))
 
-def rank_products(products, sentiment: str):
-    if not isinstance(sentiment, str) or not products: return []
-    s = sentiment.strip().lower()
-    if "neg" in s:
-        soft, hard = [], []
-        for p in products:
-            pl = p.lower()
-            if any(k in pl for k in ["trial", "demo", "lite", "basic"]): soft.append(p)
-            else: hard.append(p)
-        return soft + hard if soft else products
-    return products
 def generate_llm_summary(transcript: str, customer: dict, sentiment: str, emotion: str) -> tuple[str, str]:
     """Return (summary, action_items_str). If transcript is empty, return a silent-call message."""
     if not isinstance(transcript, str) or not transcript.strip():
@@ -339,12 +405,13 @@ def generate_llm_summary(transcript: str, customer: dict, sentiment: str, emotio
     )
 
     try:
-        resp = client.chat.completions.create(
+        resp = run_stage("summary", "groq", lambda timeout: get_groq_client().chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[{"role": "system", "content": sys},
                       {"role": "user", "content": user}],
             temperature=0.2,
-        )
+            timeout=timeout,
+        ))
         content = (resp.choices[0].message.content or "").strip()
         import json, re as _re
         data = {}
@@ -361,6 +428,8 @@ def generate_llm_summary(transcript: str, customer: dict, sentiment: str, emotio
             items = [str(items)]
         ai = "; ".join([str(x) for x in items if str(x).strip()])[:400]
         return (summary, ai)
+    except DeadlineExceeded:
+        return ("Summary timed out; transcript saved without a summary.", "")
     except Exception as e:
         return (f"Summary error: {e}", "")
 
@@ -387,8 +456,64 @@ def generate_objection_prompts(sentiment: str) -> list:
             "Can I connect you with our support team for onboarding?"
         ]
 
+# ---- Post-call jobs (run on the shared executor, never touch st.session_state) ----
+def _analysis_job(recording: RetainedAudio, stop_reason: str, customer: dict, channel_reasons=None,
+                  crm_products=()) -> dict:
+    audio = recording.array()  # float32 exists only while this job runs
+    channels = {}
+    if channel_reasons:
+        # one line/speaker per channel, analyzed in parallel; headline = customer channel
+        per_channel = analyze_channels(audio, channel_reasons)
+        channels = {label: {"Transcript": t, "Sentiment": s, "Emotion": e}
+                    for label, (t, s, e) in per_channel.items()}
+        transcript, sentiment_label, emotion_label = combine_channels(per_channel)
+    else:
+        transcript, sentiment_label, emotion_label = analyze_audio(audio, stop_reason)
+
+    # Detect if speech happened
+    sr = (stop_reason or "").lower()
+    call_had_speech = bool(transcript and transcript.strip()) and not (
+        "no speech" in sr or sr.startswith("silent")
+    )
+
+    # compute recommendations only when speech detected & customer selected
+    ranked = []
+    if call_had_speech and customer:
+        k = max(3, len(crm_products))
+        ranked = get_recommender().recommend(customer, sentiment_label, k=k, crm_products=list(crm_products))
+
+    return {"transcript": transcript, "sentiment": sentiment_label, "emotion": emotion_label,
+            "call_had_speech": call_had_speech, "ranked_products": ranked, "channels": channels}
+
+def _save_job(ts, transcript, sentiment, emotion, stop_reason, customer,
+              call_had_speech, ranked, save_summary, timeline="") -> dict:
+    save_to_sheets(ts, transcript, sentiment, emotion, stop_reason, timeline, (customer or {}).get("Phone", ""))
+    out = {"summary_saved": False, "summary_error": ""}
+    if save_summary:
+        if call_had_speech:
+            # summarise the customer's turns only (whole transcript if it isn't speaker-labelled)
+            summary, action_items = generate_llm_summary(customer_turns(transcript).strip(), customer, sentiment, emotion)
+        else:
+            summary, action_items = ("User was not speaking. No recommendations available.", "")
+        try:
+            save_summary_row(ts, customer, summary, action_items, sentiment, emotion, ranked,
+                             no_speech=not call_had_speech, transcript=transcript)
+            out["summary_saved"] = True
+        except Exception as e:
+            out["summary_error"] = str(e)
+    return out
+
+@st.fragment(run_every=1)
+def job_poller(state_key: str, label: str):
+    """Poll a post-call job from the fragment; full rerun once it finishes."""
+    job = get_executor().get(st.session_state.get(state_key))
+    if job is None or job.is_finished:
+        st.rerun()
+    st.caption(f"⏳ {label} ({job.status})…")
+
 # ---------------- RECORD TAB ----------------
 if tab == "Record":
+    rerun_profile.mark("layout")
     left, right = st.columns(2)
 
     # --- Left: Recorder + CRM ---
@@ -397,28 +522,35 @@ if tab == "Record":
         st.subheader("Voice Recorder")
         st.caption("Toggle Start/Stop. Stops automatically on silence, too.")
         st.write(f"**Sample Rate:** {SAMPLE_RATE/1000:.0f} kHz | **Channels:** {'Mono' if CHANNELS==1 else CHANNELS} | **Silence Limit:** {SILENCE_LIMIT}s")
+        if BROWSER_CAPTURE:
+            if CHANNELS > 1:
+                st.warning("Browser capture is mono; set AUDIO_CHANNELS=1.")
+            st.caption(f"🌐 Microphone: this browser. Test client: `python browser_capture.py --url "
+                       f"ws://<host>:{get_capture_server().port}/capture/{browser_stream().token}`")
         st.divider()
 
         # ==== CRM: Customer picker + Profile ====
+        rerun_profile.mark("load_crm_df")
+        selected_customer = {}
         crm_df = load_crm_df()
         if crm_df.empty:
             st.info("Add some rows to the **CRM** sheet to enable real-time profile & recommendations.")
         else:
-            labels, id_map = get_customer_options(crm_df)
-            st.session_state["_id_map_cache"] = id_map
+            rerun_profile.mark("customer picker")
+            view = customer_view(crm_df)
             current_label = st.session_state.get("selected_customer_label")
             selected_label = st.selectbox(
                 "Select customer",
-                options=["— Select —"] + labels,
-                index=(["— Select —"] + labels).index(current_label) if current_label in (["— Select —"] + labels) else 0,
+                options=view.options,
+                index=view.index_of(current_label),
                 help="Pick a customer to view profile and recommended products instantly."
             )
             st.session_state["selected_customer_label"] = selected_label
 
             selected_customer = {}
-            if selected_label and selected_label != "— Select —":
-                email_key = id_map.get(selected_label, "")
-                selected_customer = get_customer_by_email(crm_df, email_key)
+            if selected_label and selected_label != SELECT_PLACEHOLDER:
+                email_key = view.id_map.get(selected_label, "")
+                selected_customer = view.customer(email_key)
 
             if selected_customer:
                 with st.expander("👤 Customer Profile", expanded=True):
@@ -443,6 +575,7 @@ if tab == "Record":
                         st.caption("_Recommendations will appear after a call with detected speech._")
 
         # ==== Recording state ====
+        rerun_profile.mark("recorder")
         st.session_state.setdefault("rec_thread", None)
         st.session_state.setdefault("rec_holder", {})
         st.session_state.setdefault("rec_stop", None)
@@ -455,20 +588,37 @@ if tab == "Record":
 
         if toggled:
             if not st.session_state.is_recording:
-                # reset old results
-                for k in ("audio","transcript","sentiment","emotion","stop_reason",
-                          "timestamp","ranked_products","call_had_speech"):
+                # reset old results (and drop any analysis still running for the previous call)
+                get_executor().cancel(st.session_state.pop("analysis_job", None))
+                for k in ("audio","audio_digest","transcript","sentiment","emotion","stop_reason",
+                          "timestamp","ranked_products","call_had_speech","channels","channel_reasons",
+                          "live","timeline"):
                     st.session_state.pop(k, None)
                 st.session_state["transcript"] = None
 
-                with st.status("Calibrating baseline noise…", expanded=True) as s:
-                    thr = calibrate_silence()
-                    s.write(f"Calibrated threshold = {thr:.6f}")
-                    s.update(label="Listening… Speak now.")
-
                 holder = {"done": False}
                 stop_event = threading.Event()
-                t = threading.Thread(target=_background_capture, args=(thr, holder, stop_event), daemon=True)
+                if BROWSER_CAPTURE:
+                    # 🌐 calibration runs in the capture thread once the page's microphone connects
+                    stream = browser_stream()
+                    stream.reset()
+                    holder["phase"] = "connecting"
+                    live = LiveSentiment()
+                    t = threading.Thread(target=_browser_capture, args=(stream, holder, stop_event, live),
+                                         daemon=True)
+                else:
+                    with st.status("Calibrating baseline noise…", expanded=True) as s:
+                        if CHANNELS > 1:
+                            thr = calibrate_channels()
+                            s.write("Calibrated thresholds = " + ", ".join(f"{v:.6f}" for v in thr))
+                        else:
+                            thr = calibrate_silence()
+                            s.write(f"Calibrated threshold = {thr:.6f}")
+                        s.update(label="Listening… Speak now.")
+                    live = LiveSentiment(thr)  # rolling-window sentiment while the call is running
+                    t = threading.Thread(target=_background_capture, args=(thr, holder, stop_event, live.feed),
+                                         daemon=True)
+                st.session_state["live"] = live
                 t.start()
 
                 st.session_state.rec_holder = holder
@@ -480,29 +630,45 @@ if tab == "Record":
                 if st.session_state.rec_stop is not None:
                     st.session_state.rec_stop.set()
 
-        # Timer while recording
+        # Timer while recording (fragment-scoped: only the timer re-runs each second)
         if st.session_state.is_recording and st.session_state.rec_thread and st.session_state.rec_thread.is_alive():
-            elapsed = int(time.time() - (st.session_state.rec_start_ts or time.time()))
-            st.markdown(f"**⏱️ Recording:** {elapsed:02d} sec")
-            time.sleep(1)
-            st.rerun()
+            if BROWSER_CAPTURE:
+                capture_component(browser_stream())  # streams the mic until the next full rerun removes it
+            recording_timer()
 
         # After recording stops
         if st.session_state.rec_thread is not None and not st.session_state.rec_thread.is_alive():
             holder = st.session_state.rec_holder or {}
             if holder.get("done") and "audio" not in st.session_state:
-                audio_list = holder.get("audio_list") or []
+                audio_list = holder.get("audio_list")
                 stop_reason = holder.get("stop_reason", "")
                 st.session_state["stop_reason"] = stop_reason
+                st.session_state["channel_reasons"] = holder.get("channel_reasons")
+                live = st.session_state.pop("live", None)
+                if live is not None:
+                    live.close(timeout=2.0)
+                    st.session_state["timeline"] = live.to_json()
 
-                if stop_reason.lower().startswith("silent") and len(audio_list) > SILENCE_LIMIT:
-                    audio_list = audio_list[:len(audio_list)-SILENCE_LIMIT]
+                if audio_list and stop_reason.lower().startswith(("silent", "call ended")) and len(audio_list) > SILENCE_LIMIT:
+                    audio_list.drop_last(SILENCE_LIMIT)
 
                 if audio_list:
-                    merged = np.concatenate(audio_list, axis=0)
-                    st.session_state["audio"] = merged
+                    # RAM array, or a memory-mapped spill file for calls past the memory budget
+                    merged = audio_list.array()
                     st.session_state["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
                     st.toast(f"Captured {merged.shape[0]/SAMPLE_RATE:.1f} sec", icon="🎧")
+                    # 🗄️ Keep a compressed copy for later playback / re-analysis
+                    try:
+                        st.session_state["audio_digest"] = get_archive().put(
+                            _to_mono_int16(merged),
+                            st.session_state["timestamp"],
+                            (selected_customer or {}).get("Phone", ""),
+                        )
+                    except Exception as e:
+                        st.warning(f"Audio archive skipped: {e}")
+                    # session state keeps int16 only until analysis has read it (LRU-spilled if idle)
+                    st.session_state["audio"] = RetainedAudio(merged, st.session_state.get("audio_digest", ""))
+                    del merged
                 else:
                     st.warning("No audio captured.")
 
@@ -514,35 +680,51 @@ if tab == "Record":
             st.session_state.is_recording = False
             st.rerun()
 
-        # Auto-analyze
+        # Auto-analyze on the shared post-call executor (the tab returns immediately)
+        rerun_profile.mark("post-call jobs")
+        executor = get_executor()
+        if "audio" in st.session_state:
+            st.session_state["audio"].touch()  # this session is active; idle ones are evicted first
         if "audio" in st.session_state and st.session_state.get("transcript") is None:
-            with st.spinner("Analyzing…"):
-                transcript, sentiment_label, emotion_label = analyze_audio(
+            job = executor.get(st.session_state.get("analysis_job"))
+            if job is None:
+                st.session_state["analysis_job"] = executor.submit(
+                    _analysis_job,
                     st.session_state["audio"],
-                    st.session_state.get("stop_reason","")
+                    st.session_state.get("stop_reason",""),
+                    selected_customer,
+                    st.session_state.get("channel_reasons"),
+                    customer_view(crm_df).products((selected_customer or {}).get("Email", "")),
+                    name="analyze",
+                    deadline_s=CALL_SLO_S,
                 )
-            st.session_state["transcript"] = transcript
-            st.session_state["sentiment"] = sentiment_label
-            st.session_state["emotion"] = emotion_label
-
-            # Detect if speech happened
-            stop_reason = (st.session_state.get("stop_reason","") or "").lower()
-            call_had_speech = bool(transcript and transcript.strip()) and not (
-                "no speech" in stop_reason or stop_reason.startswith("silent")
-            )
-            st.session_state["call_had_speech"] = call_had_speech
+                job = executor.get(st.session_state["analysis_job"])
 
-            # compute recommendations only when speech detected & customer selected
-            if call_had_speech and selected_customer:
-                base_products = parse_products(selected_customer.get("RecommendedProducts",""))
-                ranked = rank_products(base_products, sentiment_label)
-                st.session_state["ranked_products"] = ranked
+            if job.is_finished:
+                st.session_state.pop("analysis_job", None)
+                st.session_state["audio"].release()  # the archive keeps the playback copy
+                if job.status == DONE:
+                    st.session_state.update(job.result)
+                else:
+                    st.session_state["transcript"] = f"[Analysis {job.status}: {job.error or 'no result'}]"
+                    st.session_state["call_had_speech"] = False
+                    st.session_state["ranked_products"] = []
             else:
-                st.session_state["ranked_products"] = []
+                job_poller("analysis_job", "Analyzing")
+
+        if "audio" in st.session_state and not st.session_state.is_recording:
+            if st.button("🗑️ Discard call", use_container_width=True):
+                executor.cancel(st.session_state.pop("analysis_job", None))
+                executor.cancel(st.session_state.pop("save_job", None))
+                _clear_last_analysis()
+                for k in ("audio_digest", "ranked_products", "call_had_speech"):
+                    st.session_state.pop(k, None)
+                st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
     # --- Right: Results ---
+    rerun_profile.mark("results cards")
     with right:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("Analysis Results")
@@ -570,6 +752,21 @@ if tab == "Record":
             emo = st.session_state.get("emotion","—")
             st.markdown(f'<span class="badge emo">{emo}</span>', unsafe_allow_html=True)
 
+        if "Timeout" in (st.session_state.get("sentiment"), st.session_state.get("emotion")):
+            st.info(f"Part of the analysis missed its {CALL_SLO_S:.0f}s budget; showing what finished in time.")
+
+        # 🎚️ Per-line results (multi-channel capture)
+        if st.session_state.get("channels"):
+            st.markdown("**Per-channel results**")
+            st.dataframe(pd.DataFrame.from_dict(st.session_state["channels"], orient="index"),
+                         use_container_width=True)
+
+        # 📈 Live sentiment series captured during the call (saved in the Timeline column)
+        timeline = parse_timeline(st.session_state.get("timeline", ""))
+        if timeline:
+            st.markdown("**Sentiment Timeline**")
+            timeline_chart(timeline)
+
         # Suggested prompts
         st.markdown("**Suggested Objection Handling Prompts**")
         prompts = generate_objection_prompts(st.session_state.get("sentiment",""))
@@ -579,38 +776,46 @@ if tab == "Record":
         else:
             st.write("No suggestions available.")
 
+        if st.session_state.get("call_had_speech") and transcript_text:
+            similar_calls_panel(transcript_text, exclude_phone=selected_customer.get("Phone", ""))
+
         # Save to Sheets
         save_summary_too = st.checkbox("Also save post-call summary to 'Summaries'", value=True)
-        if st.button("💾 Save to Google Sheets", use_container_width=True):
+        if st.button("💾 Save to Google Sheets", use_container_width=True,
+                     disabled=st.session_state.get("save_job") is not None):
             ts = st.session_state.get("timestamp", time.strftime("%Y-%m-%d %H:%M:%S"))
-            try:
-                ensure_headers()
-                save_to_sheets(
-                    ts,
-                    st.session_state.get("transcript",""),
-                    st.session_state.get("sentiment",""),
-                    st.session_state.get("emotion",""),
-                    st.session_state.get("stop_reason","")
-                )
-                st.success("Saved to Google Sheets.")
-
-                if save_summary_too:
-                    transcript_val = st.session_state.get("transcript","").strip()
-                    sentiment_val = st.session_state.get("sentiment","")
-                    emotion_val = st.session_state.get("emotion","")
-
-                    if st.session_state.get("call_had_speech"):
-                        summary, action_items = generate_llm_summary(transcript_val, selected_customer, sentiment_val, emotion_val)
-                    else:
-                        summary, action_items = ("User was not speaking. No recommendations available.", "")
+            st.session_state["save_job"] = get_executor().submit(
+                _save_job,
+                ts,
+                st.session_state.get("transcript","") or "",
+                st.session_state.get("sentiment",""),
+                st.session_state.get("emotion",""),
+                st.session_state.get("stop_reason",""),
+                selected_customer,
+                bool(st.session_state.get("call_had_speech")),
+                st.session_state.get("ranked_products", []),
+                save_summary_too,
+                st.session_state.get("timeline", "") or "",
+                name="save",
+                deadline_s=CALL_SLO_S,
+            )
 
-                    try:
-                        save_summary_row(ts, selected_customer, summary, action_items, sentiment_val, emotion_val, st.session_state.get("ranked_products", []))
+        save_job = get_executor().get(st.session_state.get("save_job"))
+        if save_job is not None:
+            if not save_job.is_finished:
+                job_poller("save_job", "Saving to Google Sheets")
+            else:
+                st.session_state.pop("save_job", None)
+                if save_job.status == DONE:
+                    st.success("Saved to Google Sheets.")
+                    load_history_rows.clear()
+                    load_history_page.clear()
+                    if save_job.result.get("summary_saved"):
                         st.toast("Summary saved to 'Summaries' ✅", icon="📝")
-                    except Exception as e:
-                        st.warning(f"Summary save skipped: {e}")
-            except Exception as e:
-                st.error(f"Save failed: {e}")
+                    elif save_job.result.get("summary_error"):
+                        st.warning(f"Summary save skipped: {save_job.result['summary_error']}")
+                else:
+                    st.error(f"Save failed: {save_job.error or save_job.status}")
 
         stop_reason = st.session_state.get("stop_reason","")
         if stop_reason:
@@ -620,6 +825,7 @@ if tab == "Record":
 
 # ---------------- HISTORY TAB ----------------
 if tab == "History":
+    rerun_profile.mark("layout")
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("📜 Call History")
     st.caption("All saved calls with transcripts, sentiment, and emotion.")
@@ -633,6 +839,9 @@ if tab == "History":
     # Small refresh animation
     if st.session_state.get("_refresh_history"):
         with st.status("Refreshing call history…", expanded=False) as s:
+            get_sheet_cache().refresh()  # pick up shards and rows written by other processes
+            load_history_rows.clear()
+            load_history_page.clear()
             for dots in ["", ".", "..", "..."]:
                 s.update(label=f"Updating{dots}")
                 time.sleep(0.3)
@@ -640,19 +849,77 @@ if tab == "History":
         st.session_state["_refresh_history"] = False
         st.rerun()
 
-    try:
-        # Pull all values from main sheet
-        values = sheet.get_all_values()
-        headers = values[0] if values else []
-        rows = values[1:] if values and len(values) > 1 else []
+    # 🔎 Full-text search (local inverted index over transcripts, summaries and action items)
+    rerun_profile.mark("search")
+    def _open_customer(phone):
+        st.session_state["tab"] = "Agent Summary"
+        st.session_state["agent_phone"] = phone
+
+    with st.expander("🔎 Search transcripts & summaries", expanded=bool(st.session_state.get("search_query"))):
+        index = get_search_index()
+        q = st.text_input('Keywords or "exact phrase"', key="search_query",
+                          placeholder='pricing "response time"')
+        if not len(index):
+            st.caption("The search index is empty.")
+            if st.button("Index existing calls", key="search_rebuild"):
+                bar = st.progress(0.0, text="Indexing…")
+                n = rebuild_from_sheets(index, progress=lambda d, t: bar.progress(min(d / max(t, 1), 1.0),
+                                                                                  text=f"Indexing… {d:,}/{t:,}"))
+                st.success(f"✅ Indexed {n:,} calls and summaries.")
+        if q.strip():
+            t0 = time.perf_counter()
+            hits = index.search(q, limit=25)
+            st.caption(f"{len(hits)} result(s) in {(time.perf_counter() - t0) * 1000:.0f} ms "
+                       f"across {len(index):,} documents")
+            for i, h in enumerate(hits):
+                r1, r2 = st.columns([6, 1])
+                with r1:
+                    st.markdown(f"**{h['timestamp']}** · {h['kind']} · {h['phone'] or '—'}  \n"
+                                f"{highlight(h['snippet'], q)}")
+                with r2:
+                    if h["phone"]:
+                        st.button("Open customer", key=f"search_open_{i}", on_click=_open_customer,
+                                  args=(h["phone"],))
+
+    # 🔍 Filters + column projection (evaluated server-side, only the visible page is fetched)
+    rerun_profile.mark("filters")
+    f1, f2, f3, f4 = st.columns([2, 2, 2, 3])
+    with f1:
+        date_range = st.date_input("Date range", value=(), key="history_dates")
+    with f2:
+        sent_filter = st.multiselect("Sentiment", ["Positive", "Negative", "Neutral"], key="history_sent")
+    with f3:
+        emo_filter = st.multiselect("Emotion", ["Joy", "Sadness", "Anger", "Fear", "Surprise"], key="history_emo")
+    with f4:
+        text_filter = st.text_input("Transcript contains", key="history_text")
+    g1, g2 = st.columns([4, 1])
+    with g1:
+        show_cols = st.multiselect("Columns", HEADERS, default=[h for h in HEADERS if h != "Timeline"],
+                                   key="history_cols")
+    with g2:
+        page_size = st.selectbox("Rows / page", [25, 50, 100, 200], index=1, key="history_page_size")
+
+    dates = list(date_range) if isinstance(date_range, (list, tuple)) else [date_range]
+    query = CallQuery(
+        start=str(dates[0]) if len(dates) >= 1 and dates[0] else None,
+        end=str(dates[1]) if len(dates) >= 2 and dates[1] else None,
+        sentiments=tuple(sent_filter),
+        emotions=tuple(emo_filter),
+        text=text_filter or "",
+        columns=tuple(show_cols) or tuple(HEADERS),
+    )
+    # reset to the first page whenever the filters change
+    if st.session_state.get("history_query") != query:
+        st.session_state["history_query"] = query
+        st.session_state["history_cursor"] = 0
 
-        if rows:
-            import pandas as pd
-            df = pd.DataFrame(rows, columns=headers)
+    try:
+        rerun_profile.mark("history page")
+        page = load_history_page(query, st.session_state.get("history_cursor", 0), page_size)
 
-            # Only keep key columns if available
-            key_cols = [c for c in ["Timestamp", "Transcript", "Sentiment", "Emotion", "StopReason"] if c in df.columns]
-            df = df[key_cols] if key_cols else df
+        if page.rows:
+            df = pd.DataFrame(page.rows, columns=page.columns)
+            st.caption(f"Showing {page.offset + 1}–{page.offset + len(page.rows)} of {page.total} calls")
 
             # Display table
             st.dataframe(
@@ -661,17 +928,70 @@ if tab == "History":
                 height=400,
             )
 
-            # Download CSV
-            csv = df.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                "⬇️ Download CSV",
-                csv,
-                "call_history.csv",
-                "text/csv",
-                use_container_width=True
-            )
+            p_prev, p_next, p_dl = st.columns([1, 1, 2])
+            with p_prev:
+                if st.button("◀ Newer", disabled=page.prev_cursor is None, use_container_width=True):
+                    st.session_state["history_cursor"] = page.prev_cursor
+                    st.rerun()
+            with p_next:
+                if st.button("Older ▶", disabled=page.next_cursor is None, use_container_width=True):
+                    st.session_state["history_cursor"] = page.next_cursor
+                    st.rerun()
+            with p_dl:
+                # Download CSV (visible page)
+                csv = df.to_csv(index=False).encode("utf-8")
+                st.download_button(
+                    "⬇️ Download CSV",
+                    csv,
+                    "call_history.csv",
+                    "text/csv",
+                    use_container_width=True
+                )
+        elif query.is_filtered:
+            st.info("No calls match these filters.")
         else:
             st.info("No call history found yet. Record and save a call to see data here.")
+
+        # 🎧 Playback from the local audio archive
+        archived = get_archive().find(limit=200)
+        if archived:
+            st.markdown("**🎧 Playback**")
+            by_label = {f"{a['timestamp']} · {a['phone'] or '—'} · {a['duration_s']:.0f}s": a for a in archived}
+            rec = by_label[st.selectbox("Recording", list(by_label), key="history_playback")]
+            dur = max(float(rec["duration_s"]), 0.1)
+            start_s, end_s = st.slider("Segment (sec)", 0.0, dur, (0.0, dur), key=f"history_slice_{rec['digest'][:12]}")
+            st.audio(get_archive().wav_bytes(rec["digest"], start_s, end_s), format="audio/wav")
+
+        # 📦 Bulk export (streamed from the sheet in chunks; uses the date filter above)
+        rerun_profile.mark("export")
+        with st.expander("📦 Export calls / summaries"):
+            e1, e2, e3 = st.columns([1, 1, 2])
+            with e1:
+                ex_dataset = st.selectbox("Dataset", ["calls", "summaries"], key="export_dataset")
+            with e2:
+                ex_format = st.selectbox("Format", list(FORMATS), key="export_format")
+            with e3:
+                ex_customer = st.text_input("Customer phone or email (summaries)", key="export_customer")
+            if st.button("Prepare export", key="export_go"):
+                bar = st.progress(0.0, text="Exporting…")
+                path = os.path.join(tempfile.gettempdir(), f"aisales-export-{int(time.time())}{FORMATS[ex_format]}")
+                try:
+                    with open(path, "wb") as fh:
+                        n = export(get_sheet().spreadsheet, ex_dataset, ex_format, fh,
+                                   ExportQuery(query.start, query.end, ex_customer),
+                                   progress=lambda done, total: bar.progress(min(done / max(total, 1), 1.0),
+                                                                             text=f"{done:,}/{total:,} rows scanned"))
+                    old = st.session_state.get("export_file")
+                    if old and old[0] != path and os.path.exists(old[0]):
+                        os.remove(old[0])
+                    st.session_state["export_file"] = (path, f"{ex_dataset}{FORMATS[ex_format]}", n)
+                except Exception as e:
+                    st.error(f"Export failed: {e}")
+            exported = st.session_state.get("export_file")
+            if exported and os.path.exists(exported[0]):
+                with open(exported[0], "rb") as fh:
+                    st.download_button(f"⬇️ Download {exported[1]} ({exported[2]:,} rows)", fh,
+                                       exported[1], use_container_width=True)
     except Exception as e:
         st.error(f"Error loading call history: {e}")
 
@@ -679,19 +999,26 @@ if tab == "History":
 
 # ---------------- ANALYTICS TAB ----------------
 if tab == "Analytics":
+    rerun_profile.mark("layout")
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("Analytics")
     
 
-    col_refresh, _ = st.columns([1, 6])
+    col_refresh, col_period, _ = st.columns([1, 2, 4])
     with col_refresh:
         if st.button("↻ Refresh data", use_container_width=False):
+            get_sheet_cache().refresh()
             st.session_state["_do_refresh"] = True
             st.rerun()
+    with col_period:
+        # only the monthly shards in the period are read (and cached)
+        periods = {"Last 3 months": 3, "Last 12 months": 12, "All time": None}
+        months = periods[st.selectbox("Period", list(periods), key="analytics_period")]
     refresh_animation("_do_refresh")
 
     try:
-        values = sheet.get_all_values()
+        rerun_profile.mark("sheets read")
+        values = get_sheet_cache().dataset_values("calls", start=_months_back(months) if months else None)
         headers = values[0] if values else []
         rows = values[1:] if values and len(values) > 1 else []
 
@@ -708,6 +1035,7 @@ if tab == "Analytics":
         from collections import Counter
         import pandas as pd
 
+        rerun_profile.mark("charts")
         c1, c2 = st.columns(2)
 
         # --- Sentiment (raw) ---
@@ -738,12 +1066,23 @@ if tab == "Analytics":
             else:
                 st.warning("No Emotion column in sheet.")
 
+        # --- Live sentiment by minute of call (from the Timeline column) ---
+        i_tl = col_idx("Timeline")
+        if i_tl is not None:
+            points = [p for r in rows if i_tl < len(r) and r[i_tl] for p in parse_timeline(r[i_tl])]
+            if points:
+                st.markdown("**Average Live Sentiment by Minute of Call**")
+                df = pd.DataFrame([p[:2] for p in points], columns=["Seconds", "Score"])
+                df["Minute"] = (df["Seconds"] // 60).astype(int)
+                st.line_chart(df.groupby("Minute")["Score"].mean(), height=220)
+
     except Exception as e:
         st.error(f"Analytics error: {e}")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # ---------------- PURCHASING HISTORY TAB ----------------
 elif tab == "Purchasing History":
+    rerun_profile.mark("layout")
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("🛒 Purchasing History")
 
@@ -751,15 +1090,22 @@ elif tab == "Purchasing History":
 
     if email_input:
         try:
-            ws = ensure_summaries_ready()
-            values = ws.get_all_values()
-            headers = values[0] if values else []
-            rows = values[1:] if len(values) > 1 else []
-
+            rerun_profile.mark("load_crm_df")
             crm_df = load_crm_df()
-            customer = get_customer_by_email(crm_df, email_input)
+            view = customer_view(crm_df)
+            customer = view.customer(email_input)
             phone_number = customer.get("Phone") if customer else None
 
+            # cached Summaries shards are filtered in memory; the rest (if their phone range
+            # can hold this number) are searched by phone column only
+            rerun_profile.mark("sheets read")
+            values = (get_sheet_cache().find_rows("summaries", "CustomerPhone",
+                                                  lambda v: v == phone_number, key=phone_number)
+                      if phone_number else [])
+            headers = values[0] if values else []
+            rows = values[1:] if len(values) > 1 else []
+
+            rerun_profile.mark("render")
             matched = []
             if phone_number:
                 phone_idx = headers.index("CustomerPhone") if "CustomerPhone" in headers else None
@@ -803,11 +1149,10 @@ elif tab == "Purchasing History":
                         already_bought += parse_products(m["RecommendedProducts"])
                 already_bought = set(already_bought)
 
-                base_products = parse_products(customer.get("RecommendedProducts", ""))
+                # 🎯 Scored locally from purchase co-occurrence, industry popularity, budget & sentiment
                 current_sentiment = st.session_state.get("sentiment", "")
-                ranked = rank_products(base_products, current_sentiment)
-
-                recos = [p for p in ranked if p not in already_bought]
+                recos = get_recommender().recommend(customer, current_sentiment, k=3, exclude=already_bought,
+                                                 crm_products=view.products(email_input))
 
                 st.markdown("### 🎯 Recommended Next Products")
                 if recos:
@@ -837,71 +1182,7 @@ elif tab == "Purchasing History":
                                 unsafe_allow_html=True
                             )
                 else:
-                    # --- AI fallback with only ProductName + Price ---
-                    try:
-                        prompt = f"""
-                        You are a sales assistant. The customer profile is:
-                        Name: {customer.get("CustomerName")}
-                        Industry: {customer.get("Industry")}
-                        Budget: {customer.get("Budget")}
-                        Interest: {customer.get("InterestLevel")}
-                        Sentiment: {current_sentiment}
-
-                        Suggest 3 new products that would be valuable for this customer.
-                        Return ONLY a JSON array like:
-                        [
-                          {{"ProductName": "CRM Suite", "Price": 12000}},
-                          {{"ProductName": "Analytics Dashboard", "Price": 8000}},
-                          {{"ProductName": "POS System", "Price": 7000}}
-                        ]
-                        """
-                        resp = client.chat.completions.create(
-                            model="llama-3.3-70b-versatile",
-                            messages=[
-                                {"role": "system", "content": "You are a helpful sales assistant."},
-                                {"role": "user", "content": prompt}
-                            ],
-                            temperature=0.4
-                        )
-                        import json, re
-                        content = resp.choices[0].message.content.strip()
-
-                        # ✅ Extract only valid JSON array
-                        match = re.search(r"\[.*\]", content, flags=re.S)
-                        products_ai = json.loads(match.group(0)) if match else []
-
-                        if products_ai:
-                            st.info("🤖 AI-Suggested Products:")
-                            cols = st.columns(len(products_ai))
-                            for idx, prod in enumerate(products_ai):
-                                name = prod.get("ProductName", "Unnamed")
-                                price = prod.get("Price", "N/A")
-                                price_str = f"${float(price):,.2f}" if str(price).replace('.', '', 1).isdigit() else price
-                                with cols[idx]:
-                                    st.markdown(
-                                        f"""
-                                        <div style="
-                                            background: #fff;
-                                            border: 1px solid #e5e7eb;
-                                            border-radius: 12px;
-                                            padding: 14px;
-                                            text-align: center;
-                                            box-shadow: 0 4px 10px rgba(0,0,0,0.05);
-                                        ">
-                                            <div style="font-size:16px; font-weight:600; margin-bottom:6px;">
-                                                {name}
-                                            </div>
-                                            <div style="color:#10b981; font-weight:700; margin-bottom:8px;">
-                                                💲 {price_str}
-                                            </div>
-                                        </div>
-                                        """,
-                                        unsafe_allow_html=True
-                                    )
-                        else:
-                            st.warning("No recommendations available from CRM or AI.")
-                    except Exception as e:
-                        st.error(f"AI recommendation error: {e}")
+                    st.warning("No new recommendations for this customer yet.")
 
         except Exception as e:
             st.error(f"Error fetching history: {e}")
@@ -910,6 +1191,7 @@ elif tab == "Purchasing History":
 
 # ---------------- AGENT SUMMARY TAB ----------------
 elif tab == "Agent Summary":
+    rerun_profile.mark("layout")
     import textwrap
     from groq import Groq
 
@@ -938,7 +1220,7 @@ elif tab == "Agent Summary":
                     st.rerun()
                 else:
                     st.error("❌ Invalid credentials")
-        st.stop()
+        rerun_profile.stop()
     else:
         st.success("Welcome Agent 👋")
 
@@ -948,27 +1230,29 @@ elif tab == "Agent Summary":
         st.rerun()
 
     # 🔍 Input for phone number
-    customer_filter = st.text_input("📞 Enter Customer Phone Number")
+    customer_filter = st.text_input("📞 Enter Customer Phone Number", key="agent_phone")
 
     if not customer_filter.strip():
         st.info("Enter phone number to view summaries.")
-        st.stop()
+        rerun_profile.stop()
 
     try:
-        # ✅ Load data from Summaries sheet
-        ws = ensure_summaries_ready()
-        values = ws.get_all_values()
+        # ✅ Matching rows from the Summaries shards (cached ones in memory, the rest by phone column)
+        rerun_profile.mark("sheets read")
+        needle = customer_filter.strip().lower()
+        values = get_sheet_cache().find_rows("summaries", "CustomerPhone", lambda v: needle in v.lower())
         if not values or len(values) < 2:
-            st.warning("No data found in Summaries sheet.")
-            st.stop()
+            st.warning(f"No summaries found for **{customer_filter}**.")
+            rerun_profile.stop()
 
+        rerun_profile.mark("dataframe + render")
         headers = values[0]
         rows = values[1:]
         df = pd.DataFrame(rows, columns=headers)
 
         if "CustomerPhone" not in df.columns:
             st.error("❌ 'CustomerPhone' column not found in sheet.")
-            st.stop()
+            rerun_profile.stop()
 
         # 🔍 Filter by phone
         mask = df["CustomerPhone"].astype(str).str.contains(customer_filter, case=False, na=False, regex=False)
@@ -1006,8 +1290,16 @@ elif tab == "Agent Summary":
                     unsafe_allow_html=True
                 )
 
+                # 🎧 Archived recording for this call (inflated only when requested)
+                for rec in get_archive().find(timestamp=row.get('Timestamp', ''), phone=row.get('CustomerPhone', '')):
+                    if st.checkbox(f"🎧 Play recording ({rec['duration_s']:.0f}s)", key=f"play_{rec['digest'][:12]}_{_}"):
+                        st.audio(get_archive().wav_bytes(rec["digest"]), format="audio/wav")
+
                 all_summaries_text += f"Summary: {row.get('Summary','')}\nAction Items: {row.get('ActionItems','')}\n\n"
 
+            # 🧭 How similar calls with other customers went
+            similar_calls_panel(all_summaries_text, exclude_phone=filtered["CustomerPhone"].iloc[-1])
+
             # 🧠 AI Summary Button
             if st.button("🤖 Generate AI Summary"):
                 try:
@@ -1036,10 +1328,11 @@ elif tab == "Agent Summary":
                         ai_summary = response.choices[0].message.content.strip()
 
                     st.success("✅ AI Summary Generated")
+                    ai_summary_html = ai_summary.replace("\n", "<br>")
                     st.markdown(
                         f"""
                         <div style="background:#F9FAFB; border:1px solid #E5E7EB; border-radius:10px; padding:16px;">
-                        {ai_summary.replace("\n", "<br>")}
+                        {ai_summary_html}
                         </div>
                         """,
                         unsafe_allow_html=True,
@@ -1053,8 +1346,4 @@ elif tab == "Agent Summary":
 
     st.markdown('</div>', unsafe_allow_html=True)
 
-
-
-
-
-
+rerun_profile.end()
@@ -0,0 +1,199 @@
+import os
+import io
+import mmap
+import wave
+import zlib
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Iterator, List, Optional
+
+import numpy as np
+from config import SAMPLE_RATE, ARCHIVE_DIR
+
+# 🎧 Archive layout
+#   <root>/index.sqlite      → digest/timestamp/phone index + block table
+#   <root>/seg-000001.bin    → append-only segment files with zlib-compressed PCM blocks
+# Each call is split into fixed-size blocks that are compressed independently,
+# so a playback slice only inflates the blocks it overlaps.
+BLOCK_SECONDS = 2
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audio (
+    digest TEXT PRIMARY KEY,
+    sample_rate INTEGER NOT NULL,
+    n_samples INTEGER NOT NULL,
+    block_samples INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    digest TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (digest, idx)
+);
+CREATE TABLE IF NOT EXISTS calls (
+    timestamp TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (timestamp, phone)
+);
+CREATE INDEX IF NOT EXISTS calls_phone ON calls (phone);
+CREATE INDEX IF NOT EXISTS calls_digest ON calls (digest);
+"""
+
+
+class AudioArchive:
+    """Content-addressed store for mono int16 call recordings."""
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._maps = {}  # segment number → (file, mmap)
+        row = self._db.execute("SELECT MAX(segment) FROM blocks").fetchone()
+        self._segment = row[0] if row and row[0] is not None else 1
+
+    # ---- Write path ----
+    def put(self, pcm: np.ndarray, timestamp: str = "", phone: str = "",
+            sample_rate: int = SAMPLE_RATE) -> str:
+        """Store mono int16 PCM (deduplicated by content) and index it. Returns the digest."""
+        pcm = np.ascontiguousarray(pcm, dtype=np.int16).reshape(-1)
+        h = hashlib.sha256()
+        h.update(str(sample_rate).encode())
+        h.update(memoryview(pcm).cast("B"))
+        digest = h.hexdigest()
+
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM audio WHERE digest=?", (digest,)).fetchone()
+            if not known:
+                block = int(BLOCK_SECONDS * sample_rate)
+                rows = []
+                for idx, start in enumerate(range(0, max(pcm.size, 1), block)):
+                    payload = zlib.compress(pcm[start:start + block].tobytes(), 6)
+                    segment, offset = self._append(payload)
+                    rows.append((digest, idx, segment, offset, len(payload)))
+                self._db.executemany("INSERT INTO blocks VALUES (?,?,?,?,?)", rows)
+                self._db.execute("INSERT INTO audio VALUES (?,?,?,?,?)",
+                                 (digest, sample_rate, int(pcm.size), block, time.time()))
+            if timestamp or phone:
+                self._db.execute("INSERT OR REPLACE INTO calls VALUES (?,?,?)",
+                                 (timestamp or "", phone or "", digest))
+            self._db.commit()
+        return digest
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.root, f"seg-{segment:06d}.bin")
+
+    def _append(self, payload: bytes):
+        """Append to the newest segment, rolling over once it passes SEGMENT_MAX_BYTES."""
+        path = self._segment_path(self._segment)
+        if os.path.exists(path) and os.path.getsize(path) >= SEGMENT_MAX_BYTES:
+            self._segment += 1
+            path = self._segment_path(self._segment)
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(payload)
+        return self._segment, offset
+
+    # ---- Index lookups ----
+    def find(self, timestamp: Optional[str] = None, phone: Optional[str] = None,
+             limit: Optional[int] = None) -> List[dict]:
+        """Return indexed calls matching timestamp and/or phone, newest first."""
+        sql = ("SELECT c.timestamp, c.phone, c.digest, a.n_samples, a.sample_rate "
+               "FROM calls c JOIN audio a ON a.digest = c.digest WHERE 1=1")
+        args = []
+        if timestamp:
+            sql += " AND c.timestamp = ?"; args.append(timestamp)
+        if phone:
+            sql += " AND c.phone = ?"; args.append(phone)
+        sql += " ORDER BY c.timestamp DESC"
+        if limit:
+            sql += " LIMIT ?"; args.append(int(limit))
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [{"timestamp": t, "phone": p, "digest": d, "duration_s": n / max(sr, 1), "sample_rate": sr}
+                for t, p, d, n, sr in rows]
+
+    def info(self, digest: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sample_rate, n_samples, block_samples FROM audio WHERE digest=?", (digest,)
+            ).fetchone()
+        if not row:
+            return None
+        sr, n, block = row
+        return {"digest": digest, "sample_rate": sr, "n_samples": n,
+                "block_samples": block, "duration_s": n / max(sr, 1)}
+
+    # ---- Read path ----
+    def _map(self, segment: int, needed: int) -> mmap.mmap:
+        """mmap a segment read-only; remap if it has grown since it was first mapped."""
+        cached = self._maps.get(segment)
+        if cached is not None and len(cached[1]) >= needed:
+            return cached[1]
+        if cached is not None:
+            cached[1].close(); cached[0].close()
+        f = open(self._segment_path(segment), "rb")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[segment] = (f, mm)
+        return mm
+
+    def iter_blocks(self, digest: str, start_s: float = 0.0, end_s: Optional[float] = None
+                    ) -> Iterator[np.ndarray]:
+        """Yield int16 PCM for [start_s, end_s) block by block, inflating only overlapping blocks."""
+        meta = self.info(digest)
+        if not meta:
+            raise KeyError(f"Unknown audio digest: {digest}")
+        sr, n, block = meta["sample_rate"], meta["n_samples"], meta["block_samples"]
+        lo = max(0, int(start_s * sr))
+        hi = n if end_s is None else min(n, int(end_s * sr))
+        if hi <= lo:
+            return
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, segment, offset, length FROM blocks WHERE digest=? AND idx BETWEEN ? AND ? ORDER BY idx",
+                (digest, lo // block, (hi - 1) // block),
+            ).fetchall()
+        for idx, segment, offset, length in rows:
+            with self._lock:
+                mm = self._map(segment, offset + length)
+                payload = mm[offset:offset + length]
+            pcm = np.frombuffer(zlib.decompress(payload), dtype=np.int16)
+            base = idx * block
+            yield pcm[max(lo - base, 0):hi - base]
+
+    def read(self, digest: str, start_s: float = 0.0, end_s: Optional[float] = None) -> np.ndarray:
+        parts = list(self.iter_blocks(digest, start_s, end_s))
+        return np.concatenate(parts) if parts else np.array([], dtype=np.int16)
+
+    def wav_bytes(self, digest: str, start_s: float = 0.0, end_s: Optional[float] = None) -> bytes:
+        """Encode a slice as an in-memory WAV for st.audio playback."""
+        meta = self.info(digest) or {"sample_rate": SAMPLE_RATE}
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(meta["sample_rate"])
+            for pcm in self.iter_blocks(digest, start_s, end_s):
+                wf.writeframes(pcm.tobytes())
+        return buf.getvalue()
+
+
+_archive: Optional[AudioArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> AudioArchive:
+    """Process-wide archive instance (shared by all Streamlit sessions)."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = AudioArchive()
+        return _archive
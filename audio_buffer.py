@@ -0,0 +1,261 @@
+import os
+import weakref
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from config import AUDIO_SESSION_BUDGET_MB, AUDIO_PROCESS_BUDGET_MB, AUDIO_SPILL_DIR, AUDIO_RETAIN_BUDGET_MB
+
+# 💾 Capture buffer with a memory budget.
+# Chunks stay in RAM while the call is short; once the call passes the per-session
+# budget (or all live recordings in the process pass the process budget) the audio
+# is moved to a file in AUDIO_SPILL_DIR and the rest of the capture is appended there.
+# array() then hands out an np.memmap, so _to_mono_int16, WAV encoding and the
+# archive read the recording straight from the page cache instead of a RAM copy.
+# Spill files are deleted when the last array referring to them is garbage-collected.
+#
+# After capture a session keeps a RetainedAudio (int16, half the size of float32) only
+# until analysis has read it; then it is released and the archive copy is what remains.
+# All retained recordings share AUDIO_RETAIN_BUDGET_MB: past it the least recently used
+# ones (idle browser tabs) are moved to spill files, so RSS doesn't grow with open tabs.
+
+_MB = 1024 * 1024
+_ram_lock = threading.Lock()
+_ram_bytes = 0  # float32 audio currently held in RAM by buffers / arrays they returned
+
+
+def ram_in_use() -> int:
+    """Bytes of recorded audio currently held in RAM across the process."""
+    return _ram_bytes
+
+
+def _charge(nbytes: int):
+    global _ram_bytes
+    with _ram_lock:
+        _ram_bytes += nbytes
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _spill_path(suffix: str) -> str:
+    os.makedirs(AUDIO_SPILL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="call-", suffix=suffix, dir=AUDIO_SPILL_DIR)
+    os.close(fd)
+    return path
+
+
+def spill_array(shape, dtype) -> np.memmap:
+    """Writable disk-backed array for large derived buffers (file removed with the array)."""
+    path = _spill_path(".bin")
+    arr = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+    weakref.finalize(arr, _remove, path)
+    return arr
+
+
+class AudioBuffer:
+    """List-like collector for capture chunks that spills to disk past its budget."""
+
+    def __init__(self, session_budget_mb: float = AUDIO_SESSION_BUDGET_MB,
+                 process_budget_mb: float = AUDIO_PROCESS_BUDGET_MB):
+        self.session_budget = int(session_budget_mb * _MB)
+        self.process_budget = int(process_budget_mb * _MB)
+        self._chunks: List[np.ndarray] = []
+        self._frames: List[int] = []   # frames per appended chunk (for drop_last)
+        self._channels: Optional[int] = None
+        self._ram = 0
+        self._file = None
+        self.path: Optional[str] = None
+        self._finalizer = weakref.finalize(self, _charge, 0)
+
+    @property
+    def spilled(self) -> bool:
+        return self.path is not None
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def append(self, chunk: np.ndarray):
+        chunk = np.asarray(chunk, dtype=np.float32)
+        chunk = chunk.reshape(len(chunk), -1)
+        if self._channels is None:
+            self._channels = chunk.shape[1]
+        self._frames.append(len(chunk))
+        if self.spilled:
+            self._file.write(np.ascontiguousarray(chunk).tobytes())
+            return
+        if self._ram + chunk.nbytes > self.session_budget or _ram_bytes + chunk.nbytes > self.process_budget:
+            self._spill()
+            self._file.write(np.ascontiguousarray(chunk).tobytes())
+            return
+        self._chunks.append(chunk)
+        self._ram += chunk.nbytes
+        _charge(chunk.nbytes)
+        self._track()
+
+    def _track(self):
+        # release this buffer's share of the process budget when it is dropped
+        self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, _charge, -self._ram)
+
+    def _spill(self):
+        self.path = _spill_path(".f32")
+        self._file = open(self.path, "wb")
+        for c in self._chunks:
+            self._file.write(np.ascontiguousarray(c).tobytes())
+        self._chunks = []
+        _charge(-self._ram)
+        self._ram = 0
+        self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, self._close_and_remove, self._file, self.path)
+
+    @staticmethod
+    def _close_and_remove(fh, path):
+        fh.close()
+        _remove(path)
+
+    def drop_last(self, n: int):
+        """Forget the last n chunks (e.g. the trailing silence that ended the call)."""
+        n = min(max(n, 0), len(self._frames))
+        if n == 0:
+            return
+        self._frames = self._frames[:-n]
+        if self.spilled:
+            self._file.flush()
+            self._file.truncate(sum(self._frames) * self._channels * 4)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            freed = sum(c.nbytes for c in self._chunks[-n:])
+            self._chunks = self._chunks[:-n]
+            self._ram -= freed
+            _charge(-freed)
+            self._track()
+
+    def array(self) -> np.ndarray:
+        """
+        The whole recording as (N, C) float32: in RAM, or an np.memmap once spilled.
+        Call once, after capture; the returned array takes over the RAM charge / spill file.
+        """
+        frames = sum(self._frames)
+        self._finalizer.detach()
+        if not self.spilled:
+            merged = np.concatenate(self._chunks, axis=0) if self._chunks else np.zeros((0, self._channels or 1), np.float32)
+            weakref.finalize(merged, _charge, -self._ram)
+            self._chunks, self._ram = [], 0
+            return merged
+        self._file.close()
+        if frames == 0:
+            _remove(self.path)
+            return np.zeros((0, self._channels or 1), np.float32)
+        mapped = np.memmap(self.path, dtype=np.float32, mode="r", shape=(frames, self._channels))
+        weakref.finalize(mapped, _remove, self.path)
+        return mapped
+
+
+# ---- Retained recordings (session state) ----
+_retained_lock = threading.Lock()
+_retained: "OrderedDict[int, weakref.ref]" = OrderedDict()  # least recently used first
+
+
+def retained_bytes() -> int:
+    """RAM held by RetainedAudio objects across all sessions."""
+    with _retained_lock:
+        return sum(r.nbytes for r in (ref() for ref in _retained.values()) if r is not None)
+
+
+def _forget(key: int):
+    with _retained_lock:
+        _retained.pop(key, None)
+
+
+def enforce_retain_budget(budget_mb: float = AUDIO_RETAIN_BUDGET_MB):
+    """Spill least recently used retained recordings until the total fits the budget."""
+    budget = int(budget_mb * _MB)
+    with _retained_lock:
+        live = [r for r in (ref() for ref in _retained.values()) if r is not None]
+    total = sum(r.nbytes for r in live)
+    for r in live:
+        if total <= budget:
+            break
+        total -= r.nbytes
+        r.spill()
+
+
+class RetainedAudio:
+    """
+    A finished recording as session state keeps it: (N, C) int16 in RAM, or in a spill
+    file once evicted, or nothing but the archive digest once released.
+    """
+
+    def __init__(self, audio: np.ndarray, digest: str = ""):
+        audio = audio.reshape(len(audio), -1)
+        self.frames, self.channels = audio.shape
+        self.digest = digest
+        self._pcm = (spill_array(audio.shape, np.int16) if isinstance(audio, np.memmap)
+                     else np.empty(audio.shape, np.int16))
+        for i in range(0, len(audio), 1 << 20):
+            self._pcm[i:i + (1 << 20)] = np.clip(audio[i:i + (1 << 20)] * 32767.0, -32768, 32767)
+        self._charged = 0 if isinstance(self._pcm, np.memmap) else self._pcm.nbytes
+        _charge(self._charged)
+        self._finalizer = weakref.finalize(self, _charge, -self._charged)
+        with _retained_lock:
+            _retained[id(self)] = weakref.ref(self, lambda _, key=id(self): _forget(key))
+        enforce_retain_budget()
+
+    @property
+    def duration_s(self) -> float:
+        from config import SAMPLE_RATE
+        return self.frames / SAMPLE_RATE
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of this recording held in RAM (0 once spilled or released)."""
+        return self._charged
+
+    @property
+    def released(self) -> bool:
+        return self._pcm is None
+
+    def touch(self):
+        with _retained_lock:
+            if id(self) in _retained:
+                _retained.move_to_end(id(self))
+
+    def _uncharge(self):
+        _charge(-self._charged)
+        self._charged = 0
+        self._finalizer.detach()
+
+    def array(self) -> np.ndarray:
+        """(N, C) float32 for analysis: a fresh copy, memory-mapped if the PCM was spilled."""
+        if self._pcm is None:
+            raise RuntimeError("recording was released; read it from the archive instead")
+        self.touch()
+        pcm = self._pcm
+        out = spill_array(pcm.shape, np.float32) if isinstance(pcm, np.memmap) else np.empty(pcm.shape, np.float32)
+        for i in range(0, len(pcm), 1 << 20):
+            np.multiply(pcm[i:i + (1 << 20)], np.float32(1.0 / 32767.0), out=out[i:i + (1 << 20)])
+        return out
+
+    def spill(self):
+        """Move the PCM to a spill file (keeps it readable, frees the RAM)."""
+        pcm = self._pcm
+        if pcm is None or isinstance(pcm, np.memmap):
+            return
+        disk = spill_array(pcm.shape, np.int16)
+        disk[:] = pcm
+        self._pcm = disk
+        self._uncharge()
+
+    def release(self):
+        """Drop the PCM once analysis has it; the archive (digest) keeps the mono copy."""
+        self._pcm = None
+        self._uncharge()
+        _forget(id(self))
@@ -0,0 +1,189 @@
+"""
+Micro-benchmarks for the audio, parsing and sheet-processing hot paths.
+
+    python benchmarks/bench_hotpaths.py --save benchmarks/baseline.json
+    python benchmarks/bench_hotpaths.py --compare benchmarks/baseline.json --threshold 0.2
+
+Audio is synthetic (seconds up to the 3600 s capture cap) and the CRM / Summaries
+tables are generated in memory, so no microphone, Google or Groq traffic is needed.
+In compare mode every case slower than baseline × (1 + threshold) is reported and
+the exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+os.environ["SHEETS_BACKEND"] = "fake"
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from config import SAMPLE_RATE
+from sentiment import _to_mono_int16, _save_wav_int16
+from speech_to_text import chunk_volume, channel_volumes
+from crm import parse_products, get_customer_options
+from recommender import Recommender
+from google_sheets import CRM_HEADERS, SUMMARIES_HEADERS, PRODUCT_PRICE_MAP
+
+
+def _timeit(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+# ---- Synthetic inputs ----
+def make_audio(seconds: int, channels: int, rng) -> np.ndarray:
+    """Speech-like float32 capture: noise floor plus a few loud bursts."""
+    n = int(seconds * SAMPLE_RATE)
+    x = rng.standard_normal((n, channels), dtype=np.float32) * np.float32(0.01)
+    for start in range(0, n, 10 * SAMPLE_RATE):
+        x[start:start + 3 * SAMPLE_RATE] *= np.float32(20.0)
+    return x
+
+
+def make_crm_rows(n: int, rng):
+    products = list(PRODUCT_PRICE_MAP)
+    industries = ["Retail", "Finance", "Healthcare", "Education", "Logistics"]
+    rows = [CRM_HEADERS]
+    for i in range(n):
+        picks = rng.choice(len(products), size=3, replace=False)
+        row = {
+            "CustomerName": f"Customer {i}", "Company": f"Company {i % 997}" if i % 5 else "",
+            "Email": f"customer{i}@example.com", "Phone": f"+1555{i:07d}",
+            "Industry": industries[i % len(industries)], "Budget": str(int(rng.integers(1, 500)) * 100),
+            "RecommendedProducts": ", ".join(products[j] for j in picks),
+        }
+        rows.append([row.get(h, "") for h in CRM_HEADERS])
+    return rows
+
+
+def make_summary_rows(n: int, rng):
+    products = list(PRODUCT_PRICE_MAP)
+    sentiments = ["Positive", "Neutral", "Negative"]
+    rows = [SUMMARIES_HEADERS]
+    for i in range(n):
+        row = {
+            "Timestamp": f"2024-01-{i % 28 + 1:02d} 10:00:00", "CustomerName": f"Customer {i % 5000}",
+            "CustomerPhone": f"+1555{i % 5000:07d}", "Summary": "Discussed pricing and onboarding.",
+            "ActionItems": "- Send quote", "Sentiment": sentiments[i % 3], "Emotion": "Calm",
+            "RecommendedProducts": products[int(rng.integers(len(products)))],
+        }
+        rows.append([row.get(h, "") for h in SUMMARIES_HEADERS])
+    return rows
+
+
+# ---- Cases ----
+def audio_cases(seconds: int, rng):
+    mono, stereo = make_audio(seconds, 1, rng), make_audio(seconds, 2, rng)
+    pcm = _to_mono_int16(mono)
+    step = SAMPLE_RATE
+
+    def save_wav():
+        os.remove(_save_wav_int16(pcm))
+
+    def volume_loop():
+        for i in range(0, len(mono), step):
+            chunk_volume(mono[i:i + step])
+
+    def channel_volume_loop():
+        for i in range(0, len(stereo), step):
+            channel_volumes(stereo[i:i + step])
+
+    return {
+        "to_mono_int16 (mono)": lambda: _to_mono_int16(mono),
+        "to_mono_int16 (stereo)": lambda: _to_mono_int16(stereo),
+        "save_wav_int16": save_wav,
+        "chunk_volume per 1s chunk": volume_loop,
+        "channel_volumes per 1s chunk (stereo)": channel_volume_loop,
+    }
+
+
+def table_cases(n: int, rng):
+    crm_rows, summary_rows = make_crm_rows(n, rng), make_summary_rows(n, rng)
+    crm_df = pd.DataFrame(crm_rows[1:], columns=crm_rows[0])
+    cells = crm_df["RecommendedProducts"].tolist()
+    parsed = [parse_products(c) for c in cells]
+    sentiments = ["Negative", "Positive", "Neutral"]
+    reco = Recommender.fit(summary_rows, crm_rows)
+    customers = crm_df.head(1000).to_dict("records")  # fixed count: per-call cost, not table size
+
+    def crm_frame():
+        df = pd.DataFrame(crm_rows[1:], columns=crm_rows[0])
+        df["Budget"] = pd.to_numeric(df["Budget"], errors="coerce")
+
+    return {
+        "parse_products": lambda: [parse_products(c) for c in cells],
+        "Recommender.fit": lambda: Recommender.fit(summary_rows, crm_rows),
+        "Recommender.recommend ×1000": lambda: [reco.recommend(c, sentiments[i % 3], crm_products=parsed[i])
+                                                for i, c in enumerate(customers)],
+        "get_customer_options": lambda: get_customer_options(crm_df),
+        "CRM rows → DataFrame": crm_frame,
+        "Summaries rows → DataFrame": lambda: pd.DataFrame(summary_rows[1:], columns=summary_rows[0]),
+        "Summaries rows → records": lambda: pd.DataFrame(summary_rows[1:], columns=summary_rows[0]).to_dict("records"),
+    }
+
+
+def run(durations, rows, repeat: int, seed: int):
+    rng = np.random.default_rng(seed)
+    results = {}
+    for group, sizes, unit, build in (("audio", durations, "s", audio_cases), ("tables", rows, "rows", table_cases)):
+        for size in sizes:
+            print(f"\n📦 {group}: {size:,} {unit}")
+            for name, fn in build(size, rng).items():
+                sec = _timeit(fn, repeat)
+                results[f"{name} [{size} {unit}]"] = sec
+                print(f"  {name:<40} {sec * 1000:10.2f} ms")
+    return results
+
+
+def compare(results, baseline, threshold: float):
+    """(name, base_s, now_s) for every case slower than baseline × (1 + threshold)."""
+    return [(name, baseline[name], sec) for name, sec in results.items()
+            if name in baseline and baseline[name] > 0 and sec > baseline[name] * (1 + threshold)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--durations", type=int, nargs="+", default=[10, 60, 600, 3600], help="audio seconds")
+    ap.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--save", help="write results as a baseline JSON file")
+    ap.add_argument("--compare", help="baseline JSON file to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown ratio (0.2 = 20%%)")
+    args = ap.parse_args()
+
+    results = run(args.durations, args.rows, args.repeat, args.seed)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                       "pandas": pd.__version__, "results": results}, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        missing = sorted(set(results) - set(baseline))
+        if missing:
+            print(f"\nℹ️ {len(missing)} case(s) not in baseline")
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for name, base, now in regressions:
+                print(f"  {name:<55} {base * 1000:9.2f} → {now * 1000:9.2f} ms ({now / base - 1:+.0%})")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Startup budget check: time from interpreter start to the point where main.py could
+show its first prompt, measured in fresh subprocesses.
+
+    python benchmarks/bench_startup.py --runs 5
+
+Fails (exit 1) when the median exceeds STARTUP_BUDGET_S, or when importing the
+CLI modules eagerly pulls in the Groq / gspread / sounddevice clients.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import STARTUP_BUDGET_S
+
+PROBE = (
+    "import sys, main\n"
+    "eager = [m for m in ('groq', 'gspread', 'sounddevice', 'oauth2client') if m in sys.modules]\n"
+    "print(','.join(eager))\n"
+)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget", type=float, default=STARTUP_BUDGET_S)
+    args = ap.parse_args()
+
+    times, eager = [], ""
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+        times.append(time.perf_counter() - t0)
+        eager = out.stdout.strip()
+
+    med = statistics.median(times)
+    print(f"⏱️ startup-to-first-prompt: median {med:.3f}s, max {max(times):.3f}s (budget {args.budget:.2f}s)")
+    ok = med <= args.budget
+    if eager:
+        print(f"❌ eager heavy imports at startup: {eager}")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Scale benchmarks for the Sheets-bound tabs, run against the offline fake backend.
+
+    python benchmarks/bench_tabs.py --sizes 10000 100000 1000000 --latency 0.2
+
+Each tab's data path (read → DataFrame → filter/aggregate) is timed exactly as the
+Streamlit script runs it; no Google or Groq traffic is made.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from collections import Counter
+
+os.environ["SHEETS_BACKEND"] = "fake"
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from fake_sheets import FakeSpreadsheet, generate_dataset
+from google_sheets import CRM_SHEET_NAME, SUMMARIES_SHEET_NAME
+from call_log import CallQuery, fetch_page
+
+
+def _timeit(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+# ---- Tab data paths (mirrors app_streamlit.py) ----
+def history_tab(ss):
+    values = ss.sheet1.get_all_values()
+    headers, rows = values[0], values[1:]
+    df = pd.DataFrame(rows, columns=headers)
+    key_cols = [c for c in ["Timestamp", "Transcript", "Sentiment", "Emotion", "StopReason"] if c in df.columns]
+    df = df[key_cols]
+    df.to_csv(index=False).encode("utf-8")
+
+
+def history_paged_tab(ss):
+    fetch_page(ss.sheet1, CallQuery(), cursor=0, page_size=50)
+    fetch_page(ss.sheet1, CallQuery(sentiments=("Negative",), text="cancel"), cursor=0, page_size=50)
+
+
+def analytics_tab(ss):
+    values = ss.sheet1.get_all_values()
+    headers, rows = values[0], values[1:]
+    for name in ("Sentiment", "Emotion"):
+        i = headers.index(name)
+        Counter(r[i].strip() for r in rows if i < len(r) and r[i].strip())
+
+
+def _crm_df(ss):
+    values = ss.worksheet(CRM_SHEET_NAME).get_all_values()
+    df = pd.DataFrame(values[1:], columns=values[0])
+    df["Budget"] = pd.to_numeric(df["Budget"], errors="coerce")
+    return df
+
+
+def purchasing_tab(ss, email="customer7@example.com"):
+    values = ss.worksheet(SUMMARIES_SHEET_NAME).get_all_values()
+    headers, rows = values[0], values[1:]
+    crm_df = _crm_df(ss)
+    hit = crm_df.loc[crm_df["Email"] == email]
+    phone = hit.iloc[0]["Phone"] if not hit.empty else None
+    idx = headers.index("CustomerPhone")
+    matched = [{headers[i]: (r[i] if i < len(r) else "") for i in range(len(headers))}
+               for r in rows if idx < len(r) and r[idx] == phone]
+    pd.DataFrame(matched)
+
+
+def agent_summary_tab(ss, phone="+15550000007"):
+    values = ss.worksheet(SUMMARIES_SHEET_NAME).get_all_values()
+    df = pd.DataFrame(values[1:], columns=values[0])
+    df[df["CustomerPhone"].astype(str).str.contains(phone, case=False, na=False, regex=False)]
+
+
+TABS = {
+    "History": history_tab,
+    "History (paged)": history_paged_tab,
+    "Analytics": analytics_tab,
+    "Purchasing History": purchasing_tab,
+    "Agent Summary": agent_summary_tab,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--customers", type=int, default=5000)
+    ap.add_argument("--latency", type=float, default=0.0, help="simulated seconds per Sheets API call")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = []
+    for n in args.sizes:
+        ss = FakeSpreadsheet()
+        t0 = time.perf_counter()
+        generate_dataset(ss, calls=n, customers=min(args.customers, n))
+        print(f"\n📦 {n:,} rows generated in {time.perf_counter() - t0:.1f}s")
+        ss.latency_s = args.latency
+        for name, fn in TABS.items():
+            sec = _timeit(lambda: fn(ss), args.repeat)
+            results.append({"tab": name, "rows": n, "seconds": sec, "latency_s": args.latency})
+            print(f"  {name:<20} {sec * 1000:10.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
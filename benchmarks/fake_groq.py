@@ -0,0 +1,163 @@
+"""
+Local HTTP stand-in for the Groq endpoints the app calls (no network, no API key).
+
+    python benchmarks/fake_groq.py --port 8765 --stt-latency 0.6,1.5 --error-rate 0.02
+    GROQ_BASE_URL=http://127.0.0.1:8765 streamlit run app_streamlit.py
+
+The Groq SDK reads GROQ_BASE_URL, so pointing the app (or benchmarks/load_test.py)
+at this server needs no code change. Latencies are log-normal, given as
+"median,p95" seconds per endpoint; --error-rate answers that share of requests
+with a 500 or 429 (the SDK retries those, as it would against the real API).
+"""
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+TRANSCRIPTS = [
+    "Hi, I wanted to ask about pricing for the enterprise plan and whether there is a discount for annual billing.",
+    "We are not happy with the onboarding so far, it has been slow and support takes days to respond.",
+    "Can you send a demo link and the contract details? We want to start next month.",
+    "Thanks, that answers my question about integrations with our current CRM.",
+    "I need to cancel unless the support response time improves this quarter.",
+    "Could we get a trial for the analytics dashboard first before we commit to the full suite?",
+]
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+EMOTIONS = ["Joy", "Sadness", "Anger", "Fear", "Surprise"]
+
+
+class Latency:
+    """Log-normal delay from a median and a p95 (seconds)."""
+
+    def __init__(self, spec: str):
+        median, p95 = (float(v) for v in (spec.split(",") + [spec])[:2])
+        self.median = max(median, 0.0)
+        self.sigma = 0.0 if median <= 0 or p95 <= median else math.log(p95 / median) / 1.645
+
+    def sample(self, rng: random.Random) -> float:
+        return self.median * rng.lognormvariate(0.0, self.sigma) if self.median > 0 else 0.0
+
+
+class FakeGroq:
+    """Server state shared by the handler threads: latency models, error rate, counters."""
+
+    def __init__(self, stt_latency: str = "0.6,1.5", llm_latency: str = "0.25,0.8",
+                 error_rate: float = 0.0, seed: int = 0):
+        self.stt = Latency(stt_latency)
+        self.llm = Latency(llm_latency)
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"stt": 0, "llm": 0, "errors": 0}
+
+    def _draw(self, model: Latency) -> Tuple[float, int]:
+        """(delay, injected HTTP status or 0)."""
+        with self._lock:
+            fail = self._rng.random() < self.error_rate
+            return model.sample(self._rng), (self._rng.choice((429, 500)) if fail else 0)
+
+    def _pick(self, options):
+        with self._lock:
+            return self._rng.choice(options)
+
+    def transcription(self, body: bytes) -> dict:
+        text = self._pick(TRANSCRIPTS)
+        if b"verbose_json" not in body:
+            return {"text": text}
+        # two speaker turns so the speaker-labelling path is exercised too
+        half = len(text) // 2
+        return {"text": text, "segments": [{"start": 0.0, "end": 3.0, "text": text[:half]},
+                                           {"start": 3.5, "end": 7.0, "text": text[half:]}]}
+
+    def chat(self, payload: dict) -> str:
+        system = " ".join(m.get("content", "") for m in payload.get("messages", []) if m.get("role") == "system")
+        if "JSON" in system:
+            return json.dumps({"summary": "Customer discussed pricing and next steps.",
+                               "action_items": ["Send pricing", "Schedule demo"]})
+        if "two words" in system:
+            return f"{self._pick(SENTIMENTS)} {self._pick(EMOTIONS)}"
+        if "Joy" in system:
+            return self._pick(EMOTIONS)
+        if "Positive" in system:
+            return self._pick(SENTIMENTS)
+        return "Noted."
+
+
+def _handler(state: FakeGroq):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code: int, obj: dict):
+            data = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.endswith("/audio/transcriptions"):
+                kind, model = "stt", state.stt
+            elif self.path.endswith("/chat/completions"):
+                kind, model = "llm", state.llm
+            else:
+                return self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+            delay, fail = state._draw(model)
+            time.sleep(delay)
+            with state._lock:
+                state.counts[kind] += 1
+                state.counts["errors"] += bool(fail)
+            if fail:
+                return self._send(fail, {"error": {"message": "injected failure", "type": "fake_groq"}})
+            if kind == "stt":
+                return self._send(200, state.transcription(body))
+            payload = json.loads(body or b"{}")
+            self._send(200, {
+                "id": f"chatcmpl-{state.counts['llm']}", "object": "chat.completion", "created": int(time.time()),
+                "model": payload.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": state.chat(payload)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+    return Handler
+
+
+def serve(state: FakeGroq, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stand-in on a daemon thread; the base URL is f"http://{host}:{server.server_port}"."""
+    server = ThreadingHTTPServer((host, port), _handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--stt-latency", default="0.6,1.5", help="median,p95 seconds")
+    ap.add_argument("--llm-latency", default="0.25,0.8", help="median,p95 seconds")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    state = FakeGroq(args.stt_latency, args.llm_latency, args.error_rate)
+    server = serve(state, args.host, args.port)
+    print(f"✅ fake Groq on http://{args.host}:{server.server_port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n{state.counts}")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+End-to-end load test: N simulated agents run the full call flow
+(calibrate → record → analyze → summarize → save) on one app host.
+
+    python benchmarks/load_test.py --agents 1 4 16 32 --calls 3 --speed 10
+    python benchmarks/load_test.py --wav samples/*.wav --speed 1 --error-rate 0.02 --json load.json
+
+Audio is streamed from WAV files (or synthetic speech-like bursts) through the same
+read_chunk hook the microphone uses; --speed 1 is real time, 0 as fast as possible.
+Groq is benchmarks/fake_groq.py on a local port (log-normal latencies, injected 429/500s)
+and Sheets is the in-process fake backend. Analysis and save run on the shared
+JobExecutor under the CALL_SLO_S deadline, exactly as the dashboard submits them, so
+queueing behind JOB_WORKERS / GROQ_CONCURRENCY shows up in the stage latencies.
+For each concurrency level the report gives throughput, per-stage p50/p95/p99, errors,
+CPU and peak RSS.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import redirect_stdout
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ["calibrate", "record", "analyze", "summarize", "save", "total"]
+
+
+# ---- Audio sources ----
+def load_wav(path: str, sample_rate: int) -> np.ndarray:
+    """16-bit PCM WAV → mono float32 at sample_rate (linear resampling if needed)."""
+    with wave.open(path, "rb") as wf:
+        rate, ch, width = wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+        if width != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+        pcm = np.frombuffer(wf.readframes(wf.getnframes()), np.int16).reshape(-1, ch)
+    x = pcm.astype(np.float32).mean(axis=1) / 32768.0
+    if rate != sample_rate and len(x):
+        t = np.arange(0, len(x) / rate, 1.0 / sample_rate)
+        x = np.interp(t, np.arange(len(x)) / rate, x).astype(np.float32)
+    return x
+
+
+def synthetic_call(rng: np.random.Generator, seconds: float, sample_rate: int) -> np.ndarray:
+    """Speech-like amplitude-modulated noise with short pauses (never a full silent second)."""
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3.0 * t) ** 2
+    x = rng.standard_normal(n).astype(np.float32) * 0.1 * envelope.astype(np.float32)
+    for start in rng.uniform(0, seconds - 1, size=int(seconds // 6)):
+        a = int(start * sample_rate)
+        x[a:a + int(0.6 * sample_rate)] = 0.0
+    return x
+
+
+class WavReader:
+    """read_chunk(n) stand-in: 3 s of room noise (calibration), the call, then digital silence.
+    `stopped` is set once the call audio has been delivered (the agent pressing Stop)."""
+
+    def __init__(self, audio: np.ndarray, sample_rate: int, speed: float, rng: np.random.Generator):
+        noise = (rng.standard_normal(3 * sample_rate) * 1e-3).astype(np.float32)
+        self.stream = np.concatenate([noise, audio])
+        self.pos = 0
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.stopped = threading.Event()
+
+    def __call__(self, n: int) -> np.ndarray:
+        chunk = self.stream[self.pos:self.pos + n]
+        self.pos += n
+        if self.pos >= len(self.stream):
+            self.stopped.set()
+        if len(chunk) < n:
+            chunk = np.concatenate([chunk, np.zeros(n - len(chunk), np.float32)])
+        if self.speed > 0:
+            time.sleep(n / self.sample_rate / self.speed)
+        return chunk.reshape(-1, 1)
+
+
+# ---- Resource sampling ----
+class ResourceSampler(threading.Thread):
+    """CPU% (process), RSS and thread count sampled every `interval` seconds."""
+
+    def __init__(self, interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.rss, self.threads = [], []
+        self._t0 = self._cpu0 = None
+
+    @staticmethod
+    def _rss_bytes() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def run(self):
+        self._t0, self._cpu0 = time.perf_counter(), sum(os.times()[:2])
+        while not self.stop_event.wait(self.interval):
+            self.rss.append(self._rss_bytes())
+            self.threads.append(threading.active_count())
+
+    def finish(self) -> dict:
+        self.stop_event.set()
+        self.join()
+        wall = max(time.perf_counter() - self._t0, 1e-9)
+        return {"cpu_pct": round(100.0 * (sum(os.times()[:2]) - self._cpu0) / wall, 1),
+                "rss_peak_mb": round(max(self.rss or [self._rss_bytes()]) / 1e6, 1),
+                "threads_peak": max(self.threads or [threading.active_count()])}
+
+
+# ---- Call flow (mirrors app_streamlit.py) ----
+def summarize(transcript: str, sentiment: str, emotion: str):
+    """Same request shape as app_streamlit.generate_llm_summary."""
+    from config import get_groq_client
+    from jobs import run_stage
+    resp = run_stage("summary", "groq", lambda timeout: get_groq_client().chat.completions.create(
+        model="llama-3.1-8b-instant",
+        messages=[{"role": "system", "content": "You are a sales assistant. Write a concise post-call summary "
+                                                "and clear action items.\nReturn JSON only."},
+                  {"role": "user", "content": f"Sentiment: {sentiment}\nEmotion: {emotion}\n"
+                                              f"Transcript:\n{transcript}\n\nReturn JSON with keys 'summary' "
+                                              "and 'action_items' (list of strings)."}],
+        temperature=0.2,
+        timeout=timeout,
+    ))
+    data = json.loads(resp.choices[0].message.content or "{}")
+    return data.get("summary", ""), "; ".join(data.get("action_items", []))
+
+
+def save_job(ts, phone, transcript, sentiment, emotion, stop_reason) -> dict:
+    """Summarize + save, like app_streamlit._save_job; returns the two stage times."""
+    from google_sheets import save_to_sheets, append_log_rows
+    t0 = time.perf_counter()
+    summary, action_items = summarize(transcript, sentiment, emotion)
+    t1 = time.perf_counter()
+    save_to_sheets(ts, transcript, sentiment, emotion, stop_reason, "", phone)
+    append_log_rows("summaries", [[ts, phone, summary, action_items, sentiment, emotion, "NA", "NA", ts[:10]]])
+    return {"summarize": t1 - t0, "save": time.perf_counter() - t1}
+
+
+def run_call(agent: int, call: int, audio: np.ndarray, args, stats, rng):
+    from config import SAMPLE_RATE
+    from jobs import get_executor, CALL_SLO_S, DONE
+    from sentiment import analyze_audio
+    from speech_to_text import calibrate_silence, record_until_silence
+
+    times = {}
+    start = time.perf_counter()
+    reader = WavReader(audio, SAMPLE_RATE, args.speed, rng)
+    t = time.perf_counter()
+    threshold = calibrate_silence(read_chunk=reader)
+    times["calibrate"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    buf, stop_reason = record_until_silence(threshold, reader.stopped, args.max_call_s, read_chunk=reader)
+    recording = buf.array()
+    times["record"] = time.perf_counter() - t
+
+    executor = get_executor()
+    t = time.perf_counter()
+    job = executor.get(executor.submit(analyze_audio, recording, stop_reason, name="analyze", deadline_s=CALL_SLO_S))
+    job.future.result()
+    times["analyze"] = time.perf_counter() - t
+    if job.status != DONE:
+        stats.error("analyze", job.error or job.status)
+        return
+    transcript, sentiment, emotion = job.result
+    if transcript.startswith("[STT") or any(v == "Timeout" or v.startswith("Error:") for v in (sentiment, emotion)):
+        stats.degraded += 1
+
+    ts = time.strftime("%Y-%m-%d %H:%M:%S")
+    job = executor.get(executor.submit(save_job, ts, f"+1555{agent:03d}{call:04d}", transcript, sentiment,
+                                       emotion, stop_reason, name="save", deadline_s=CALL_SLO_S))
+    job.future.result()
+    if job.status != DONE:
+        stats.error("save", job.error or job.status)
+        return
+    times.update(job.result)
+    times["total"] = time.perf_counter() - start
+    stats.add(times)
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_examples = {}
+        self.completed = 0
+        self.degraded = 0
+
+    def add(self, times: dict):
+        with self._lock:
+            self.completed += 1
+            for k, v in times.items():
+                self.samples[k].append(v)
+
+    def error(self, stage: str, message: str):
+        with self._lock:
+            self.errors[stage] += 1
+            self.error_examples.setdefault(stage, message[:200])
+
+    def percentiles(self) -> dict:
+        out = {}
+        for stage in STAGES:
+            v = self.samples.get(stage)
+            if v:
+                p50, p95, p99 = np.percentile(v, [50, 95, 99])
+                out[stage] = {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+        return out
+
+
+def run_level(n_agents: int, sources, args, seed: int) -> dict:
+    stats = Stats()
+    sampler = ResourceSampler()
+    sampler.start()
+
+    def agent(i: int):
+        rng = np.random.default_rng(seed + i)
+        for c in range(args.calls):
+            audio = sources[(i * args.calls + c) % len(sources)]
+            try:
+                run_call(i, c, audio, args, stats, rng)
+            except Exception as e:
+                stats.error("flow", f"{type(e).__name__}: {e}")
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=agent, args=(i,), daemon=True) for i in range(n_agents)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    res = sampler.finish()
+    return {"agents": n_agents, "calls": n_agents * args.calls, "completed": stats.completed,
+            "degraded": stats.degraded, "errors": dict(stats.errors), "error_examples": stats.error_examples,
+            "wall_s": round(wall, 2), "calls_per_min": round(60.0 * stats.completed / wall, 2),
+            "stages": stats.percentiles(), **res}
+
+
+def print_report(results, groq_counts):
+    print(f"\n{'agents':>6} {'done':>6} {'err':>4} {'degr':>4} {'calls/min':>9} {'cpu%':>6} {'rss MB':>7} {'thr':>4}")
+    for r in results:
+        print(f"{r['agents']:>6} {r['completed']:>3}/{r['calls']:<2} {sum(r['errors'].values()):>4} "
+              f"{r['degraded']:>4} {r['calls_per_min']:>9.1f} {r['cpu_pct']:>6.0f} {r['rss_peak_mb']:>7.0f} "
+              f"{r['threads_peak']:>4}")
+    print("\nStage latency p50 / p95 / p99 (s)")
+    print(f"{'agents':>6} " + " ".join(f"{s:>22}" for s in STAGES))
+    for r in results:
+        cells = []
+        for s in STAGES:
+            p = r["stages"].get(s)
+            cells.append(f"{p['p50']:>6.2f} /{p['p95']:>6.2f} /{p['p99']:>6.2f}" if p else f"{'—':>22}")
+        print(f"{r['agents']:>6} " + " ".join(cells))
+    for r in results:
+        for stage, msg in r["error_examples"].items():
+            print(f"  ⚠️ {r['agents']} agents, {stage}: {msg}")
+    print(f"\nfake Groq requests: {groq_counts}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--agents", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="concurrency levels")
+    ap.add_argument("--calls", type=int, default=2, help="calls per agent per level")
+    ap.add_argument("--wav", nargs="*", default=[], help="16-bit PCM WAV files (default: synthetic calls)")
+    ap.add_argument("--call-seconds", type=float, default=20.0, help="length of synthetic calls")
+    ap.add_argument("--speed", type=float, default=0.0, help="audio playback speed (1 = real time, 0 = no wait)")
+    ap.add_argument("--max-call-s", type=int, default=600)
+    ap.add_argument("--stt-latency", default="0.6,1.5", help="fake Groq STT median,p95 seconds")
+    ap.add_argument("--llm-latency", default="0.25,0.8", help="fake Groq LLM median,p95 seconds")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of Groq requests answered 429/500")
+    ap.add_argument("--sheets-latency", type=float, default=0.05, help="fake Sheets seconds per request")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="write the results to this file")
+    args = ap.parse_args()
+
+    # environment for the stand-ins, before any app module creates a client
+    from fake_groq import FakeGroq, serve
+    groq = FakeGroq(args.stt_latency, args.llm_latency, args.error_rate, args.seed)
+    server = serve(groq)
+    workdir = tempfile.mkdtemp(prefix="aisales-load-")
+    os.environ.update({
+        "GROQ_BASE_URL": f"http://127.0.0.1:{server.server_port}",
+        "GROQ_API_KEY": "offline-load-test",
+        "SHEETS_BACKEND": "fake",
+        "FAKE_SHEETS_LATENCY_S": str(args.sheets_latency),
+        "SEARCH_INDEX_PATH": os.path.join(workdir, "search_index.sqlite"),
+        "AUDIO_SPILL_DIR": os.path.join(workdir, "spill"),
+        "STT_STATS_PATH": os.path.join(workdir, "stt_routing.jsonl"),
+    })
+    from config import SAMPLE_RATE
+    from jobs import JOB_WORKERS, BACKEND_LIMITS
+
+    rng = np.random.default_rng(args.seed)
+    sources = ([load_wav(p, SAMPLE_RATE) for p in args.wav] or
+               [synthetic_call(rng, args.call_seconds * f, SAMPLE_RATE) for f in (0.75, 1.0, 1.25)])
+    print(f"🧪 {len(sources)} audio source(s), speed={args.speed or 'max'}, JOB_WORKERS={JOB_WORKERS}, "
+          f"limits={BACKEND_LIMITS}, fake Groq on :{server.server_port}")
+
+    results = []
+    for n in args.agents:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):  # capture loop prints per chunk
+            r = run_level(n, sources, args, args.seed + 1000 * n)
+        results.append(r)
+        print(f" {n:>3} agents: {r['completed']}/{r['calls']} calls, {r['calls_per_min']:.1f} calls/min, "
+              f"p95 total {r['stages'].get('total', {}).get('p95', float('nan')):.2f}s")
+
+    print_report(results, groq.counts)
+    from stt_router import get_stt_stats
+    print(f"STT models: {get_stt_stats().summary()}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results, "groq_requests": groq.counts}, f, indent=2)
+        print(f"✅ results → {args.json}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
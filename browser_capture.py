@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import secrets
+import threading
+import weakref
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import SAMPLE_RATE
+
+# 🌐 Browser-side capture (CAPTURE_SOURCE=browser).
+# Each agent's browser records its own microphone and streams 16-bit mono PCM to this
+# process over a WebSocket (one small binary frame every BROWSER_FRAME_MS), so one host
+# serves many remote agents instead of only its own sound card. Frames land in a
+# per-session BrowserStream whose read_chunk(n) is a drop-in for the microphone reader:
+# the page asks the browser for a 16 kHz AudioContext so the browser does the resampling;
+# if it can't (some browsers only record at the device rate) frames arrive at the native
+# rate and are low-pass filtered and resampled here, with filter state kept across frames.
+# calibrate_silence, record_until_silence, LiveSentiment and the post-call analysis run
+# unchanged. The socket server runs on a daemon thread next to Streamlit
+# (BROWSER_CAPTURE_PORT); BROWSER_CAPTURE_URL overrides the address the browser dials,
+# e.g. wss://host/capture behind a TLS proxy (browsers only open the microphone on
+# https:// pages or localhost). The server only holds weak references to the streams, so a
+# stream (and its queued audio) goes away with its Streamlit session; one left disconnected
+# and unread for BROWSER_STREAM_TTL_S is closed earlier by a reaper thread.
+# `python browser_capture.py file.wav` stands in for a browser.
+BROWSER_CAPTURE_HOST = os.getenv("BROWSER_CAPTURE_HOST", "0.0.0.0")
+BROWSER_CAPTURE_PORT = int(os.getenv("BROWSER_CAPTURE_PORT", "8502"))
+BROWSER_CAPTURE_URL = os.getenv("BROWSER_CAPTURE_URL", "")
+BROWSER_FRAME_MS = 100
+BROWSER_CONNECT_TIMEOUT_S = 30  # wait this long for the browser to open the microphone
+BROWSER_IDLE_TIMEOUT_S = 10     # no frames for this long → read_chunk returns silence
+BROWSER_BUFFER_S = 30           # audio queued per session before the oldest is dropped
+BROWSER_STREAM_TTL_S = 600      # a disconnected stream unused this long is closed
+_MAX_FRAME_BYTES = 1 << 20
+_LOWPASS_TAPS = 63
+
+
+def _lowpass(rate: int) -> np.ndarray:
+    """Windowed-sinc anti-aliasing filter for `rate` → SAMPLE_RATE (cutoff 90% of the new Nyquist)."""
+    fc = 0.45 * SAMPLE_RATE / rate
+    n = np.arange(_LOWPASS_TAPS) - (_LOWPASS_TAPS - 1) / 2
+    h = 2 * fc * np.sinc(2 * fc * n) * np.blackman(_LOWPASS_TAPS)
+    return (h / h.sum()).astype(np.float32)
+
+
+class BrowserStream:
+    """PCM from one browser session; read_chunk(n) blocks like the microphone reader."""
+
+    def __init__(self, token: str):
+        self.token = token
+        self.connected = threading.Event()
+        self.sample_rate = SAMPLE_RATE   # rate the browser sends at (resampled on arrival)
+        self.samples_received = 0        # after resampling to SAMPLE_RATE
+        self.samples_dropped = 0
+        self.closed = False
+        self.last_active = time.monotonic()  # last frame, connect or read
+        self.on_disconnect: List[Callable[[], None]] = []
+        self._chunks: deque = deque()
+        self._queued = 0
+        self._open = False
+        self._cond = threading.Condition()
+        self._reset_resampler()
+
+    def _reset_resampler(self):
+        self._taps = _lowpass(self.sample_rate) if self.sample_rate > SAMPLE_RATE else None
+        self._hist = np.zeros(_LOWPASS_TAPS - 1 if self._taps is not None else 0, np.float32)
+        self._prev = np.float32(0.0)  # last input sample of the previous frame (filtered)
+        self._phase = 0.0             # next output position, in input samples from this frame's start
+
+    # ---- socket side ----
+    def _start(self, sample_rate: int):
+        with self._cond:
+            self.sample_rate = int(sample_rate) or SAMPLE_RATE
+            self._reset_resampler()
+            self._open = True
+            self.last_active = time.monotonic()
+            self.connected.set()
+            self._cond.notify_all()
+
+    def push(self, data: bytes):
+        """One binary frame of little-endian int16 samples at self.sample_rate."""
+        pcm = np.frombuffer(data[:len(data) // 2 * 2], "<i2").astype(np.float32) / 32768.0
+        if self.sample_rate != SAMPLE_RATE and len(pcm):
+            pcm = self._resample(pcm)
+        with self._cond:
+            if self.closed:
+                return
+            self._chunks.append(pcm)
+            self._queued += len(pcm)
+            self.samples_received += len(pcm)
+            self.last_active = time.monotonic()
+            limit = BROWSER_BUFFER_S * SAMPLE_RATE
+            while self._queued > limit and len(self._chunks) > 1:  # reader stalled: drop the oldest audio
+                dropped = self._chunks.popleft()
+                self._queued -= len(dropped)
+                self.samples_dropped += len(dropped)
+            self._cond.notify_all()
+
+    def _resample(self, x: np.ndarray) -> np.ndarray:
+        """Low-pass (when downsampling) and resample one frame, continuing the previous one."""
+        if self._taps is not None:
+            buf = np.concatenate([self._hist, x])
+            self._hist = buf[len(buf) - len(self._hist):]
+            x = np.convolve(buf, self._taps, "valid").astype(np.float32)
+        step = self.sample_rate / SAMPLE_RATE
+        at = np.arange(self._phase, len(x), step)  # output times in this frame's samples
+        xp = np.concatenate([[self._prev], x])     # xp[i + 1] is x[i]; xp[0] bridges frames
+        out = np.interp(at + 1, np.arange(len(xp)), xp).astype(np.float32)
+        self._prev = x[-1]
+        self._phase = (at[-1] + step - len(x)) if len(at) else self._phase - len(x)
+        return out
+
+    def _stop(self):
+        with self._cond:
+            was_open, self._open = self._open, False
+            self.connected.clear()
+            self._cond.notify_all()
+        if was_open:
+            for callback in list(self.on_disconnect):
+                callback()
+
+    # ---- capture side ----
+    def reset(self):
+        """Drop queued audio and disconnect callbacks (start of a new call)."""
+        with self._cond:
+            self._chunks.clear()
+            self._queued = 0
+            self.on_disconnect.clear()
+
+    def close(self):
+        """Drop queued audio and stop accepting frames (CaptureServer.close_stream)."""
+        with self._cond:
+            self.closed = True
+            self._chunks.clear()
+            self._queued = 0
+            self.on_disconnect.clear()
+            self._cond.notify_all()
+
+    def wait_connected(self, timeout: float = BROWSER_CONNECT_TIMEOUT_S) -> bool:
+        return self.connected.wait(timeout)
+
+    def read_chunk(self, n: int) -> np.ndarray:
+        """n frames as an (n, 1) float32 chunk; zero-padded once the browser goes quiet or disconnects."""
+        deadline = time.monotonic() + BROWSER_IDLE_TIMEOUT_S
+        with self._cond:
+            self.last_active = time.monotonic()
+            while self._queued < n and self._open:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            parts, need = [], n
+            while need and self._chunks:
+                c = self._chunks.popleft()
+                if len(c) > need:
+                    self._chunks.appendleft(c[need:])
+                    c = c[:need]
+                parts.append(c)
+                need -= len(c)
+                self._queued -= len(c)
+        if need:
+            parts.append(np.zeros(need, np.float32))
+        return np.concatenate(parts).reshape(-1, 1)
+
+
+class CaptureServer:
+    """WebSocket endpoint /capture/<token>; one BrowserStream per token (held weakly: the
+    session that opened it keeps it alive)."""
+
+    def __init__(self, host: str = BROWSER_CAPTURE_HOST, port: int = BROWSER_CAPTURE_PORT,
+                 ttl_s: float = BROWSER_STREAM_TTL_S):
+        from websockets.sync.server import serve
+        self.ttl_s = ttl_s
+        self._streams: "weakref.WeakValueDictionary[str, BrowserStream]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = serve(self._handle, host, port, max_size=_MAX_FRAME_BYTES)
+        self.port = self._server.socket.getsockname()[1]
+        threading.Thread(target=self._server.serve_forever, name="browser-capture", daemon=True).start()
+        threading.Thread(target=self._reap_loop, name="browser-capture-reaper", daemon=True).start()
+
+    def open_stream(self) -> BrowserStream:
+        stream = BrowserStream(secrets.token_urlsafe(16))
+        with self._lock:
+            self._streams[stream.token] = stream
+        return stream
+
+    def close_stream(self, stream: BrowserStream):
+        """Forget the token and drop the stream's queued audio."""
+        with self._lock:
+            self._streams.pop(stream.token, None)
+        stream.close()
+
+    def expire(self) -> int:
+        """Close streams that are disconnected and unused for ttl_s → number closed."""
+        cutoff = time.monotonic() - self.ttl_s
+        with self._lock:
+            idle = [s for s in self._streams.values() if not s._open and s.last_active < cutoff]
+        for stream in idle:
+            self.close_stream(stream)
+        return len(idle)
+
+    def _reap_loop(self):
+        while not self._stopped.wait(min(60.0, self.ttl_s)):
+            try:
+                self.expire()
+            except Exception as e:
+                print(f"⚠️ browser capture reaper: {e}")
+
+    def url(self, stream: BrowserStream) -> str:
+        """Socket URL for `stream` ("" → the component dials this port on the page's own host)."""
+        return f"{BROWSER_CAPTURE_URL.rstrip('/')}/{stream.token}" if BROWSER_CAPTURE_URL else ""
+
+    def _handle(self, ws):
+        token = ws.request.path.rstrip("/").rsplit("/", 1)[-1]
+        with self._lock:
+            stream = self._streams.get(token)
+        if stream is None:
+            ws.close(1008, "unknown capture session")
+            return
+        stream._start(SAMPLE_RATE)
+        try:
+            for message in ws:
+                if isinstance(message, bytes):
+                    stream.push(message)
+                    continue
+                msg = json.loads(message or "{}")
+                if msg.get("type") == "start":
+                    stream._start(msg.get("sampleRate") or SAMPLE_RATE)
+                elif msg.get("type") == "stop":
+                    break
+        except Exception as e:
+            print(f"⚠️ browser capture {token[:6]}: {e}")
+        finally:
+            stream._stop()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._server.shutdown()
+
+
+_server: Optional[CaptureServer] = None
+_server_lock = threading.Lock()
+
+
+def get_capture_server() -> CaptureServer:
+    """Process-wide socket server (started on first use)."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = CaptureServer()
+        return _server
+
+
+_COMPONENT = """
+<div id="status" style="font:13px sans-serif;color:#6B7280">🎙️ Connecting microphone…</div>
+<script>
+(async () => {
+  const status = document.getElementById("status");
+  let url = __URL__;
+  if (!url) {
+    const page = window.parent.location;
+    url = (page.protocol === "https:" ? "wss://" : "ws://") + page.hostname + ":__PORT__/capture/__TOKEN__";
+  }
+  try {
+    const mic = await navigator.mediaDevices.getUserMedia(
+      {audio: {channelCount: 1, echoCancellation: true, noiseSuppression: true, autoGainControl: false}});
+    const ws = new WebSocket(url);
+    ws.binaryType = "arraybuffer";
+    await new Promise((ok, fail) => { ws.onopen = ok; ws.onerror = () => fail(new Error("socket " + url)); });
+    let ctx = new AudioContext({sampleRate: __RATE__}), src;  // the browser resamples to 16 kHz
+    try { src = ctx.createMediaStreamSource(mic); }
+    catch (e) { ctx.close(); ctx = new AudioContext(); src = ctx.createMediaStreamSource(mic); }  // device rate only
+    ws.send(JSON.stringify({type: "start", sampleRate: ctx.sampleRate}));
+    const tap = "class Tap extends AudioWorkletProcessor { process(inputs) {"
+              + " if (inputs[0][0]) this.port.postMessage(inputs[0][0].slice(0)); return true; } }"
+              + " registerProcessor('pcm-tap', Tap);";
+    await ctx.audioWorklet.addModule(URL.createObjectURL(new Blob([tap], {type: "application/javascript"})));
+    const node = new AudioWorkletNode(ctx, "pcm-tap");
+    const size = Math.round(ctx.sampleRate * __FRAME_MS__ / 1000);
+    let frame = new Int16Array(size), fill = 0;
+    node.port.onmessage = (e) => {
+      for (const v of e.data) {
+        frame[fill++] = Math.max(-1, Math.min(1, v)) * 32767;
+        if (fill === size) {
+          if (ws.readyState === 1) ws.send(frame.buffer);
+          frame = new Int16Array(size); fill = 0;
+        }
+      }
+    };
+    const mute = ctx.createGain(); mute.gain.value = 0;
+    src.connect(node).connect(mute).connect(ctx.destination);
+    status.textContent = "🔴 Streaming this browser's microphone (" + ctx.sampleRate / 1000 + " kHz)";
+    ws.onclose = () => { status.textContent = "⏹️ Microphone stream closed"; mic.getTracks().forEach(t => t.stop()); ctx.close(); };
+    window.addEventListener("pagehide", () => ws.close());
+  } catch (err) {
+    status.textContent = "⚠️ Browser microphone unavailable: " + err.message;
+  }
+})();
+</script>
+"""
+
+
+def capture_component(stream: BrowserStream, server: Optional[CaptureServer] = None, height: int = 40):
+    """Render the in-page recorder for `stream` (streams until it is removed from the page)."""
+    import streamlit.components.v1 as components
+    server = server or get_capture_server()
+    html = (_COMPONENT.replace("__URL__", json.dumps(server.url(stream)))
+            .replace("__PORT__", str(server.port))
+            .replace("__TOKEN__", stream.token)
+            .replace("__FRAME_MS__", str(BROWSER_FRAME_MS))
+            .replace("__RATE__", str(SAMPLE_RATE)))
+    components.html(html, height=height)
+
+
+# ---- Local test client (stands in for a browser) ----
+def stream_wav(url: str, path: str = "", seconds: float = 20.0, speed: float = 1.0, frame_ms: int = BROWSER_FRAME_MS):
+    """Send a WAV (or synthetic speech-like noise after 3 s of quiet) to a capture URL."""
+    from websockets.sync.client import connect
+    if path:
+        import wave
+        with wave.open(path, "rb") as wf:
+            rate, ch = wf.getframerate(), wf.getnchannels()
+            pcm = np.frombuffer(wf.readframes(wf.getnframes()), np.int16).reshape(-1, ch).mean(axis=1).astype(np.int16)
+    else:
+        rate = 48000
+        rng = np.random.default_rng(0)
+        t = np.arange(int(seconds * rate)) / rate
+        speech = rng.standard_normal(len(t)) * 3000 * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2)
+        pcm = np.concatenate([rng.standard_normal(3 * rate) * 30, speech]).astype(np.int16)
+    step = int(rate * frame_ms / 1000)
+    with connect(url, max_size=_MAX_FRAME_BYTES) as ws:
+        ws.send(json.dumps({"type": "start", "sampleRate": rate}))
+        for i in range(0, len(pcm), step):
+            ws.send(pcm[i:i + step].tobytes())
+            if speed > 0:
+                time.sleep(frame_ms / 1000 / speed)
+        ws.send(json.dumps({"type": "stop"}))
+    return len(pcm) / rate
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Stream a WAV to a running app's browser-capture socket")
+    ap.add_argument("wav", nargs="?", default="", help="16-bit PCM WAV (default: synthetic call)")
+    ap.add_argument("--url", required=True, help="ws://host:8502/capture/<token> (token shown in the Record tab)")
+    ap.add_argument("--speed", type=float, default=1.0, help="1 = real time, 0 = as fast as possible")
+    args = ap.parse_args()
+    sent = stream_wav(args.url, args.wav, speed=args.speed)
+    print(f"✅ streamed {sent:.1f}s of audio → {args.url}")
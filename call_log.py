@@ -0,0 +1,183 @@
+import bisect
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from google_sheets import HEADERS
+
+# 📜 Paged, filtered reads over the main call log (sheet1, or its monthly shards).
+# Only the columns needed to evaluate filters are scanned; the visible page is then
+# fetched in one batch request per shard it spans, projected to the requested columns.
+
+
+@dataclass(frozen=True)
+class CallQuery:
+    start: Optional[str] = None          # inclusive "YYYY-MM-DD HH:MM:SS" (prefix ok)
+    end: Optional[str] = None            # inclusive
+    sentiments: Tuple[str, ...] = ()
+    emotions: Tuple[str, ...] = ()
+    text: str = ""
+    columns: Tuple[str, ...] = tuple(HEADERS)
+
+    @property
+    def is_filtered(self) -> bool:
+        return bool(self.start or self.end or self.sentiments or self.emotions or self.text.strip())
+
+
+@dataclass
+class CallPage:
+    columns: List[str]
+    rows: List[List[str]]
+    offset: int
+    page_size: int
+    total: int
+    row_numbers: List[int] = field(default_factory=list)
+
+    @property
+    def next_cursor(self) -> Optional[int]:
+        nxt = self.offset + self.page_size
+        return nxt if nxt < self.total else None
+
+    @property
+    def prev_cursor(self) -> Optional[int]:
+        return max(self.offset - self.page_size, 0) if self.offset > 0 else None
+
+
+def _col_letter(idx: int) -> str:
+    """0-based column index → A1 letter(s)."""
+    s, n = "", idx + 1
+    while n:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def _label(v: str) -> str:
+    s = (v or "").strip()
+    return s.split()[0].strip(",. ").title() if s else ""
+
+
+def in_range(t: str, start: Optional[str], end: Optional[str]) -> bool:
+    """Timestamp t within [start, end]; both bounds inclusive and may be prefixes ("2024-01")."""
+    return not ((start and t < start) or (end and t[:len(end)] > end))
+
+
+def count_rows(ws) -> int:
+    """Number of data rows (excluding the header) using a single-column read."""
+    return max(len(ws.col_values(1)) - 1, 0)
+
+
+def matching_rows(ws, query: CallQuery, total: Optional[int] = None) -> Sequence[int]:
+    """Sheet row numbers (newest first) that satisfy the query's filters."""
+    if total is None:
+        total = count_rows(ws)
+    if not query.is_filtered:
+        return range(total + 1, 1, -1)
+
+    needed = []
+    if query.start or query.end: needed.append("Timestamp")
+    if query.sentiments: needed.append("Sentiment")
+    if query.emotions: needed.append("Emotion")
+    if query.text.strip(): needed.append("Transcript")
+    letters = [_col_letter(HEADERS.index(c)) for c in needed]
+    cols = dict(zip(needed, ws.batch_get([f"{L}2:{L}{total + 1}" for L in letters])))
+
+    def column(name):
+        vals = [r[0] if r else "" for r in cols.get(name, [])]
+        return vals + [""] * (total - len(vals))
+
+    keep = [True] * total
+    if "Timestamp" in cols:
+        for i, t in enumerate(column("Timestamp")):
+            if not in_range(t, query.start, query.end):
+                keep[i] = False
+    if "Sentiment" in cols:
+        wanted = {s.title() for s in query.sentiments}
+        for i, v in enumerate(column("Sentiment")):
+            if keep[i] and _label(v) not in wanted: keep[i] = False
+    if "Emotion" in cols:
+        wanted = {e.title() for e in query.emotions}
+        for i, v in enumerate(column("Emotion")):
+            if keep[i] and _label(v) not in wanted: keep[i] = False
+    if "Transcript" in cols:
+        needle = query.text.strip().lower()
+        for i, v in enumerate(column("Transcript")):
+            if keep[i] and needle not in v.lower(): keep[i] = False
+
+    return [i + 2 for i in range(total - 1, -1, -1) if keep[i]]
+
+
+class ShardRows(Sequence):
+    """Matching rows across call-log shards, newest first; items are (worksheet title, row)."""
+
+    def __init__(self, segments: List[Tuple[str, Sequence[int]]]):
+        self.segments = [(t, rows) for t, rows in segments if len(rows)]
+        self._ends, n = [], 0
+        for _, rows in self.segments:
+            n += len(rows)
+            self._ends.append(n)
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        k = bisect.bisect_right(self._ends, i)
+        title, rows = self.segments[k]
+        return title, rows[i - (self._ends[k - 1] if k else 0)]
+
+
+def matching_shard_rows(router, query: CallQuery) -> ShardRows:
+    """matching_rows() over the call-log shards that overlap the query's date range."""
+    shards = router.shards("calls", query.start, query.end)
+    return ShardRows([(s.title, matching_rows(router.worksheet(s), query)) for s in reversed(shards)])
+
+
+def fetch_page(ws, query: CallQuery, cursor: int = 0, page_size: int = 50,
+               row_numbers: Optional[Sequence] = None) -> CallPage:
+    """
+    Fetch one page of the call log. `row_numbers` can be a cached matching_rows() result.
+    `ws` may be a shards.ShardRouter, in which case rows come from matching_shard_rows().
+    """
+    sharded = hasattr(ws, "shards")
+    if row_numbers is None:
+        row_numbers = matching_shard_rows(ws, query) if sharded else matching_rows(ws, query)
+    columns = [c for c in query.columns if c in HEADERS] or list(HEADERS)
+    offset = max(0, min(cursor, max(len(row_numbers) - 1, 0)))
+    page_rows = list(row_numbers[offset:offset + page_size])
+    if not page_rows:
+        return CallPage(columns, [], offset, page_size, len(row_numbers))
+
+    idx = [HEADERS.index(c) for c in columns]
+    if not sharded:
+        rows = _fetch_rows(ws, page_rows, idx)
+    else:
+        rows, i = [], 0
+        while i < len(page_rows):  # consecutive refs from the same shard → one batch request
+            j = i
+            while j < len(page_rows) and page_rows[j][0] == page_rows[i][0]:
+                j += 1
+            rows += _fetch_rows(ws.worksheet(page_rows[i][0]), [r for _, r in page_rows[i:j]], idx)
+            i = j
+    return CallPage(columns, rows, offset, page_size, len(row_numbers), page_rows)
+
+
+def _fetch_rows(ws, page_rows: List[int], idx: List[int]) -> List[List[str]]:
+    """Rows `page_rows` of one worksheet, projected to column indexes `idx`."""
+    n = len(page_rows)
+    if page_rows == list(range(page_rows[0], page_rows[0] - n, -1)):
+        # contiguous block (unfiltered paging) → one column range per projected column
+        lo, hi = page_rows[-1], page_rows[0]
+        blocks = ws.batch_get([f"{_col_letter(i)}{lo}:{_col_letter(i)}{hi}" for i in idx])
+        cols = [[(r[0] if r else "") for r in vr] + [""] * (n - len(vr)) for vr in blocks]
+        rows = [list(r) for r in zip(*cols)][::-1]
+    else:
+        # scattered matches → one single-row range per match, same batch request
+        base = min(idx)
+        first, last = _col_letter(base), _col_letter(max(idx))
+        raw = ws.batch_get([f"{first}{r}:{last}{r}" for r in page_rows])
+        raw = [vr[0] if vr else [] for vr in raw]
+        rows = [[(r[i - base] if i - base < len(r) else "") for i in idx] for r in raw]
+    return rows
@@ -1,21 +1,89 @@
 import os
-from groq import Groq
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-
-# ✅ Groq setup
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+import tempfile
+import threading
 
 # 🎤 Audio settings
 SAMPLE_RATE = 16000
-CHANNELS = 1
+CHANNELS = int(os.getenv("AUDIO_CHANNELS", "1"))
 SILENCE_LIMIT = 5
+# "server": this host's sound card (sounddevice); "browser": each agent's browser streams
+# its microphone over a WebSocket (browser_capture.py), mono only
+CAPTURE_SOURCE = os.getenv("CAPTURE_SOURCE", "server").lower()
+
+# 🎚️ Multi-channel capture: one logical line/speaker per input channel.
+# Stereo defaults to agent on the left channel and customer on the right.
+CHANNEL_LABELS = [s.strip() for s in os.getenv("CHANNEL_LABELS", "").split(",") if s.strip()] or (
+    ["Agent", "Customer"] if CHANNELS == 2 else [f"Line {i + 1}" for i in range(CHANNELS)]
+)
+CUSTOMER_CHANNEL = int(os.getenv("CUSTOMER_CHANNEL", "1" if CHANNELS == 2 else "0"))
 CSV_FILE = "groq_transcripts.csv"
 
+# 🗄️ Local audio archive (compressed, content-addressed recordings)
+ARCHIVE_DIR = os.getenv("AUDIO_ARCHIVE_DIR", "audio_archive")
+
+# 💾 Capture memory budget: recordings past these sizes spill to a memory-mapped file
+# (float32 audio: ~3.7 MB per minute per channel at 16 kHz)
+AUDIO_SESSION_BUDGET_MB = float(os.getenv("AUDIO_SESSION_BUDGET_MB", "128"))
+AUDIO_PROCESS_BUDGET_MB = float(os.getenv("AUDIO_PROCESS_BUDGET_MB", "1024"))
+AUDIO_SPILL_DIR = os.getenv("AUDIO_SPILL_DIR", os.path.join(tempfile.gettempdir(), "aisales-spill"))
+# Finished recordings held in Streamlit session state (int16) across all browser sessions;
+# past this the least recently used ones move to disk
+AUDIO_RETAIN_BUDGET_MB = float(os.getenv("AUDIO_RETAIN_BUDGET_MB", "256"))
+
+# ⏱️ Startup budget: time from process start to the first prompt (see main.py)
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_S", "1.5"))
+
 # 🔹 Google Sheets setup
-scope = ["https://spreadsheets.google.com/feeds","https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-client_gs = gspread.authorize(creds)
-sheet = client_gs.open("AI Sales Call Assistant").sheet1
+# SHEETS_BACKEND=fake swaps in the offline stand-in from fake_sheets.py (no Google auth).
+SHEETS_BACKEND = os.getenv("SHEETS_BACKEND", "google").lower()
+SPREADSHEET_NAME = "AI Sales Call Assistant"
+CREDENTIALS_FILE = "credentials.json"
+SHEETS_TIMEOUT_S = float(os.getenv("SHEETS_TIMEOUT_S", "30"))  # per HTTP request
+GROQ_TIMEOUT_S = float(os.getenv("GROQ_TIMEOUT_S", "60"))      # default when no stage budget applies
+
+# ✅ Connections are created on first use, not at import time, so importing any
+# module (calibration, batch tools, tests) doesn't wait on Google auth or Groq.
+_groq_lock = threading.Lock()
+_sheet_lock = threading.Lock()
+_groq_client = None
+_sheet = None
+
+
+def get_groq_client():
+    """Shared Groq client (created once, thread-safe)."""
+    global _groq_client
+    if _groq_client is None:
+        with _groq_lock:
+            if _groq_client is None:
+                from groq import Groq
+                _groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"), timeout=GROQ_TIMEOUT_S)
+    return _groq_client
+
+
+def get_sheet():
+    """Shared handle to sheet1 of the call-log spreadsheet (authorized once, thread-safe)."""
+    global _sheet
+    if _sheet is None:
+        with _sheet_lock:
+            if _sheet is None:
+                if SHEETS_BACKEND == "fake":
+                    from fake_sheets import open_fake_spreadsheet
+                    _sheet = open_fake_spreadsheet().sheet1
+                else:
+                    import gspread
+                    from oauth2client.service_account import ServiceAccountCredentials
+                    scope = ["https://spreadsheets.google.com/feeds","https://www.googleapis.com/auth/drive"]
+                    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, scope)
+                    client_gs = gspread.authorize(creds)
+                    client_gs.set_timeout(SHEETS_TIMEOUT_S)
+                    _sheet = client_gs.open(SPREADSHEET_NAME).sheet1
+    return _sheet
 
 
+def __getattr__(name):
+    # Backwards compatibility for `config.client` / `config.sheet` attribute access.
+    if name == "client":
+        return get_groq_client()
+    if name == "sheet":
+        return get_sheet()
+    raise AttributeError(f"module 'config' has no attribute {name!r}")
@@ -0,0 +1,115 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# 👤 CRM helpers shared by the Record and Purchasing History tabs.
+# The customer picker view is built once per CRM snapshot (keyed by a content
+# fingerprint) with column-wise operations, then reused by every rerun.
+
+SELECT_PLACEHOLDER = "— Select —"
+
+
+def parse_products(cell: str):
+    if not cell: return []
+    parts = [p.strip() for p in str(cell).split(",") if p.strip()]
+    seen, out = set(), []
+    for p in parts:
+        low = p.lower()
+        if low not in seen: out.append(p); seen.add(low)
+    return out
+
+
+def rank_products(products, sentiment: str):
+    if not isinstance(sentiment, str) or not products: return []
+    s = sentiment.strip().lower()
+    if "neg" in s:
+        soft, hard = [], []
+        for p in products:
+            pl = p.lower()
+            if any(k in pl for k in ["trial", "demo", "lite", "basic"]): soft.append(p)
+            else: hard.append(p)
+        return soft + hard if soft else products
+    return products
+
+
+def _text_col(df: pd.DataFrame, name: str) -> pd.Series:
+    if name not in df.columns:
+        return pd.Series([""] * len(df), index=df.index, dtype=object)
+    return df[name].fillna("").astype(str)
+
+
+def crm_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of the CRM frame (values + column names)."""
+    h = hashlib.sha1("|".join(map(str, df.columns)).encode())
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df.astype(str), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def get_customer_options(df: pd.DataFrame):
+    """(labels, label → email) built column-wise; later duplicates win, as before."""
+    name, company, email = _text_col(df, "CustomerName"), _text_col(df, "Company"), _text_col(df, "Email")
+    labels = np.where(company != "", name + " — " + company, name).tolist()
+    return labels, dict(zip(labels, email.tolist()))
+
+
+def get_customer_by_email(df: pd.DataFrame, email: str) -> dict:
+    if not email: return {}
+    hit = df.loc[df["Email"] == email]
+    if hit.empty: return {}
+    return hit.iloc[0].to_dict()
+
+
+class CustomerView:
+    """Precomputed picker labels, lookup maps and parsed product lists for one CRM snapshot."""
+
+    def __init__(self, df: pd.DataFrame, fingerprint: str):
+        self.df = df
+        self.fingerprint = fingerprint
+        self.labels, self.id_map = get_customer_options(df)
+        self.options = [SELECT_PLACEHOLDER] + self.labels
+        self.option_index = {lbl: i for i, lbl in enumerate(self.options)}
+
+        emails = _text_col(df, "Email").tolist()
+        # first row wins for duplicate emails (matches get_customer_by_email)
+        self._row_by_email: Dict[str, int] = {}
+        for pos, e in enumerate(emails):
+            if e and e not in self._row_by_email:
+                self._row_by_email[e] = pos
+        self._products = [parse_products(c) for c in _text_col(df, "RecommendedProducts").tolist()]
+
+    def index_of(self, label) -> int:
+        return self.option_index.get(label, 0)
+
+    def customer(self, email: str) -> dict:
+        pos = self._row_by_email.get(email or "")
+        return {} if pos is None else self.df.iloc[pos].to_dict()
+
+    def products(self, email: str) -> List[str]:
+        pos = self._row_by_email.get(email or "")
+        return [] if pos is None else list(self._products[pos])
+
+
+_views: "OrderedDict[str, CustomerView]" = OrderedDict()
+_views_lock = threading.Lock()
+_MAX_VIEWS = 4
+
+
+def customer_view(df: pd.DataFrame) -> CustomerView:
+    """Memoized CustomerView; uses df.attrs['fingerprint'] when load_crm_df set it."""
+    fp = df.attrs.get("fingerprint") or crm_fingerprint(df)
+    with _views_lock:
+        view = _views.get(fp)
+        if view is not None:
+            _views.move_to_end(fp)
+            return view
+    view = CustomerView(df, fp)
+    with _views_lock:
+        _views[fp] = view
+        while len(_views) > _MAX_VIEWS:
+            _views.popitem(last=False)
+    return view
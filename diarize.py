@@ -0,0 +1,134 @@
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import SAMPLE_RATE
+
+# 🗣️ CPU speaker segmentation (agent vs customer) for single-channel calls.
+#   frames (32 ms, 16 ms hop) → mel band log-energies → cepstra (DCT, c0 dropped so
+#   loudness doesn't decide the speaker) → averaged per WINDOW_S window → voiced
+#   windows split into two clusters (2-means) → majority smoothing → segments.
+# The first speaker heard is the agent (they open the call) unless
+# AGENT_SPEAKS_FIRST=0. Everything is NumPy and runs in a few ms per minute of audio.
+SPEAKER_SEGMENTATION = os.getenv("SPEAKER_SEGMENTATION", "1") == "1"
+AGENT_SPEAKS_FIRST = os.getenv("AGENT_SPEAKS_FIRST", "1") == "1"
+WINDOW_S = 0.5
+
+AGENT, CUSTOMER = "Agent", "Customer"
+
+_FRAME, _HOP, _BANDS, _CEPS = 512, 256, 24, 13
+_BLOCK = 8192  # frames per FFT block
+_PER_WIN = max(int(WINDOW_S * SAMPLE_RATE / _HOP), 1)  # hops averaged per window
+_WIN_S = _PER_WIN * _HOP / SAMPLE_RATE  # actual window length (0.496 s at 16 kHz)
+_MIN_SHARE = 0.1       # a "speaker" with less than this share of voiced time is noise
+_MIN_SEPARATION = 1.0  # centroid distance (in pooled std units) needed to trust two speakers
+
+
+def _mel(f):
+    return 2595.0 * np.log10(1.0 + f / 700.0)
+
+
+def _filterbank(n_fft: int = _FRAME, bands: int = _BANDS, lo: float = 80.0, hi: float = 4000.0) -> np.ndarray:
+    """(n_fft//2+1, bands) triangular mel filters."""
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / SAMPLE_RATE)
+    edges = 700.0 * (10 ** (np.linspace(_mel(lo), _mel(hi), bands + 2) / 2595.0) - 1.0)
+    left, centre, right = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    up = (freqs[None, :] - left) / (centre - left)
+    down = (right - freqs[None, :]) / (right - centre)
+    return np.clip(np.minimum(up, down), 0.0, None).T.astype(np.float32)
+
+
+_FB = _filterbank()
+_DCT = np.cos(np.pi / _BANDS * (np.arange(_BANDS)[:, None] + 0.5) * np.arange(_CEPS)[None, :]).astype(np.float32)
+_WINDOW = np.hanning(_FRAME).astype(np.float32)
+
+
+def window_features(pcm: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-window (cepstra without c0, log energy) for mono PCM (int16 or float)."""
+    x = np.asarray(pcm).reshape(-1)
+    scale = np.float32(1.0 / 32768.0) if x.dtype == np.int16 else np.float32(1.0)
+    if x.size < _FRAME:
+        return np.zeros((0, _CEPS - 1), np.float32), np.zeros(0, np.float32)
+    frames = sliding_window_view(x, _FRAME)[::_HOP]  # strided view, no copy
+    ceps = np.empty((len(frames), _CEPS), np.float32)
+    for i in range(0, len(frames), _BLOCK):
+        blk = frames[i:i + _BLOCK].astype(np.float32) * scale * _WINDOW
+        power = np.abs(np.fft.rfft(blk, axis=1)) ** 2
+        ceps[i:i + _BLOCK] = np.log(power @ _FB + 1e-10) @ _DCT
+
+    n_win = len(ceps) // _PER_WIN
+    if n_win == 0:
+        return np.zeros((0, _CEPS - 1), np.float32), np.zeros(0, np.float32)
+    ceps = ceps[:n_win * _PER_WIN].reshape(n_win, _PER_WIN, _CEPS).mean(axis=1)
+    return ceps[:, 1:], ceps[:, 0]
+
+
+def _two_means(feats: np.ndarray, iters: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+    """2-means with farthest-point initialisation → (labels, centroids)."""
+    c1 = feats[np.argmax(((feats - feats.mean(axis=0)) ** 2).sum(axis=1))]
+    c0 = feats[np.argmax(((feats - c1) ** 2).sum(axis=1))]
+    cents = np.stack([c0, c1])
+    labels = None
+    for _ in range(iters):
+        d = ((feats[:, None, :] - cents[None, :, :]) ** 2).sum(axis=2)
+        new = d.argmin(axis=1).astype(np.int8)
+        if labels is not None and np.array_equal(new, labels):
+            break
+        labels = new
+        for k in (0, 1):
+            if (labels == k).any():
+                cents[k] = feats[labels == k].mean(axis=0)
+    return labels, cents
+
+
+def _smooth(labels: np.ndarray, width: int = 5) -> np.ndarray:
+    """Majority vote over a sliding window (removes one-window speaker flips)."""
+    if len(labels) < width:
+        return labels
+    votes = np.convolve(labels.astype(np.float32), np.ones(width, np.float32) / width, mode="same")
+    return (votes > 0.5).astype(np.int8)
+
+
+def segment_speakers(pcm: np.ndarray) -> List[Tuple[float, float, str]]:
+    """
+    [(start_s, end_s, "Agent" | "Customer"), ...] for the voiced parts of a mono call.
+    Returns [] when the call doesn't look like two distinct speakers.
+    """
+    feats, energy = window_features(pcm)
+    if len(feats) < 4:
+        return []
+    floor = np.percentile(energy, 10)
+    voiced = np.flatnonzero(energy > floor + 0.25 * (energy.max() - floor))
+    if len(voiced) < 4:
+        return []
+    f = feats[voiced]
+    f = (f - f.mean(axis=0)) / (f.std(axis=0) + 1e-6)
+    labels, cents = _two_means(f)
+    share = labels.mean()
+    if min(share, 1 - share) < _MIN_SHARE or np.linalg.norm(cents[0] - cents[1]) < _MIN_SEPARATION:
+        return []
+    labels = _smooth(labels)
+    first = labels[0]
+    agent_label = first if AGENT_SPEAKS_FIRST else 1 - first
+
+    segments: List[Tuple[float, float, str]] = []
+    for w, lab in zip(voiced, labels):
+        start, end = round(float(w * _WIN_S), 3), round(float((w + 1) * _WIN_S), 3)
+        speaker = AGENT if lab == agent_label else CUSTOMER
+        if segments and segments[-1][2] == speaker and start - segments[-1][1] <= _WIN_S:
+            segments[-1] = (segments[-1][0], end, speaker)
+        else:
+            segments.append((start, end, speaker))
+    return segments
+
+
+def speaker_at(segments: List[Tuple[float, float, str]], start: float, end: float) -> Optional[str]:
+    """Speaker with the most overlap with [start, end) (None if no voiced overlap)."""
+    overlap = {}
+    for s, e, who in segments:
+        o = min(e, end) - max(s, start)
+        if o > 0:
+            overlap[who] = overlap.get(who, 0.0) + o
+    return max(overlap, key=overlap.get) if overlap else None
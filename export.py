@@ -0,0 +1,186 @@
+"""
+Streaming export of the call log and Summaries (joined with CRM fields).
+
+    python export.py calls --format csv --out calls.csv --start 2024-01-01 --end 2024-01-31
+    python export.py summaries --format parquet --out summaries.parquet --customer +15550000007
+
+Rows are read in fixed-size chunks from the shards that overlap the date range and
+written as they arrive, so memory stays at one chunk no matter how large the log is. Parquet needs pyarrow and
+Excel needs openpyxl; CSV has no extra dependencies.
+"""
+import csv
+import io
+import argparse
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+from call_log import count_rows, in_range, _col_letter
+from google_sheets import CRM_SHEET_NAME
+from shards import get_router, iter_chunks
+
+EXPORT_CHUNK_ROWS = 5000
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "xlsx": ".xlsx"}
+CRM_EXPORT_FIELDS = ["CustomerName", "Company", "Industry", "Email", "Budget"]
+
+
+@dataclass(frozen=True)
+class ExportQuery:
+    start: Optional[str] = None   # inclusive "YYYY-MM-DD[ HH:MM:SS]"
+    end: Optional[str] = None     # inclusive
+    customer: str = ""            # phone or email (Summaries only; the call log has no customer column)
+
+
+# ---- Reading (chunked) ----
+def _header(ws) -> List[str]:
+    rows = ws.get(f"A1:{_col_letter(25)}1")
+    return list(rows[0]) if rows else []
+
+
+def iter_sheet_chunks(ws, chunk_rows: int = EXPORT_CHUNK_ROWS,
+                      progress: Optional[Callable[[int, int], None]] = None) -> Iterator[List[Dict[str, str]]]:
+    """Yield the data rows of `ws` as lists of dicts, chunk_rows rows per sheet read."""
+    header = _header(ws)
+    if not header:
+        return
+    total = count_rows(ws)
+    last = _col_letter(len(header) - 1)
+    for lo in range(2, total + 2, chunk_rows):
+        hi = min(lo + chunk_rows - 1, total + 1)
+        block = ws.get(f"A{lo}:{last}{hi}")
+        yield [{h: (r[i] if i < len(r) else "") for i, h in enumerate(header)} for r in block]
+        if progress:
+            progress(hi - 1, total)
+
+
+def _crm_by_phone(ss) -> Dict[str, Dict[str, str]]:
+    """Phone → selected CRM fields (the CRM sheet is small compared to the logs)."""
+    try:
+        ws = ss.worksheet(CRM_SHEET_NAME)
+    except Exception:
+        return {}
+    out = {}
+    for chunk in iter_sheet_chunks(ws):
+        for r in chunk:
+            if r.get("Phone"):
+                out.setdefault(r["Phone"], {f: r.get(f, "") for f in CRM_EXPORT_FIELDS})
+    return out
+
+
+def export_rows(ss, dataset: str, query: ExportQuery = ExportQuery(), chunk_rows: int = EXPORT_CHUNK_ROWS,
+                progress: Optional[Callable[[int, int], None]] = None):
+    """(columns, iterator of row-chunks) for "calls" or "summaries", filtered by query."""
+    router = get_router(ss)
+    if dataset == "calls":
+        columns, crm = router.headers("calls"), None
+    elif dataset == "summaries":
+        crm = _crm_by_phone(ss)
+        columns = router.headers("summaries") + CRM_EXPORT_FIELDS
+    else:
+        raise ValueError(f"unknown dataset {dataset!r} (use 'calls' or 'summaries')")
+    date_col = "Timestamp"
+
+    customer = query.customer.strip().lower()
+    phones = None
+    if customer and crm is not None:
+        phones = {p for p, c in crm.items() if customer in (p.lower(), c.get("Email", "").lower())} or {query.customer}
+
+    def chunks():
+        for chunk in iter_chunks(router, dataset, query.start, query.end, chunk_rows, progress):
+            out = []
+            for r in chunk:
+                if (query.start or query.end) and not in_range(r.get(date_col, ""), query.start, query.end):
+                    continue
+                if crm is not None:
+                    if phones is not None and r.get("CustomerPhone", "") not in phones:
+                        continue
+                    r.update(crm.get(r.get("CustomerPhone", ""), dict.fromkeys(CRM_EXPORT_FIELDS, "")))
+                out.append([r.get(c, "") for c in columns])
+            if out:
+                yield out
+
+    return columns, chunks()
+
+
+# ---- Writing (streaming) ----
+def write_csv(columns, chunks, fh) -> int:
+    text = io.TextIOWrapper(fh, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    n = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        n += len(chunk)
+    text.detach()
+    return n
+
+
+def write_parquet(columns, chunks, fh) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from e
+    schema = pa.schema([(c, pa.string()) for c in columns])
+    n = 0
+    with pq.ParquetWriter(fh, schema, compression="zstd") as writer:
+        for chunk in chunks:  # one row group per chunk
+            cols = list(zip(*chunk))
+            writer.write_table(pa.table([pa.array(col, pa.string()) for col in cols], schema=schema))
+            n += len(chunk)
+    return n
+
+
+def write_xlsx(columns, chunks, fh) -> int:
+    try:
+        from openpyxl import Workbook
+    except ImportError as e:
+        raise RuntimeError("Excel export needs openpyxl (pip install openpyxl)") from e
+    wb = Workbook(write_only=True)  # rows are streamed to a temp file, not kept as cells
+    ws = wb.create_sheet("Export")
+    ws.append(columns)
+    n = 0
+    for chunk in chunks:
+        for row in chunk:
+            ws.append(row)
+        n += len(chunk)
+    wb.save(fh)
+    return n
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "xlsx": write_xlsx}
+
+
+def export(ss, dataset: str, fmt: str, fh, query: ExportQuery = ExportQuery(),
+           chunk_rows: int = EXPORT_CHUNK_ROWS, progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Stream `dataset` into the binary file object `fh` as `fmt`; returns rows written."""
+    if fmt not in WRITERS:
+        raise ValueError(f"unknown format {fmt!r} (use one of {', '.join(WRITERS)})")
+    columns, chunks = export_rows(ss, dataset, query, chunk_rows, progress)
+    return WRITERS[fmt](columns, chunks, fh)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("dataset", choices=["calls", "summaries"])
+    ap.add_argument("--format", choices=list(WRITERS), default="csv")
+    ap.add_argument("--out", help="output file (default: <dataset><ext>)")
+    ap.add_argument("--start", help="first day/time to include, e.g. 2024-01-01")
+    ap.add_argument("--end", help="last day/time to include, e.g. 2024-01-31")
+    ap.add_argument("--customer", default="", help="customer phone or email (summaries)")
+    ap.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    args = ap.parse_args()
+
+    from config import get_sheet
+    out = args.out or args.dataset + FORMATS[args.format]
+    query = ExportQuery(args.start, args.end, args.customer)
+
+    def progress(done, total):
+        print(f" {done:,}/{total:,} rows scanned ({done / max(total, 1):.0%})", end="\r")
+
+    with open(out, "wb") as fh:
+        n = export(get_sheet().spreadsheet, args.dataset, args.format, fh, query, args.chunk_rows, progress)
+    print(f"\n✅ {n:,} rows → {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+from collections import deque
+from typing import List, Optional
+
+# 🧪 Offline stand-in for the subset of gspread the app uses.
+# Enable with SHEETS_BACKEND=fake (optionally FAKE_SHEETS_PATH=... to persist to JSON).
+
+
+class FakeAPIError(Exception):
+    """Raised when the simulated per-minute quota is exhausted (mirrors a 429 from Google)."""
+
+    def __init__(self, message: str, code: int = 429):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeWorksheetNotFound(Exception):
+    pass
+
+
+def _parse_a1(a1: str):
+    """'B3' or 'B3:E9' → (row, col) of the top-left cell, 1-based."""
+    m = re.match(r"^\s*(?:'?[^!]*'?!)?([A-Za-z]+)(\d+)", a1 or "A1")
+    if not m:
+        raise ValueError(f"Unsupported range: {a1}")
+    col = 0
+    for ch in m.group(1).upper():
+        col = col * 26 + (ord(ch) - 64)
+    return int(m.group(2)), col
+
+
+def _parse_range(a1: str):
+    """'A2:E10', 'B:B' or 'C7' → (r1, c1, r2, c2); open ends are None."""
+    a1 = (a1 or "").split("!")[-1]
+    bounds = []
+    for part in a1.split(":"):
+        m = re.match(r"^\s*([A-Za-z]*)(\d*)\s*$", part)
+        if not m:
+            raise ValueError(f"Unsupported range: {a1}")
+        col = 0
+        for ch in m.group(1).upper():
+            col = col * 26 + (ord(ch) - 64)
+        bounds.append((int(m.group(2)) if m.group(2) else None, col or None))
+    (r1, c1), (r2, c2) = bounds[0], bounds[-1]
+    if len(bounds) == 1 and r1 is not None:
+        r2, c2 = r1, c1
+    return r1, c1, r2, c2
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title: str, rows: int = 1000, cols: int = 26):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self._rows: List[List[str]] = []
+        self._min_rows = rows
+        self.col_count = cols
+
+    @property
+    def row_count(self) -> int:
+        return max(self._min_rows, len(self._rows))
+
+    # ---- reads ----
+    def get_all_values(self) -> List[List[str]]:
+        self.spreadsheet._call("read")
+        return [list(r) for r in self._rows]
+
+    def get(self, range_name: str, **kwargs) -> List[List[str]]:
+        self.spreadsheet._call("read")
+        return self._slice(range_name)
+
+    def batch_get(self, ranges, **kwargs) -> List[List[List[str]]]:
+        self.spreadsheet._call("read")
+        return [self._slice(r) for r in ranges]
+
+    def col_values(self, col: int, **kwargs) -> List[str]:
+        self.spreadsheet._call("read")
+        out = [r[col - 1] if col - 1 < len(r) else "" for r in self._rows]
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def _slice(self, range_name: str) -> List[List[str]]:
+        r1, c1, r2, c2 = _parse_range(range_name)
+        lo, hi = (r1 or 1) - 1, (r2 or len(self._rows))
+        c_lo, c_hi = (c1 or 1) - 1, c2
+        out = []
+        for row in self._rows[lo:hi]:
+            cells = row[c_lo:c_hi]
+            while cells and not cells[-1]:
+                cells = cells[:-1]
+            out.append(cells)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    # ---- writes ----
+    def resize(self, rows: Optional[int] = None, cols: Optional[int] = None):
+        self.spreadsheet._call("write")
+        if rows is not None:
+            self._min_rows = rows
+        if cols is not None:
+            self.col_count = cols
+
+    def append_row(self, values, **kwargs):
+        self.spreadsheet._call("write")
+        self._rows.append([("" if v is None else str(v)) for v in values])
+        self.spreadsheet._dirty()
+
+    def append_rows(self, values, **kwargs):
+        self.spreadsheet._call("write")
+        self._rows.extend([("" if v is None else str(v)) for v in row] for row in values)
+        self.spreadsheet._dirty()
+
+    def insert_row(self, values, index: int = 1, **kwargs):
+        self.spreadsheet._call("write")
+        self._rows.insert(max(index - 1, 0), [("" if v is None else str(v)) for v in values])
+        self.spreadsheet._dirty()
+
+    def update(self, *args, **kwargs):
+        """Accept both gspread 5 (range, values) and gspread 6 (values, range) call orders."""
+        self.spreadsheet._call("write")
+        range_name = kwargs.get("range_name")
+        values = kwargs.get("values")
+        for a in args:
+            if isinstance(a, str) and range_name is None:
+                range_name = a
+            elif values is None:
+                values = a
+        r0, c0 = _parse_a1(range_name or "A1")
+        for dr, row in enumerate(values or []):
+            r = r0 - 1 + dr
+            while len(self._rows) <= r:
+                self._rows.append([])
+            target = self._rows[r]
+            for dc, v in enumerate(row):
+                c = c0 - 1 + dc
+                while len(target) <= c:
+                    target.append("")
+                target[c] = "" if v is None else str(v)
+        self.spreadsheet._dirty()
+
+
+class FakeSpreadsheet:
+    """
+    In-memory spreadsheet with configurable latency and quota simulation.
+
+    latency_s / jitter_s  → every API call sleeps latency_s + U(0, jitter_s)
+    read_quota / write_quota → max calls per rolling 60s window (0 = unlimited)
+    quota_mode → "raise" (FakeAPIError) or "block" (sleep until the window frees up)
+    """
+
+    def __init__(self, title: str = "AI Sales Call Assistant", path: Optional[str] = None,
+                 latency_s: float = 0.0, jitter_s: float = 0.0,
+                 read_quota: int = 0, write_quota: int = 0, quota_mode: str = "raise"):
+        self.title = title
+        self.path = path
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.quota = {"read": read_quota, "write": write_quota}
+        self.quota_mode = quota_mode
+        self.calls = {"read": 0, "write": 0}
+        self._windows = {"read": deque(), "write": deque()}
+        self._lock = threading.Lock()
+        self._sheets: List[FakeWorksheet] = []
+        if path and os.path.exists(path):
+            self._load(path)
+        if not self._sheets:
+            self._sheets.append(FakeWorksheet(self, "Sheet1"))
+
+    # ---- gspread-compatible surface ----
+    @property
+    def sheet1(self) -> FakeWorksheet:
+        return self._sheets[0]
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        return list(self._sheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._call("read")
+        for ws in self._sheets:
+            if ws.title == title:
+                return ws
+        raise FakeWorksheetNotFound(title)
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, index: Optional[int] = None):
+        self._call("write")
+        if any(ws.title == title for ws in self._sheets):
+            raise FakeAPIError(f'A sheet with the name "{title}" already exists.', code=400)
+        ws = FakeWorksheet(self, title, rows, cols)
+        if index is None:
+            self._sheets.append(ws)
+        else:
+            self._sheets.insert(index, ws)
+        self._dirty()
+        return ws
+
+    def values_batch_get(self, ranges, params=None):
+        """Several "'Title'!A1:B2" (or bare "'Title'") ranges in one read request."""
+        self._call("read")
+        by_title = {ws.title: ws for ws in self._sheets}
+        out = []
+        for r in ranges:
+            title, _, cells = r.rpartition("!") if "!" in r else (r, "", "")
+            if title.startswith("'") and title.endswith("'"):
+                title = title[1:-1].replace("''", "'")
+            if title not in by_title:
+                raise FakeAPIError(f"Unable to parse range: {r}", code=400)
+            values = by_title[title]._slice(cells) if cells else [list(row) for row in by_title[title]._rows]
+            out.append({"range": r, "majorDimension": "ROWS", **({"values": values} if values else {})})
+        return {"spreadsheetId": self.title, "valueRanges": out}
+
+    # ---- simulation ----
+    def _call(self, kind: str):
+        limit = self.quota.get(kind) or 0
+        while True:
+            with self._lock:
+                wait = 0.0
+                if limit:
+                    window = self._windows[kind]
+                    now = time.monotonic()
+                    while window and now - window[0] >= 60.0:
+                        window.popleft()
+                    if len(window) < limit:
+                        window.append(now)
+                    elif self.quota_mode != "block":
+                        raise FakeAPIError(f"Quota exceeded for {kind} requests per minute")
+                    else:
+                        wait = 60.0 - (now - window[0])
+                if not wait:
+                    self.calls[kind] += 1
+                    break
+            time.sleep(wait)  # outside the lock: other callers (and the other quota) keep going
+        delay = self.latency_s + (random.random() * self.jitter_s if self.jitter_s else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    # ---- file backing ----
+    def _dirty(self):
+        if self.path:
+            self.save()
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path:
+            return
+        data = {"title": self.title,
+                "sheets": [{"title": ws.title, "rows": ws._rows, "cols": ws.col_count} for ws in self._sheets]}
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _load(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.title = data.get("title", self.title)
+        for s in data.get("sheets", []):
+            ws = FakeWorksheet(self, s["title"], cols=s.get("cols", 26))
+            ws._rows = s.get("rows", [])
+            self._sheets.append(ws)
+
+
+def open_fake_spreadsheet(path: Optional[str] = None) -> FakeSpreadsheet:
+    """Build a FakeSpreadsheet from FAKE_SHEETS_* environment variables."""
+    return FakeSpreadsheet(
+        path=path if path is not None else (os.getenv("FAKE_SHEETS_PATH") or None),
+        latency_s=float(os.getenv("FAKE_SHEETS_LATENCY_S", "0") or 0),
+        jitter_s=float(os.getenv("FAKE_SHEETS_JITTER_S", "0") or 0),
+        read_quota=int(os.getenv("FAKE_SHEETS_READ_QUOTA", "0") or 0),
+        write_quota=int(os.getenv("FAKE_SHEETS_WRITE_QUOTA", "0") or 0),
+        quota_mode=os.getenv("FAKE_SHEETS_QUOTA_MODE", "raise"),
+    )
+
+
+# ---------------- Synthetic data ----------------
+_TRANSCRIPTS = [
+    "Hi, I wanted to ask about pricing for the enterprise plan.",
+    "We are not happy with the onboarding so far, it has been slow.",
+    "Can you send a demo link and the contract details?",
+    "Thanks, that answers my question about integrations.",
+    "I need to cancel unless the support response time improves.",
+    "Could we get a trial for the analytics dashboard first?",
+]
+_SENTIMENTS = ["Positive", "Negative", "Neutral"]
+_EMOTIONS = ["Joy", "Sadness", "Anger", "Fear", "Surprise"]
+_INDUSTRIES = {
+    "Retail": ["CRM Suite", "Analytics Dashboard", "POS System", "Loyalty App"],
+    "Healthcare": ["Telehealth Platform", "Patient CRM", "Analytics Dashboard"],
+    "Education": ["LMS Platform", "Online Classrooms", "CRM Suite"],
+    "Manufacturing": ["ERP Suite", "Predictive Maintenance", "IoT Sensors"],
+    "Agriculture": ["Yield Prediction AI", "IoT Sensors", "Analytics Dashboard"],
+}
+
+
+def generate_dataset(ss, calls: int, customers: int = 1000, summaries: Optional[int] = None,
+                     seed: int = 7, batch: int = 50_000):
+    """Fill sheet1, CRM and Summaries with deterministic synthetic rows."""
+    from google_sheets import (HEADERS, CRM_HEADERS, SUMMARIES_HEADERS,
+                               CRM_SHEET_NAME, SUMMARIES_SHEET_NAME, PRODUCT_PRICE_MAP)
+
+    rng = random.Random(seed)
+    summaries = calls if summaries is None else summaries
+    t0 = time.mktime((2024, 1, 1, 9, 0, 0, 0, 0, -1))
+
+    def ts(i, n):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t0 + i * (86400 * 365 / max(n, 1))))
+
+    def ws(title):
+        try: return ss.worksheet(title)
+        except Exception: return ss.add_worksheet(title=title, rows=1000, cols=20)
+
+    def fill(target, headers, n, make_row):
+        target.update("A1", [headers])
+        for start in range(0, n, batch):
+            target.append_rows([make_row(i) for i in range(start, min(n, start + batch))])
+
+    crm = []
+    for i in range(customers):
+        industry = rng.choice(list(_INDUSTRIES))
+        products = rng.sample(_INDUSTRIES[industry], k=min(2, len(_INDUSTRIES[industry])))
+        crm.append([f"Customer {i}", f"Company {i % 97}", industry, str(rng.randrange(3000, 40000, 500)),
+                    rng.choice(["Low", "Medium", "High"]), f"customer{i}@example.com",
+                    f"+1555{i:07d}", ", ".join(products)])
+
+    # write the backing file once at the end instead of after every batch
+    path = getattr(ss, "path", None)
+    if path:
+        ss.path = None
+
+    fill(ss.sheet1, HEADERS, calls, lambda i: [
+        ts(i, calls), rng.choice(_TRANSCRIPTS), rng.choice(_SENTIMENTS), rng.choice(_EMOTIONS),
+        rng.choice(["User Stopped", "User Stopped", "Silent >5s", "Time Limit Exceeded"]), "",
+    ])
+    fill(ws(CRM_SHEET_NAME), CRM_HEADERS, customers, lambda i: crm[i])
+
+    def summary_row(i):
+        c = crm[rng.randrange(customers)]
+        products = [p.strip() for p in c[7].split(",")]
+        return [ts(i, summaries), c[6], "Customer asked about pricing and next steps.",
+                "Send pricing; Schedule demo", rng.choice(_SENTIMENTS), rng.choice(_EMOTIONS),
+                ", ".join(products), ", ".join(str(PRODUCT_PRICE_MAP.get(p, "NA")) for p in products),
+                ts(i, summaries)[:10]]
+
+    fill(ws(SUMMARIES_SHEET_NAME), SUMMARIES_HEADERS, summaries, summary_row)
+    if path:
+        ss.path = path
+        ss.save()
+    return ss
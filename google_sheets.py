@@ -1,23 +1,80 @@
 import csv
 import os
 import datetime
-from config import sheet, CSV_FILE
+from config import get_sheet, CSV_FILE
+from jobs import run_stage
+from search_index import index_call
 
-HEADERS = ["Timestamp", "Transcript", "Sentiment", "Emotion", "StopReason"]
+HEADERS = ["Timestamp", "Transcript", "Sentiment", "Emotion", "StopReason", "Timeline"]
+
+# ==== CRM CONFIG ====
+CRM_SHEET_NAME = "CRM"
+SUMMARIES_SHEET_NAME = "Summaries"
+
+CRM_HEADERS = [
+    "CustomerName", "Company", "Industry",
+    "Budget", "InterestLevel", "Email", "Phone","RecommendedProducts"
+]
+
+SUMMARIES_HEADERS = [
+    "Timestamp", "CustomerPhone",
+    "Summary", "ActionItems", "Sentiment", "Emotion",
+    "RecommendedProducts", "ProductPrice", "PurchaseDate"
+]
+
+PRODUCT_PRICE_MAP = {
+    "CRM Suite": 12000,
+    "Analytics Dashboard": 8000,
+    "POS System": 7000,
+    "Loyalty App": 4000,
+    "Telehealth Platform": 15000,
+    "Patient CRM": 9000,
+    "LMS Platform": 10000,
+    "Online Classrooms": 6000,
+    "ERP Suite": 20000,
+    "Predictive Maintenance": 12000,
+    "IoT Sensors": 5000,
+    "Yield Prediction AI": 7000
+}
 
 def ensure_headers():
     """Make sure Google Sheet has headers in the first row."""
-    values = sheet.get_all_values()
-    if not values:  # completely empty sheet
-        sheet.insert_row(HEADERS, 1)   # ✅ insert headers at row 1
-    else:
-        # if first row is not our headers, replace it
-        if values[0] != HEADERS:
-            sheet.update('A1:E1', [HEADERS])
-
-def save_to_sheets(timestamp, text, sentiment, emotion, stop_reason):
-    ensure_headers()
-    sheet.append_row([timestamp, text, sentiment, emotion, stop_reason])
+    sheet = get_sheet()
+    def _ensure(timeout):
+        values = sheet.get_all_values()
+        if not values:  # completely empty sheet
+            sheet.insert_row(HEADERS, 1)   # ✅ insert headers at row 1
+        else:
+            # if first row is not our headers, replace it
+            if values[0] != HEADERS:
+                sheet.update('A1:F1', [HEADERS])
+    run_stage("sheets", "sheets", _ensure)
+
+def append_log_rows(dataset, rows):
+    """Append to the call log ("calls") or "summaries" through the shard router (shards.py)."""
+    from shards import get_router
+    router = get_router(get_sheet().spreadsheet)
+    if dataset == "calls" and router.sharding == "off":
+        ensure_headers()
+    # a write is never abandoned mid-flight, and the router skips rows a failed earlier
+    # attempt already landed, so pressing Save again can't duplicate a row
+    run_stage("sheets", "sheets", lambda timeout: router.append_rows(dataset, rows), idempotent=False)
+
+def save_to_sheets(timestamp, text, sentiment, emotion, stop_reason, timeline="", phone=""):
+    """
+    timeline: LiveSentiment.to_json() series recorded during the call ("" if none).
+    phone: customer the call was with, kept in the search index only (the log has no phone column).
+    """
+    append_log_rows("calls", [[timestamp, text, sentiment, emotion, stop_reason, timeline]])
+    index_call(timestamp, text, phone)
+
+def save_rows_to_sheets(rows):
+    """Append many [timestamp, text, sentiment, emotion, stop_reason(, timeline)] rows, one request per shard."""
+    if not rows:
+        return
+    append_log_rows("calls", [list(r) for r in rows])
+    for r in rows:
+        index_call(r[0], r[1])
 
 def save_to_csv(text, sentiment_result, emotion_result, stop_reason):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -26,6 +83,6 @@ def save_to_csv(text, sentiment_result, emotion_result, stop_reason):
         writer = csv.writer(csvfile)
         if not file_exists:
             writer.writerow(HEADERS)   # ✅ write header to CSV if missing
-        writer.writerow([timestamp, text, sentiment_result, emotion_result, stop_reason])
+        writer.writerow([timestamp, text, sentiment_result, emotion_result, stop_reason, ""])
     return timestamp
 
@@ -0,0 +1,258 @@
+import os
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+# ⚙️ Process-wide executor for post-call work (analysis, summaries, Sheets writes).
+# Shared by every Streamlit session in the server process, so the total number of
+# in-flight Groq / Sheets requests stays bounded no matter how many agents are active.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+BACKEND_LIMITS = {
+    "groq": int(os.getenv("GROQ_CONCURRENCY", "4")),
+    "sheets": int(os.getenv("SHEETS_CONCURRENCY", "2")),
+}
+JOB_TTL_S = 3600  # finished jobs are forgotten after an hour
+
+# ⏱️ Per-call SLO: a post-call job gets CALL_SLO_S seconds end to end and each network
+# stage may use at most its share of it (never more than what is left), so one slow
+# Groq / Sheets response costs a partial result instead of a spinner that never ends.
+CALL_SLO_S = float(os.getenv("CALL_SLO_S", "90"))
+STAGE_BUDGETS = {"stt": 0.5, "sentiment": 0.1, "emotion": 0.1, "summary": 0.25, "sheets": 0.15}
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobCancelled(BaseException):
+    """Raised at a checkpoint when the job was cancelled (BaseException so broad
+    `except Exception` fallbacks in the analysis code don't swallow it)."""
+
+
+class DeadlineExceeded(Exception):
+    """A stage ran past its budget (an Exception, so callers can fall back to partial results)."""
+
+
+class Deadline:
+    def __init__(self, seconds: float = CALL_SLO_S):
+        self.total = float(seconds)
+        self.expires = time.monotonic() + self.total
+
+    def remaining(self) -> float:
+        return max(self.expires - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, stage: str) -> float:
+        """Seconds `stage` may take: its share of the SLO, capped by what is left."""
+        return min(self.remaining(), STAGE_BUDGETS.get(stage, 1.0) * self.total)
+
+
+class Job:
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.status = QUEUED
+        self.result = None
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.future = None
+        self.deadline_s: Optional[float] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+
+_local = threading.local()
+_semaphores = {name: threading.BoundedSemaphore(max(n, 1)) for name, n in BACKEND_LIMITS.items()}
+
+
+def current_cancel_event() -> Optional[threading.Event]:
+    """Cancel event of the job running on this thread (None outside the executor)."""
+    return getattr(_local, "cancel_event", None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the call being processed on this thread (None = unbounded)."""
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def deadline_scope(seconds: float = CALL_SLO_S, cancel_event: Optional[threading.Event] = None):
+    """Run a block under a fresh Deadline (and optional cancel event) outside the executor."""
+    prev = (current_deadline(), current_cancel_event())
+    _local.deadline = Deadline(seconds)
+    if cancel_event is not None:
+        _local.cancel_event = cancel_event
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline, _local.cancel_event = prev
+
+
+def raise_if_cancelled():
+    ev = current_cancel_event()
+    if ev is not None and ev.is_set():
+        raise JobCancelled()
+
+
+def bind_cancel(fn: Callable) -> Callable:
+    """Wrap fn so it sees the calling job's cancel event and deadline when run on another thread."""
+    ev, dl = current_cancel_event(), current_deadline()
+    def run(*args, **kwargs):
+        _local.cancel_event, _local.deadline = ev, dl
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.cancel_event = _local.deadline = None
+    return run
+
+
+@contextmanager
+def backend_slot(backend: str):
+    """Hold one of the process-wide slots for `backend` ("groq" / "sheets") around a request."""
+    sem = _semaphores.get(backend)
+    if sem is None:
+        yield
+        return
+    ev = current_cancel_event()
+    while not sem.acquire(timeout=0.25):
+        if ev is not None and ev.is_set():
+            raise JobCancelled()
+    try:
+        yield
+    finally:
+        sem.release()
+
+
+def run_stage(stage: str, backend: str, fn: Callable[[Optional[float]], object], idempotent: bool = True):
+    """
+    Run one network call, fn(timeout), under `backend`'s slot, the stage budget and
+    the job's cancel event. The call runs on a helper thread; if the budget runs out
+    or the job is cancelled first, the caller gets DeadlineExceeded / JobCancelled
+    right away and the abandoned request is left to finish (or time out) on its own.
+    idempotent=False (writes): a request that already started is never abandoned, since
+    it may still land; the caller waits for its outcome (bounded by the client's own
+    HTTP timeout) and gets the real result or error, late or not.
+    """
+    dl, ev = current_deadline(), current_cancel_event()
+    timeout = dl.budget(stage) if dl is not None else None
+    if dl is None and ev is None:
+        with backend_slot(backend):
+            return fn(None)
+    if ev is not None and ev.is_set():
+        raise JobCancelled()
+    if timeout is not None and timeout <= 0:
+        raise DeadlineExceeded(f"{stage}: call deadline already passed")
+
+    box, done, abandon = {}, threading.Event(), threading.Event()
+    def work():
+        _local.cancel_event = abandon  # stop waiting for a backend slot once abandoned
+        try:
+            with backend_slot(backend):
+                box["started"] = True
+                box["result"] = fn(timeout)
+        except BaseException as e:
+            box["error"] = e
+        finally:
+            done.set()
+    threading.Thread(target=work, daemon=True, name=f"stage-{stage}").start()
+
+    end = None if timeout is None else time.monotonic() + timeout
+    while not done.wait(0.1):
+        over = (ev is not None and ev.is_set()) or (end is not None and time.monotonic() >= end)
+        if not over:
+            continue
+        if not idempotent and "started" in box:
+            print(f"⚠️ {stage}: past its {timeout or 0:.1f}s budget; waiting for the write to finish")
+            done.wait()
+            break
+        abandon.set()
+        if ev is not None and ev.is_set():
+            raise JobCancelled()
+        raise DeadlineExceeded(f"{stage} exceeded its {timeout:.1f}s budget")
+    if "error" in box:
+        raise box["error"]
+    return box["result"]
+
+
+class JobExecutor:
+    def __init__(self, max_workers: int = JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="postcall")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, name: str = "", deadline_s: Optional[float] = None, **kwargs) -> str:
+        """Queue fn(*args, **kwargs); deadline_s puts its network stages under a Deadline."""
+        job = Job(name or getattr(fn, "__name__", "job"))
+        job.deadline_s = deadline_s
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        if job.cancel_event.is_set():
+            job.status, job.finished = CANCELLED, time.time()
+            return
+        job.status, job.started = RUNNING, time.time()
+        _local.cancel_event = job.cancel_event
+        # the SLO clock starts at submission, so time spent queued counts too
+        _local.deadline = Deadline(job.deadline_s - (job.started - job.submitted)) if job.deadline_s else None
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = CANCELLED if job.cancel_event.is_set() else DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            _local.cancel_event = _local.deadline = None
+            job.finished = time.time()
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: Optional[str]) -> Optional[str]:
+        job = self.get(job_id)
+        return job.status if job else None
+
+    def cancel(self, job_id: Optional[str]) -> bool:
+        """Cancel a queued job outright, or signal a running one to stop at its next checkpoint."""
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.status, job.finished = CANCELLED, time.time()
+        return True
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_S
+        for jid in [j.id for j in self._jobs.values() if j.is_finished and (j.finished or 0) < cutoff]:
+            self._jobs.pop(jid, None)
+
+
+_executor: Optional[JobExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> JobExecutor:
+    """Process-wide executor instance (shared by all Streamlit sessions)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
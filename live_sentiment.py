@@ -0,0 +1,146 @@
+import io
+import os
+import json
+import wave
+import time
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from config import get_groq_client, SAMPLE_RATE, CHANNELS, CUSTOMER_CHANNEL
+from jobs import backend_slot
+from speech_to_text import channel_volumes
+from sentiment import _to_mono_int16
+
+# 📈 Live sentiment during capture.
+# The capture thread hands every 1 s chunk to LiveSentiment.feed(); at most one
+# request is in flight and a new one starts no sooner than LIVE_INTERVAL_S after
+# the previous one, so a call costs at most duration / LIVE_INTERVAL_S STT + LLM
+# requests no matter how long it runs. Each request transcribes the last
+# LIVE_WINDOW_S seconds with the turbo Whisper model and asks the small LLM for
+# sentiment and emotion in one reply. Silent windows are skipped without a request.
+LIVE_WINDOW_S = int(os.getenv("LIVE_WINDOW_S", "15"))
+LIVE_INTERVAL_S = float(os.getenv("LIVE_INTERVAL_S", "10"))
+LIVE_STT_MODEL = os.getenv("LIVE_STT_MODEL", "whisper-large-v3-turbo")
+LIVE_LLM_MODEL = os.getenv("LIVE_LLM_MODEL", "llama-3.1-8b-instant")
+
+SENTIMENT_SCORES = {"positive": 1, "neutral": 0, "negative": -1}
+
+
+def _window_wav(window: np.ndarray) -> bytes:
+    """In-memory 16-bit mono WAV of a short window (no temp file)."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(_to_mono_int16(window).tobytes())
+    return buf.getvalue()
+
+
+def classify_window(window: np.ndarray):
+    """Cheap path: turbo STT + one LLM call → (text, sentiment, emotion)."""
+    client = get_groq_client()
+    with backend_slot("groq"):
+        tr = client.audio.transcriptions.create(model=LIVE_STT_MODEL, file=("window.wav", _window_wav(window)),
+                                                timeout=LIVE_INTERVAL_S)
+    text = (getattr(tr, "text", "") or "").strip()
+    if len(text) <= 2:
+        return text, "", ""
+    with backend_slot("groq"):
+        reply = client.chat.completions.create(
+            model=LIVE_LLM_MODEL,
+            messages=[
+                {"role": "system", "content": "Reply with exactly two words: the sentiment (Positive, Negative, "
+                                              "or Neutral) and the emotion (Joy, Sadness, Anger, Fear, or Surprise)."},
+                {"role": "user", "content": text},
+            ],
+            temperature=0.0,
+            max_tokens=8,
+            timeout=LIVE_INTERVAL_S,
+        )
+    words = (reply.choices[0].message.content or "").replace(",", " ").split()
+    return text, (words[0] if words else ""), (words[1] if len(words) > 1 else "")
+
+
+class LiveSentiment:
+    """Rolling-window classifier fed from the capture loop; keeps a compact time series."""
+
+    def __init__(self, threshold=0.0, window_s: int = LIVE_WINDOW_S, interval_s: float = LIVE_INTERVAL_S,
+                 channel: Optional[int] = None, on_point: Optional[Callable[[list], None]] = None):
+        self.threshold = threshold
+        self.interval_s = interval_s
+        self.channel = (CUSTOMER_CHANNEL if CHANNELS > 1 else 0) if channel is None else channel
+        self._window = deque(maxlen=max(int(window_s), 1))
+        self._voiced = deque(maxlen=self._window.maxlen)
+        self._elapsed = 0.0        # seconds of audio fed so far
+        self._last_request = -1e9  # audio time of the last request
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.points: List[list] = []  # [t_seconds, score, sentiment, emotion]
+        self.errors = 0
+        self.on_point = on_point
+
+    def feed(self, chunk: np.ndarray):
+        """Called by the capture thread for every chunk; never blocks on the network."""
+        chunk = chunk.reshape(len(chunk), -1)
+        col = min(self.channel, chunk.shape[1] - 1)
+        ch = chunk[:, col]
+        thr = np.atleast_1d(self.threshold)  # scalar (calibrate_silence) or per-channel (calibrate_channels)
+        self._window.append(ch)
+        self._voiced.append(bool((channel_volumes(ch) >= thr[min(col, thr.size - 1)]).any()))
+        self._elapsed += len(chunk) / SAMPLE_RATE
+        if self._elapsed - self._last_request < self.interval_s or not any(self._voiced):
+            return
+        if not self._busy.acquire(blocking=False):
+            return  # previous window still being classified
+        self._last_request = self._elapsed
+        window = np.concatenate(self._window)
+        t = threading.Thread(target=self._run, args=(window, round(self._elapsed, 1)), daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    def _run(self, window: np.ndarray, t: float):
+        try:
+            _, sentiment, emotion = classify_window(window)
+            key = sentiment.strip(".").lower()
+            if key in SENTIMENT_SCORES:
+                point = [t, SENTIMENT_SCORES[key], sentiment.strip("."), emotion.strip(".")]
+                with self._lock:
+                    self.points.append(point)
+                if self.on_point is not None:
+                    self.on_point(point)
+        except Exception:
+            self.errors += 1
+        finally:
+            self._busy.release()
+
+    def close(self, timeout: float = 5.0):
+        """Wait briefly for the last in-flight window after capture ends."""
+        deadline = time.time() + timeout
+        for t in self._threads:
+            t.join(max(deadline - time.time(), 0))
+
+    def series(self) -> List[list]:
+        with self._lock:
+            return [list(p) for p in self.points]
+
+    def latest(self) -> Optional[list]:
+        with self._lock:
+            return list(self.points[-1]) if self.points else None
+
+    def to_json(self) -> str:
+        """Compact form stored in the Timeline column: [[t, score, sentiment, emotion], ...]."""
+        return json.dumps(self.series(), separators=(",", ":"))
+
+
+def parse_timeline(cell: str) -> List[list]:
+    """Inverse of LiveSentiment.to_json(); bad or empty cells give []."""
+    try:
+        data = json.loads(cell) if cell else []
+        return [p for p in data if isinstance(p, list) and len(p) >= 2]
+    except (ValueError, TypeError):
+        return []
@@ -1,35 +1,196 @@
-import numpy as np
 import time
-from speech_to_text import calibrate_silence, record_until_silence
-from sentiment import analyze_audio
-from google_sheets import save_to_sheets
+_STARTUP_T0 = time.perf_counter()
 
-def main():
+import queue
+import argparse
+import threading
+from speech_to_text import (calibrate_silence, record_until_silence, open_input_stream,
+                            stream_reader, wait_for_voice, calibrate_channels,
+                            record_channels_until_silence)
+from sentiment import analyze_audio, analyze_channels, combine_channels, _to_mono_int16
+from google_sheets import save_to_sheets, save_rows_to_sheets
+from audio_archive import get_archive
+from live_sentiment import LiveSentiment
+from jobs import deadline_scope, JobCancelled
+from config import STARTUP_BUDGET_S, SILENCE_LIMIT, CHANNELS
+from jobs import CALL_SLO_S
+
+def main(live: bool = False):
     print("🎤 Assistant started (stops if silence >5s)")
+    startup_s = time.perf_counter() - _STARTUP_T0
+    if startup_s > STARTUP_BUDGET_S:
+        print(f"⚠️ Startup took {startup_s:.2f}s (budget {STARTUP_BUDGET_S:.2f}s)")
 
     # Step 1: Calibrate
-    SILENCE_THRESHOLD = calibrate_silence()
+    SILENCE_THRESHOLD = calibrate_channels() if CHANNELS > 1 else calibrate_silence()
 
-    # Step 2: Record
-    recorded_audio, stop_reason = record_until_silence(SILENCE_THRESHOLD)
+    # Step 2: Record (optionally classifying rolling windows while the call runs)
+    tracker = None
+    if live:
+        tracker = LiveSentiment(SILENCE_THRESHOLD, on_point=lambda p: print(f"\n📈 {p[0]:.0f}s: {p[2]} · {p[3]}"))
+    on_chunk = tracker.feed if tracker else None
+    if CHANNELS > 1:
+        recorded_audio, channel_reasons, stop_reason = record_channels_until_silence(SILENCE_THRESHOLD, on_chunk=on_chunk)
+    else:
+        recorded_audio, stop_reason = record_until_silence(SILENCE_THRESHOLD, on_chunk=on_chunk)
+    timeline = ""
+    if tracker:
+        tracker.close()
+        timeline = tracker.to_json()
 
     # Step 3: Merge chunks (combine all audio chunks into one array)
-    recording = np.concatenate(recorded_audio, axis=0)
-
-    # Step 4: Analyze the recorded audio
-    text, sentiment_result, emotion_result = analyze_audio(recording, stop_reason)
+    recording = recorded_audio.array()
 
-    # Step 5: Save results to Google Sheets
+    # Step 4 + 5: Analyze and save within the per-call SLO (stages past their budget
+    # return partial results; Ctrl+C abandons the in-flight request immediately)
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    save_to_sheets(timestamp, text, sentiment_result, emotion_result, stop_reason)
+    with deadline_scope(CALL_SLO_S):
+        if CHANNELS > 1:
+            per_channel = analyze_channels(recording, channel_reasons)
+            for label, (t, s, e) in per_channel.items():
+                print(f"🎚️ {label}: {s} | {e}")
+            text, sentiment_result, emotion_result = combine_channels(per_channel)
+        else:
+            text, sentiment_result, emotion_result = analyze_audio(recording, stop_reason)
+        save_to_sheets(timestamp, text, sentiment_result, emotion_result, stop_reason, timeline)
+    get_archive().put(_to_mono_int16(recording), timestamp)
 
     # Step 6: Print results
     print(f"\n📝 Transcript: {text}")
     print(f"📊 Sentiment: {sentiment_result} | 🎭 Emotion: {emotion_result}")
     print(f"✅ Results saved to Google Sheets")
 
+# ---------------- Session mode ----------------
+# recorder (main thread) → calls queue (bounded) → analyzer → rows queue → batch writer
+# Call k is analyzed and saved while call k+1 is being recorded; when the analyzer
+# falls behind, the full calls queue blocks the recorder before it starts a new call.
+
+def _analyzer(calls: queue.Queue, rows: queue.Queue, abort: threading.Event):
+    try:
+        while True:
+            item = calls.get()
+            if item is None or abort.is_set():
+                return
+            n, timestamp, recording, stop_reason, channel_reasons = item
+            try:
+                with deadline_scope(CALL_SLO_S, cancel_event=abort):
+                    if channel_reasons:
+                        text, sentiment_result, emotion_result = combine_channels(analyze_channels(recording, channel_reasons))
+                    else:
+                        text, sentiment_result, emotion_result = analyze_audio(recording, stop_reason)
+            except JobCancelled:
+                print(f"\n⛔ Call {n}: analysis aborted")
+                return
+            except Exception as e:
+                # one bad call must not stop the session: log it and save an error row
+                print(f"\n⚠️ Call {n}: analysis failed ({e})")
+                text, sentiment_result, emotion_result = "", f"Error: {e}", "Error"
+            try:
+                get_archive().put(_to_mono_int16(recording), timestamp)
+            except Exception as e:
+                print(f"\n⚠️ Call {n}: archive skipped ({e})")
+            print(f"\n📝 Call {n}: {text}\n📊 {sentiment_result} | 🎭 {emotion_result}")
+            rows.put([timestamp, text, sentiment_result, emotion_result, stop_reason])
+    finally:
+        rows.put(None)  # the writer always gets its sentinel
+
+
+def _writer(rows: queue.Queue, batch_size: int, flush_s: float):
+    batch, last_flush = [], time.time()
+    while True:
+        try:
+            row = rows.get(timeout=1.0)
+        except queue.Empty:
+            row = False
+        done = row is None
+        if row:
+            batch.append(row)
+        if batch and (done or len(batch) >= batch_size or time.time() - last_flush >= flush_s):
+            try:
+                save_rows_to_sheets(batch)
+                print(f"\n✅ Saved {len(batch)} call(s) to Google Sheets")
+                batch = []
+            except Exception as e:
+                print(f"\n⚠️ Sheets write failed, will retry: {e}")
+            last_flush = time.time()
+        if done:
+            if batch:
+                print(f"\n❌ {len(batch)} call(s) could not be saved")
+            return
+
+
+def session(max_calls: int = 0, queue_size: int = 2, batch_size: int = 5, flush_s: float = 30.0):
+    print("🎤 Session started: calls are recorded back-to-back (Ctrl+C to finish)")
+    calls: queue.Queue = queue.Queue(maxsize=max(queue_size, 1))
+    rows: queue.Queue = queue.Queue()
+    abort = threading.Event()  # second Ctrl+C: drop in-flight analysis instead of waiting
+    analyzer = threading.Thread(target=_analyzer, args=(calls, rows, abort), daemon=True)
+    writer = threading.Thread(target=_writer, args=(rows, batch_size, flush_s), daemon=True)
+    analyzer.start(); writer.start()
+
+    n = 0
+    try:
+        with open_input_stream() as stream:
+            read = stream_reader(stream)
+            SILENCE_THRESHOLD = calibrate_channels(read) if CHANNELS > 1 else calibrate_silence(read)
+            while not max_calls or n < max_calls:
+                print("\n👂 Waiting for the next call to start speaking…")
+                first = wait_for_voice(SILENCE_THRESHOLD, read)
+                if first is None:
+                    break
+                n += 1
+                channel_reasons = None
+                if CHANNELS > 1:
+                    chunks, channel_reasons, stop_reason = record_channels_until_silence(
+                        SILENCE_THRESHOLD, read_chunk=read, first_chunk=first)
+                else:
+                    chunks, stop_reason = record_until_silence(SILENCE_THRESHOLD, read_chunk=read, first_chunk=first)
+                if stop_reason.lower().startswith(("silent", "call ended")):
+                    # the call opened on voice, so trailing silence means "call over", not "no speech"
+                    if len(chunks) > SILENCE_LIMIT:
+                        chunks.drop_last(SILENCE_LIMIT)
+                    stop_reason = f"Call ended (silence >{SILENCE_LIMIT}s)"
+                item = (n, time.strftime("%Y-%m-%d %H:%M:%S"), chunks.array(), stop_reason,
+                        channel_reasons)
+                try:
+                    calls.put(item, timeout=0.1)
+                except queue.Full:
+                    print("\n⏸️ Analysis is behind; waiting before the next call…")
+                    calls.put(item)
+                if stop_reason == "Stopped by user":
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n⏳ Finishing analysis and saving… (Ctrl+C again to abort)")
+        try:
+            while analyzer.is_alive():  # a dead analyzer never drains a full queue
+                try:
+                    calls.put(None, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+            analyzer.join()
+        except KeyboardInterrupt:
+            abort.set()
+            rows.put(None)
+        writer.join()
+    print(f"🏁 Session ended after {n} call(s)")
+
+
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser(description="AI Sales Call Assistant (CLI)")
+    ap.add_argument("--live", action="store_true", help="show rolling sentiment while a single call is recorded")
+    ap.add_argument("--session", action="store_true", help="record calls back-to-back on one audio stream")
+    ap.add_argument("--max-calls", type=int, default=0, help="stop the session after N calls (0 = unlimited)")
+    ap.add_argument("--queue", type=int, default=2, help="calls allowed to wait for analysis before recording pauses")
+    ap.add_argument("--batch", type=int, default=5, help="rows per Sheets write")
+    ap.add_argument("--flush-s", type=float, default=30.0, help="max seconds a finished call waits for its batch")
+    args = ap.parse_args()
+    if args.session:
+        session(args.max_calls, args.queue, args.batch, args.flush_s)
+    else:
+        main(live=args.live)
 
 
 
@@ -0,0 +1,279 @@
+import os
+import math
+import json
+import atexit
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from crm import parse_products
+from google_sheets import PRODUCT_PRICE_MAP, CRM_SHEET_NAME
+
+# 🎯 Recommendation engine built from the Summaries history + PRODUCT_PRICE_MAP.
+#   co[i, j]       → number of customers who bought both product i and j
+#   pop[i]         → number of customers who bought product i
+#   ind_pop[k, i]  → same, per industry
+# Built in one pass over the sheet, then updated in place on every saved purchase,
+# so recommend() is pure NumPy with no network call.
+# recommend() only reads the model: CRM products it has never seen are scored on the side.
+# Saves are atomic (temp file + os.replace) and coalesced: schedule_save() writes at most
+# once per RECO_SAVE_INTERVAL_S (and once more at exit).
+RECO_PATH = os.getenv("RECO_PATH", "recommender.npz")
+RECO_SAVE_INTERVAL_S = float(os.getenv("RECO_SAVE_INTERVAL_S", "30"))
+
+# scoring weights
+W_COOCCUR, W_INDUSTRY, W_GLOBAL, W_CRM = 1.0, 1.0, 0.3, 0.5
+OVER_BUDGET_FACTOR = 0.3
+
+
+def _num(v) -> float:
+    try:
+        f = float(v)
+        return f if math.isfinite(f) else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _norm(x: np.ndarray) -> np.ndarray:
+    m = float(x.max()) if x.size else 0.0
+    return x / m if m > 0 else np.zeros_like(x, dtype=np.float32)
+
+
+class Recommender:
+    def __init__(self):
+        self.products: List[str] = []
+        self._pidx: Dict[str, int] = {}
+        self.prices = np.zeros(0, dtype=np.float32)
+        self.co = np.zeros((0, 0), dtype=np.int32)
+        self.pop = np.zeros(0, dtype=np.int32)
+        self.industries: List[str] = []
+        self._iidx: Dict[str, int] = {}
+        self.ind_pop = np.zeros((0, 0), dtype=np.int32)
+        self.owned: Dict[str, np.ndarray] = {}  # phone → bool mask over products
+        self._lock = threading.RLock()
+        self._save_timer: Optional[threading.Timer] = None
+        for name, price in PRODUCT_PRICE_MAP.items():
+            self._product(name, price)
+
+    # ---- vocabulary (grows in place) ----
+    def _product(self, name: str, price=None) -> int:
+        key = name.strip().lower()
+        i = self._pidx.get(key)
+        if i is not None:
+            return i
+        i = len(self.products)
+        self.products.append(name.strip())
+        self._pidx[key] = i
+        self.prices = np.append(self.prices, np.float32(_num(price))).astype(np.float32)
+        self.co = np.pad(self.co, ((0, 1), (0, 1)))
+        self.pop = np.append(self.pop, 0).astype(np.int32)
+        self.ind_pop = np.pad(self.ind_pop, ((0, 0), (0, 1)))
+        for phone, mask in self.owned.items():
+            self.owned[phone] = np.append(mask, False)
+        return i
+
+    def _industry(self, name: str) -> int:
+        key = (name or "").strip().lower()
+        i = self._iidx.get(key)
+        if i is None:
+            i = len(self.industries)
+            self.industries.append(key)
+            self._iidx[key] = i
+            self.ind_pop = np.pad(self.ind_pop, ((0, 1), (0, 0)))
+        return i
+
+    # ---- building / incremental updates ----
+    def observe(self, phone: str, industry: str, products: Iterable[str]):
+        """Record that `phone` bought `products` (only new items change the counts)."""
+        with self._lock:
+            idx = [self._product(p, PRODUCT_PRICE_MAP.get(p)) for p in products if p and p != "NA"]
+            if not idx:
+                return
+            mask = self.owned.get(phone)
+            if mask is None:
+                mask = np.zeros(len(self.products), dtype=bool)
+            new = np.zeros(len(self.products), dtype=bool)
+            new[idx] = True
+            new &= ~mask
+            if not new.any():
+                return
+            after = mask | new
+            k = self._industry(industry)
+            # pairs involving at least one new item
+            self.co += (np.outer(new, after) | np.outer(after, new)).astype(np.int32)
+            self.pop += new.astype(np.int32)
+            self.ind_pop[k] += new.astype(np.int32)
+            self.owned[phone] = after
+
+    @classmethod
+    def fit(cls, summaries: List[List[str]], crm_rows: List[List[str]]) -> "Recommender":
+        """Batch build from raw Summaries and CRM get_all_values() output (header row first)."""
+        rec = cls()
+        industry_by_phone = {}
+        if crm_rows and len(crm_rows) > 1:
+            h = crm_rows[0]
+            if "Phone" in h and "Industry" in h:
+                ip, ii = h.index("Phone"), h.index("Industry")
+                for r in crm_rows[1:]:
+                    if ip < len(r):
+                        industry_by_phone[r[ip]] = r[ii] if ii < len(r) else ""
+        if summaries and len(summaries) > 1:
+            h = summaries[0]
+            if "CustomerPhone" in h and "RecommendedProducts" in h:
+                ip, ir = h.index("CustomerPhone"), h.index("RecommendedProducts")
+                baskets: Dict[str, List[str]] = {}
+                for r in summaries[1:]:
+                    if ip < len(r) and ir < len(r) and r[ir] and r[ir] != "NA":
+                        baskets.setdefault(r[ip], []).extend(parse_products(r[ir]))
+                for phone, items in baskets.items():
+                    rec.observe(phone, industry_by_phone.get(phone, ""), items)
+        return rec
+
+    # ---- scoring ----
+    def recommend(self, customer: Optional[dict], sentiment: str = "", k: int = 3,
+                  exclude: Iterable[str] = (), crm_products: Optional[List[str]] = None) -> List[str]:
+        """Top-k products for a CRM customer dict, sentiment- and budget-aware.
+        crm_products: the customer's already-parsed CRM products (CustomerView.products)."""
+        customer = customer or {}
+        if crm_products is None:
+            crm_products = parse_products(customer.get("RecommendedProducts", ""))
+        with self._lock:
+            n = len(self.products)
+            if n == 0:
+                return []
+            owned = self.owned.get(customer.get("Phone", ""), np.zeros(n, dtype=bool)).copy()
+            excluded = {str(p).strip().lower() for p in exclude}
+            for key in excluded:
+                i = self._pidx.get(key)
+                if i is not None: owned[i] = True
+            crm_prior = np.zeros(n, dtype=np.float32)
+            extra: Dict[str, str] = {}  # CRM-only products (not in the model): CRM prior only
+            for p in crm_products:
+                key = str(p).strip().lower()
+                i = self._pidx.get(key)
+                if i is not None:
+                    crm_prior[i] = 1.0
+                elif key and key not in excluded:
+                    extra.setdefault(key, str(p).strip())
+
+            co = self.co[owned].sum(axis=0).astype(np.float32) if owned.any() else np.zeros(n, np.float32)
+            co /= np.sqrt(self.pop.astype(np.float32) + 1.0)
+            ind = self._iidx.get(str(customer.get("Industry", "")).strip().lower())
+            ind_score = self.ind_pop[ind].astype(np.float32) if ind is not None else np.zeros(n, np.float32)
+            score = (W_COOCCUR * _norm(co) + W_INDUSTRY * _norm(ind_score)
+                     + W_GLOBAL * _norm(self.pop.astype(np.float32)) + W_CRM * crm_prior)
+
+            price_share = _norm(self.prices)
+            budget = _num(customer.get("Budget"))
+            if budget > 0:
+                score = np.where(self.prices > budget, score * OVER_BUDGET_FACTOR, score)
+            s = (sentiment or "").strip().lower()
+            if "neg" in s:
+                score *= 1.0 - 0.5 * price_share   # lean towards cheaper entry products
+            elif "pos" in s:
+                score *= 1.0 + 0.2 * price_share   # room to upsell
+
+            score[owned] = -1.0
+            names = self.products + list(extra.values())
+            score = np.concatenate([score, np.full(len(extra), W_CRM, np.float32)])  # no price → no adjustments
+            order = np.argsort(-score, kind="stable")[:max(k, 0)]
+            return [names[i] for i in order if score[i] > 0]
+
+    # ---- persistence ----
+    def save(self, path: str = RECO_PATH):
+        """Snapshot under the lock, then compress and swap the file in atomically."""
+        with self._lock:
+            phones = list(self.owned)
+            owned = np.array([self.owned[p] for p in phones], dtype=bool).reshape(len(phones), len(self.products))
+            arrays = dict(co=self.co.copy(), pop=self.pop.copy(), ind_pop=self.ind_pop.copy(),
+                          prices=self.prices.copy(), owned=np.packbits(owned, axis=1),
+                          meta=np.frombuffer(json.dumps({"products": self.products, "industries": self.industries,
+                                                         "phones": phones}).encode(), dtype=np.uint8))
+        fd, tmp = tempfile.mkstemp(prefix=".reco-", suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, path)
+        except BaseException:
+            try: os.remove(tmp)
+            except OSError: pass
+            raise
+
+    def schedule_save(self, path: str = RECO_PATH, delay_s: float = RECO_SAVE_INTERVAL_S):
+        """Coalesce saves: one write `delay_s` after the first unsaved update."""
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(delay_s, self._flush, args=(path,))
+            self._save_timer.daemon = True
+            self._save_timer.start()
+        atexit.register(self._flush, path)
+
+    def _flush(self, path: str = RECO_PATH):
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        atexit.unregister(self._flush)
+        try:
+            self.save(path)
+        except Exception as e:
+            print(f"⚠️ recommender save: {e}")
+
+    @classmethod
+    def load(cls, path: str = RECO_PATH) -> "Recommender":
+        data = np.load(path)
+        meta = json.loads(data["meta"].tobytes().decode())
+        rec = cls.__new__(cls)
+        rec._lock = threading.RLock()
+        rec._save_timer = None
+        rec.products = meta["products"]
+        rec._pidx = {p.lower(): i for i, p in enumerate(rec.products)}
+        rec.industries = meta["industries"]
+        rec._iidx = {name: i for i, name in enumerate(rec.industries)}
+        rec.co, rec.pop, rec.ind_pop, rec.prices = data["co"], data["pop"], data["ind_pop"], data["prices"]
+        owned = np.unpackbits(data["owned"], axis=1, count=len(rec.products)).astype(bool)
+        rec.owned = {p: owned[i] for i, p in enumerate(meta["phones"])}
+        return rec
+
+
+def build_from_sheets() -> Recommender:
+    """One batch pass over the Summaries shards and the CRM worksheet."""
+    from config import get_sheet
+    from shards import get_router
+    ss = get_sheet().spreadsheet
+    def rows(title):
+        try: return ss.worksheet(title).get_all_values()
+        except Exception: return []
+    return Recommender.fit(get_router(ss).get_all_values("summaries"), rows(CRM_SHEET_NAME))
+
+
+_recommender: Optional[Recommender] = None
+_recommender_lock = threading.Lock()
+
+
+def get_recommender() -> Recommender:
+    """Process-wide recommender: the precomputed RECO_PATH file if present, else one batch build."""
+    global _recommender
+    with _recommender_lock:
+        if _recommender is None:
+            if os.path.exists(RECO_PATH):
+                try:
+                    _recommender = Recommender.load(RECO_PATH)
+                except Exception:
+                    _recommender = None
+            if _recommender is None:
+                _recommender = build_from_sheets()
+                _recommender.save(RECO_PATH)
+        return _recommender
+
+
+if __name__ == "__main__":
+    # Batch rebuild from the sheets: python recommender.py
+    rec = build_from_sheets()
+    rec.save()
+    print(f"✅ {len(rec.products)} products, {len(rec.owned)} customers, "
+          f"{len(rec.industries)} industries → {RECO_PATH}")
@@ -0,0 +1,313 @@
+import os
+import io
+import sys
+import json
+import glob
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import weakref
+from collections import deque
+from typing import Dict, List, Optional
+
+# 🔬 Opt-in per-rerun profiling for app_streamlit.py.
+# PROFILE_RERUNS=1 profiles every session; ?profile=1 in the URL profiles one browser
+# session (sticky until ?profile=0). Each rerun runs under cProfile (deterministic, the
+# script thread only) with tracemalloc on, and the script calls mark("section") at its
+# section boundaries, so wall time and net/peak allocations are attributed to
+# "<tab> / <section>". Every finished rerun writes PROFILE_DIR/rerun-*.json (sections +
+# top functions) and a matching .prof for snakeviz/pstats; only the newest PROFILE_KEEP
+# reruns are kept. The sidebar panel shows the previous rerun and this session's rolling
+# per-section medians. Aggregate the files with:  python rerun_profile.py [PROFILE_DIR]
+# tracemalloc is process-wide: allocations made by other threads (post-call jobs, other
+# sessions) during a section are counted in it too. It runs only while some rerun is being
+# profiled; a rerun left unfinished (its tab closed mid-script) is closed as interrupted
+# after PROFILE_STALE_S so it can't hold the cProfile slot or keep tracemalloc on.
+PROFILE_RERUNS = os.getenv("PROFILE_RERUNS", "0").lower() in ("1", "true", "on")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_STALE_S = float(os.getenv("PROFILE_STALE_S", "900"))
+PROFILE_TOP = 25          # functions per report
+PROFILE_HISTORY = 30      # reruns kept per session for the panel
+
+_STATE_KEY = "_rerun_profile"
+_HISTORY_KEY = "_rerun_profile_history"
+_write_lock = threading.Lock()
+_active_lock = threading.RLock()  # re-entered by the GC finalizer below
+_active: "weakref.WeakSet[RerunProfile]" = weakref.WeakSet()  # unfinished profiles
+_cprofile_owner: Optional["weakref.ref[RerunProfile]"] = None  # one cProfile at a time (3.12+ allows one)
+_own_tracing = False  # tracemalloc was started here (and is stopped when _active empties)
+
+
+def _reap_stale():
+    """Close profiles of reruns that never reached end() (tab closed mid-script)."""
+    now = time.time()
+    with _active_lock:
+        stale = [p for p in _active if now - p.started > PROFILE_STALE_S]
+    for prof in stale:
+        prof.finish(interrupted=True)
+        try:
+            prof.write()
+        except OSError as e:
+            print(f"⚠️ rerun profile: {e}")
+
+
+def _claim_cprofile(prof: "RerunProfile") -> bool:
+    global _cprofile_owner
+    with _active_lock:
+        owner = _cprofile_owner() if _cprofile_owner is not None else None
+        if owner is not None and not owner.finished:
+            return False
+        _cprofile_owner = weakref.ref(prof)
+        return True
+
+
+def _release(prof: Optional["RerunProfile"]):
+    """Drop `prof` from the active set; stop tracemalloc once nothing is profiled."""
+    global _cprofile_owner, _own_tracing
+    with _active_lock:
+        if prof is not None:
+            _active.discard(prof)
+        if _cprofile_owner is not None and _cprofile_owner() in (prof, None):
+            _cprofile_owner = None
+        if not list(_active) and _own_tracing:  # list(): skips refs still dying
+            tracemalloc.stop()
+            _own_tracing = False
+
+
+class RerunProfile:
+    """Timings, allocations and a cProfile of one script rerun, split into sections."""
+
+    def __init__(self, session_id: str = ""):
+        self.session_id = session_id
+        self.tab = ""
+        self.started = time.time()
+        self.sections: List[dict] = []
+        self.finished = False
+        self.interrupted = False
+        self._profiler: Optional[cProfile.Profile] = None
+        self._current: Optional[dict] = None
+        global _own_tracing
+        _reap_stale()
+        with _active_lock:
+            _active.add(self)
+            weakref.finalize(self, _release, None)  # session dropped without end()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _own_tracing = True
+        if _claim_cprofile(self):
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:  # another tool holds the profiler slot
+                self._profiler = None
+        self.mark("setup")
+
+    def mark(self, name: str):
+        """Close the running section and start `name`."""
+        now, (mem, _) = time.perf_counter(), tracemalloc.get_traced_memory()
+        self._close(now, mem)
+        tracemalloc.reset_peak()
+        self._current = {"tab": self.tab, "section": name, "t0": now, "mem0": mem}
+
+    def _close(self, now: float, mem: int):
+        cur = self._current
+        if cur is None:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        self.sections.append({"tab": cur["tab"], "section": cur["section"],
+                              "ms": round((now - cur["t0"]) * 1000, 2),
+                              "alloc_kb": round((mem - cur["mem0"]) / 1024, 1),
+                              "peak_kb": round(max(peak - cur["mem0"], 0) / 1024, 1)})
+        self._current = None
+
+    def finish(self, interrupted: bool = False) -> dict:
+        """Stop profiling and build the report (idempotent)."""
+        if not self.finished:
+            self.finished, self.interrupted = True, interrupted
+            self._close(time.perf_counter(), tracemalloc.get_traced_memory()[0])
+            if self._profiler is not None:
+                self._profiler.disable()
+            _release(self)
+        return self.report()
+
+    def top_functions(self, n: int = PROFILE_TOP) -> List[dict]:
+        if self._profiler is None:
+            return []
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:n]
+        return [{"function": f"{os.path.basename(file)}:{line}({func})", "calls": nc,
+                 "own_ms": round(tt * 1000, 2), "cum_ms": round(ct * 1000, 2)}
+                for (file, line, func), (_, nc, tt, ct, _) in rows]
+
+    def report(self) -> dict:
+        return {"started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "session": self.session_id, "tab": self.tab, "interrupted": self.interrupted,
+                "total_ms": round(sum(s["ms"] for s in self.sections), 2),
+                "sections": self.sections, "top_functions": self.top_functions(),
+                "cprofile": self._profiler is not None}
+
+    def write(self, root: str = PROFILE_DIR) -> str:
+        """rerun-<time>-<session>.json (+ .prof) under `root`; prunes to PROFILE_KEEP reruns."""
+        os.makedirs(root, exist_ok=True)
+        session = "".join(c for c in self.session_id if c.isalnum())[:8]
+        stem = os.path.join(root, f"rerun-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))}"
+                                  f"-{int(self.started * 1000) % 1000:03d}-{session or 'local'}")
+        with open(stem + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=1)
+        if self._profiler is not None:
+            self._profiler.dump_stats(stem + ".prof")
+        with _write_lock:
+            reports = sorted(glob.glob(os.path.join(root, "rerun-*.json")))
+            for old in reports[:max(len(reports) - PROFILE_KEEP, 0)]:
+                for path in (old, old[:-5] + ".prof"):
+                    try: os.remove(path)
+                    except OSError: pass
+        return stem + ".json"
+
+
+# ---- Streamlit hooks (all no-ops unless profiling is on for this session) ----
+def _session():
+    import streamlit as st
+    return st.session_state
+
+
+def enabled() -> bool:
+    """PROFILE_RERUNS, or ?profile=1 remembered for this session."""
+    import streamlit as st
+    state = st.session_state
+    flag = st.query_params.get("profile")
+    if flag is not None:
+        state["_profile_reruns"] = flag.lower() in ("1", "true", "on")
+    return PROFILE_RERUNS or bool(state.get("_profile_reruns"))
+
+
+def _current() -> Optional[RerunProfile]:
+    try:
+        prof = _session().get(_STATE_KEY)
+    except Exception:
+        return None
+    return prof if prof is not None and not prof.finished else None
+
+
+def _record(prof: RerunProfile, interrupted: bool = False):
+    report = prof.finish(interrupted)
+    _session().setdefault(_HISTORY_KEY, deque(maxlen=PROFILE_HISTORY)).append(report)
+    try:
+        prof.write()
+    except OSError as e:
+        print(f"⚠️ rerun profile: {e}")
+
+
+def begin() -> Optional[RerunProfile]:
+    """Start profiling this rerun. A rerun cut short by st.rerun()/an exception is closed here."""
+    state = _session()
+    prev = _current()
+    if prev is not None:
+        _record(prev, interrupted=True)
+    if not enabled():
+        state.pop(_STATE_KEY, None)
+        return None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        session_id = get_script_run_ctx().session_id
+    except Exception:
+        session_id = ""
+    state[_STATE_KEY] = RerunProfile(session_id)
+    return state[_STATE_KEY]
+
+
+def set_tab(tab: str):
+    prof = _current()
+    if prof is not None:
+        prof.tab = tab
+
+
+def mark(section: str):
+    prof = _current()
+    if prof is not None:
+        prof.mark(section)
+
+
+def end():
+    """Finish and write this rerun's report (call at the end of the script)."""
+    prof = _current()
+    if prof is not None:
+        _record(prof)
+
+
+def stop():
+    """st.stop() that records the profile first."""
+    import streamlit as st
+    end()
+    st.stop()
+
+
+def render_panel():
+    """Collapsible sidebar panel: the previous rerun plus rolling per-section medians."""
+    import streamlit as st
+    import pandas as pd
+    if _current() is None:
+        return
+    mark("profiler panel")
+    history = list(_session().get(_HISTORY_KEY, []))
+    with st.sidebar.expander("🔬 Rerun profile", expanded=False):
+        if not history:
+            st.caption("Profiling is on; the first report appears after this rerun.")
+            return
+        last = history[-1]
+        st.caption(f"Previous rerun: **{last['tab'] or '—'}**, {last['total_ms']:.0f} ms"
+                   f"{' (cut short by st.rerun/st.stop)' if last['interrupted'] else ''} · "
+                   f"reports in `{PROFILE_DIR}/`")
+        st.dataframe(pd.DataFrame(last["sections"]), hide_index=True, use_container_width=True)
+        if last["top_functions"]:
+            st.markdown("**Top functions (cumulative)**")
+            st.dataframe(pd.DataFrame(last["top_functions"][:10]), hide_index=True, use_container_width=True)
+        if len(history) > 1:
+            st.markdown(f"**Last {len(history)} reruns (median)**")
+            st.dataframe(summarize(history), hide_index=True, use_container_width=True)
+
+
+def summarize(reports: List[dict]):
+    """Per tab/section: reruns, median/p95/max ms, median alloc and peak (DataFrame)."""
+    import pandas as pd
+    rows = [s for r in reports for s in r.get("sections", [])]
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    g = df.groupby(["tab", "section"], sort=False)
+    out = g["ms"].agg(reruns="count", median_ms="median", p95_ms=lambda v: v.quantile(0.95), max_ms="max")
+    out["alloc_kb"] = g["alloc_kb"].median()
+    out["peak_kb"] = g["peak_kb"].median()
+    return out.round(1).reset_index().sort_values("median_ms", ascending=False)
+
+
+def _hot_functions(reports: List[dict], n: int = 20) -> List[dict]:
+    agg: Dict[str, dict] = {}
+    for r in reports:
+        for f in r.get("top_functions", []):
+            a = agg.setdefault(f["function"], {"function": f["function"], "reruns": 0, "cum_ms": 0.0, "own_ms": 0.0})
+            a["reruns"] += 1
+            a["cum_ms"] += f["cum_ms"]
+            a["own_ms"] += f["own_ms"]
+    return sorted(agg.values(), key=lambda a: a["cum_ms"], reverse=True)[:n]
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    root = sys.argv[1] if len(sys.argv) > 1 else PROFILE_DIR
+    reports = []
+    for path in sorted(glob.glob(os.path.join(root, "rerun-*.json"))):
+        with open(path, encoding="utf-8") as f:
+            reports.append(json.load(f))
+    if not reports:
+        print(f"No rerun reports in {root}/ (run the app with PROFILE_RERUNS=1 or ?profile=1)")
+        sys.exit(1)
+    pd.set_option("display.width", 200)
+    totals = pd.DataFrame([{"tab": r["tab"], "ms": r["total_ms"]} for r in reports]).groupby("tab")["ms"]
+    print(f"🔬 {len(reports)} reruns from {root}/\n")
+    print(totals.agg(reruns="count", median_ms="median", max_ms="max").round(1).to_string(), "\n")
+    print(summarize(reports).head(30).to_string(index=False), "\n")
+    print(pd.DataFrame(_hot_functions(reports)).round(1).to_string(index=False))
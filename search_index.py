@@ -0,0 +1,321 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# 🔎 Full-text search over call transcripts and post-call summaries.
+#   docs      → one row per call (Transcript) or summary (Summary + ActionItems)
+#   terms     → stemmed term → id, document frequency
+#   postings  → (term, doc) → term frequency + positions (uint32 array blob)
+# Documents are added as they are saved, so the index never needs a full rebuild
+# (python search_index.py --rebuild backfills from the sheets once). Queries are BM25
+# over the stemmed terms; "quoted phrases" must appear as consecutive positions.
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search_index.sqlite")
+
+BM25_K1, BM25_B = 1.2, 0.75
+SNIPPET_CHARS = 240
+_FIELD_GAP = 100  # position gap between fields, so phrases never span Summary → ActionItems
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    snippet TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE,
+    df INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (term_id, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS docs_phone ON docs (phone);
+"""
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in is it its me my of on or so that the their "
+    "them they this to was we were will with you your our us".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+# ---- Text processing ----
+def stem(word: str) -> str:
+    """Light suffix stripper: pricing/priced/price → pric, cancelled/cancel → cancel."""
+    w = word
+    if w.endswith("'s"):
+        w = w[:-2]
+    w = w.replace("'", "")
+    if len(w) <= 3:
+        return w
+    for suffix, repl, min_len in (("sses", "ss", 5), ("ies", "y", 5), ("ations", "", 7), ("ation", "", 6),
+                                  ("ments", "", 7), ("ment", "", 6), ("ingly", "", 7), ("ing", "", 5),
+                                  ("edly", "", 6), ("ed", "", 4), ("ly", "", 5), ("s", "", 4)):
+        if w.endswith(suffix) and len(w) >= min_len and not (suffix == "s" and w.endswith("ss")):
+            w = w[:len(w) - len(suffix)] + repl
+            break
+    if w.endswith("e") and len(w) > 3:
+        w = w[:-1]
+    if len(w) > 3 and w[-1] == w[-2] and w[-1] not in "aeiou":
+        w = w[:-1]
+    return w
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stemmed tokens without stopwords, in order."""
+    return [stem(t) for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def parse_query(q: str) -> Tuple[List[str], List[List[str]]]:
+    """→ (all stemmed terms, phrases as term lists). Phrases are "double-quoted"."""
+    phrases = [tokenize(p) for p in re.findall(r'"([^"]+)"', q or "")]
+    phrases = [p for p in phrases if p]
+    rest = re.sub(r'"[^"]*"', " ", q or "")
+    terms = tokenize(rest) + [t for p in phrases for t in p]
+    return list(dict.fromkeys(terms)), phrases
+
+
+def _positions(blob: bytes) -> array:
+    pos = array("I")
+    pos.frombytes(blob)
+    return pos
+
+
+def _has_phrase(positions: List[array]) -> bool:
+    """True if some p in positions[0] has p+1 in positions[1], p+2 in positions[2], …"""
+    starts = set(positions[0])
+    for k, pos in enumerate(positions[1:], 1):
+        starts &= {p - k for p in pos}
+        if not starts:
+            return False
+    return True
+
+
+class SearchIndex:
+    """SQLite-backed positional inverted index."""
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._term_ids: Dict[str, int] = dict(self._db.execute("SELECT term, id FROM terms"))
+        # document lengths for BM25, indexed by doc id (kept in memory, grown on add)
+        ids_lens = self._db.execute("SELECT id, length FROM docs").fetchall()
+        self._lengths = np.zeros(max((i for i, _ in ids_lens), default=0) + 1, dtype=np.float32)
+        for i, n in ids_lens:
+            self._lengths[i] = n
+        self._n_docs = len(ids_lens)
+        self._total_len = float(self._lengths.sum())
+
+    # ---- writes ----
+    def add(self, key: str, kind: str, timestamp: str, phone: str, fields: Iterable[str]) -> bool:
+        """Index one document (no-op if `key` is already indexed). Returns True if added."""
+        positions: Dict[str, array] = defaultdict(lambda: array("I"))
+        pos, texts = 0, []
+        for text in fields:
+            text = (text or "").strip()
+            if not text:
+                continue
+            texts.append(text)
+            for tok in tokenize(text):
+                positions[tok].append(pos)
+                pos += 1
+            pos += _FIELD_GAP
+        length = sum(len(p) for p in positions.values())
+        snippet = " · ".join(texts)[:SNIPPET_CHARS]
+
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM docs WHERE key=?", (key,)).fetchone():
+                return False
+            cur = self._db.execute("INSERT INTO docs (key, kind, timestamp, phone, length, snippet) VALUES (?,?,?,?,?,?)",
+                                   (key, kind, timestamp, phone or "", length, snippet))
+            doc_id = cur.lastrowid
+            rows = []
+            for term, pos_arr in positions.items():
+                tid = self._term_ids.get(term)
+                if tid is None:
+                    tid = self._db.execute("INSERT INTO terms (term, df) VALUES (?, 0)", (term,)).lastrowid
+                    self._term_ids[term] = tid
+                rows.append((tid, doc_id, len(pos_arr), pos_arr.tobytes()))
+            self._db.executemany("INSERT INTO postings VALUES (?,?,?,?)", rows)
+            self._db.executemany("UPDATE terms SET df = df + 1 WHERE id=?", [(r[0],) for r in rows])
+            self._db.commit()
+            if doc_id >= len(self._lengths):
+                self._lengths = np.pad(self._lengths, (0, max(doc_id + 1 - len(self._lengths), len(self._lengths))))
+            self._lengths[doc_id] = length
+            self._n_docs += 1
+            self._total_len += length
+        return True
+
+    def add_call(self, timestamp: str, transcript: str, phone: str = "") -> bool:
+        """Key: timestamp + transcript digest (+ phone), so calls saved in the same second don't
+        collide. Without a phone (the call log has no phone column, e.g. the backfill) a call
+        already indexed with one is skipped."""
+        prefix = f"call:{timestamp}:{hashlib.sha1((transcript or '').encode()).hexdigest()[:16]}:"
+        if not phone:
+            with self._lock:
+                if self._db.execute("SELECT 1 FROM docs WHERE substr(key, 1, ?) = ? OR key = ? LIMIT 1",
+                                    (len(prefix), prefix, f"call:{timestamp}")).fetchone():  # or pre-digest key
+                    return False
+        return self.add(prefix + (phone or ""), "call", timestamp, phone, [transcript])
+
+    def add_summary(self, timestamp: str, phone: str, summary: str, action_items: str) -> bool:
+        return self.add(f"summary:{timestamp}:{phone}", "summary", timestamp, phone, [summary, action_items])
+
+    def __len__(self) -> int:
+        return self._n_docs
+
+    # ---- queries ----
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None) -> List[dict]:
+        """Ranked matches: [{'kind','timestamp','phone','snippet','score'}, …] best first."""
+        terms, phrases = parse_query(query)
+        if not terms:
+            return []
+        with self._lock:
+            n = max(self._n_docs, 1)
+            avgdl = self._total_len / n if self._total_len else 1.0
+            ids, scores = [], []
+            postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+            for term in terms:
+                tid = self._term_ids.get(term)
+                if tid is None:
+                    if any(term in p for p in phrases):
+                        return []  # a phrase word that never occurs → no phrase match
+                    continue
+                rows = self._db.execute("SELECT doc_id, tf FROM postings WHERE term_id=?", (tid,)).fetchall()
+                doc = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+                tf = np.fromiter((r[1] for r in rows), dtype=np.float32, count=len(rows))
+                postings[term] = (doc, tf)
+                idf = np.log(1.0 + (n - len(doc) + 0.5) / (len(doc) + 0.5))
+                dl = self._lengths[doc]
+                ids.append(doc)
+                scores.append(idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl)))
+            if not ids:
+                return []
+            all_ids = np.concatenate(ids)
+            uniq, inv = np.unique(all_ids, return_inverse=True)
+            total = np.zeros(len(uniq), dtype=np.float32)
+            np.add.at(total, inv, np.concatenate(scores))
+
+            # phrases: candidates must contain every phrase term, then positions are checked
+            for phrase in phrases:
+                keep = np.ones(len(uniq), dtype=bool)
+                for t in phrase:
+                    keep &= np.isin(uniq, postings[t][0])
+                cand = uniq[keep]
+                ok = set(self._phrase_docs(phrase, cand))
+                total[~np.isin(uniq, list(ok))] = 0.0
+
+            order = np.argsort(-total, kind="stable")
+            out = []
+            for i in order:
+                if total[i] <= 0 or len(out) >= limit:
+                    break
+                row = self._db.execute("SELECT kind, timestamp, phone, snippet FROM docs WHERE id=?",
+                                       (int(uniq[i]),)).fetchone()
+                if row and (kind is None or row[0] == kind):
+                    out.append({"kind": row[0], "timestamp": row[1], "phone": row[2], "snippet": row[3],
+                                "score": float(total[i])})
+            return out
+
+    def _phrase_docs(self, phrase: List[str], candidates: np.ndarray) -> List[int]:
+        if not len(candidates):
+            return []
+        cand = set(candidates.tolist())
+        # one sequential scan per phrase term (postings are clustered by term), filtered to candidates
+        pos: Dict[str, Dict[int, np.ndarray]] = {}
+        for term in dict.fromkeys(phrase):
+            pos[term] = {doc: blob for doc, blob in self._db.execute(
+                "SELECT doc_id, positions FROM postings WHERE term_id=?", (self._term_ids[term],)) if doc in cand}
+        found = []
+        for doc in cand:
+            if all(doc in pos[t] for t in phrase) and _has_phrase([_positions(pos[t][doc]) for t in phrase]):
+                found.append(doc)
+        return found
+
+
+def highlight(snippet: str, query: str) -> str:
+    """Wrap words whose stem matches a query term in **bold** (markdown)."""
+    terms = set(parse_query(query)[0])
+    return re.sub(r"[A-Za-z0-9']+", lambda m: f"**{m.group(0)}**" if stem(m.group(0).lower()) in terms
+                  else m.group(0), snippet)
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Process-wide index at SEARCH_INDEX_PATH."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+
+def index_call(timestamp: str, transcript: str, phone: str = ""):
+    """Save-path hook: indexing problems are reported, never raised into the save."""
+    try:
+        get_search_index().add_call(timestamp, transcript, phone)
+    except Exception as e:
+        print(f"⚠️ search index: {e}")
+
+
+def index_summary(timestamp: str, phone: str, summary: str, action_items: str):
+    try:
+        get_search_index().add_summary(timestamp, phone, summary, action_items)
+    except Exception as e:
+        print(f"⚠️ search index: {e}")
+
+
+def rebuild_from_sheets(index: Optional[SearchIndex] = None, progress=None) -> int:
+    """Backfill from the call log and Summaries shards (already indexed rows are skipped)."""
+    from shards import get_router, iter_chunks
+    index = index or get_search_index()
+    router = get_router()
+    added = 0
+    for chunk in iter_chunks(router, "calls", progress=progress):
+        for r in chunk:
+            added += index.add_call(r.get("Timestamp", ""), r.get("Transcript", ""))
+    for chunk in iter_chunks(router, "summaries", progress=progress):
+        for r in chunk:
+            added += index.add_summary(r.get("Timestamp", ""), r.get("CustomerPhone", ""),
+                                       r.get("Summary", ""), r.get("ActionItems", ""))
+    return added
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    ap = argparse.ArgumentParser(description="Search call transcripts and summaries")
+    ap.add_argument("query", nargs="?", help='keywords and/or "quoted phrases"')
+    ap.add_argument("--rebuild", action="store_true", help="backfill the index from the sheets")
+    ap.add_argument("--limit", type=int, default=10)
+    args = ap.parse_args()
+    if args.rebuild:
+        n = rebuild_from_sheets(progress=lambda d, t: print(f" {d:,}/{t:,}", end="\r"))
+        print(f"\n✅ {n:,} documents added → {SEARCH_INDEX_PATH}")
+    if args.query:
+        t0 = time.perf_counter()
+        hits = get_search_index().search(args.query, args.limit)
+        print(f"🔎 {len(hits)} hit(s) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for h in hits:
+            print(f"  {h['score']:6.2f}  {h['timestamp']}  {h['kind']:<7} {h['phone'] or '—':<14} {h['snippet'][:100]}")
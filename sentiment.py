@@ -1,21 +1,45 @@
+import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import tempfile
 import wave
 import re
-from config import client, SAMPLE_RATE, CHANNELS
+from config import get_groq_client, SAMPLE_RATE, CHANNELS
+from config import CHANNEL_LABELS, CUSTOMER_CHANNEL
+from jobs import raise_if_cancelled, bind_cancel, run_stage, DeadlineExceeded
+from speech_to_text import split_channels
+from audio_buffer import spill_array
+from diarize import SPEAKER_SEGMENTATION, CUSTOMER, segment_speakers, speaker_at
+from stt_router import transcribe as transcribe_routed
+
+# frames converted per step, so long (possibly memory-mapped) recordings are
+# never materialised as whole float temporaries
+_BLOCK_FRAMES = 1 << 20
+
+def _mono_block(arr: np.ndarray) -> np.ndarray:
+    if arr.ndim == 2:
+        arr = arr.mean(axis=1)  # downmix to mono
+    return arr.astype(np.float32, copy=False)
 
 def _to_mono_int16(x: np.ndarray) -> np.ndarray:
-    """Ensure (N,) mono int16 PCM from float arrays (N,), (N,1), or (N,C)."""
+    """
+    Ensure (N,) mono int16 PCM from float arrays (N,), (N,1), or (N,C).
+    Works block by block; a memory-mapped input gets a memory-mapped output.
+    """
     if x is None or len(x) == 0:
         return np.array([], dtype=np.int16)
-    arr = np.asarray(x)
-    if arr.ndim == 2:
-        arr = arr.mean(axis=1)  # downmix to mono
-    arr = arr.astype(np.float32, copy=False)
-    peak = np.max(np.abs(arr)) if arr.size else 0.0
-    if peak > 1.0:
-        arr = arr / peak
-    return np.clip(arr * 32767.0, -32768, 32767).astype(np.int16)
+    arr = x if isinstance(x, np.ndarray) else np.asarray(x)
+    n = len(arr)
+    peak = 0.0
+    for i in range(0, n, _BLOCK_FRAMES):
+        peak = max(peak, float(np.max(np.abs(_mono_block(arr[i:i + _BLOCK_FRAMES])))))
+    out = spill_array((n,), np.int16) if isinstance(x, np.memmap) else np.empty(n, dtype=np.int16)
+    for i in range(0, n, _BLOCK_FRAMES):
+        blk = _mono_block(arr[i:i + _BLOCK_FRAMES])
+        if peak > 1.0:
+            blk = blk / np.float32(peak)
+        out[i:i + _BLOCK_FRAMES] = np.clip(blk * 32767.0, -32768, 32767).astype(np.int16)
+    return out
 
 def _save_wav_int16(mono_int16: np.ndarray) -> str:
     with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
@@ -23,7 +47,8 @@ def _save_wav_int16(mono_int16: np.ndarray) -> str:
             wf.setnchannels(1)       # mono
             wf.setsampwidth(2)       # 16-bit
             wf.setframerate(SAMPLE_RATE)
-            wf.writeframes(mono_int16.tobytes())
+            for i in range(0, len(mono_int16), _BLOCK_FRAMES):
+                wf.writeframes(np.ascontiguousarray(mono_int16[i:i + _BLOCK_FRAMES]).tobytes())
         return tmp_file.name
 
 def _looks_like_empty_text(t: str) -> bool:
@@ -37,10 +62,41 @@ def _looks_like_empty_text(t: str) -> bool:
         return True
     return False
 
-def analyze_audio(recording, stop_reason: str):
+def _seg_field(seg, name):
+    return seg.get(name) if isinstance(seg, dict) else getattr(seg, name, None)
+
+def _label_turns(transcription, segments):
+    """
+    Attach a speaker to every Whisper segment → (labelled transcript, customer-only text).
+    Consecutive segments from the same speaker are merged into one turn.
+    """
+    turns = []
+    for seg in getattr(transcription, "segments", None) or []:
+        text = (_seg_field(seg, "text") or "").strip()
+        if not text:
+            continue
+        who = speaker_at(segments, float(_seg_field(seg, "start") or 0), float(_seg_field(seg, "end") or 0))
+        who = who or (turns[-1][0] if turns else CUSTOMER)
+        if turns and turns[-1][0] == who:
+            turns[-1][1].append(text)
+        else:
+            turns.append((who, [text]))
+    labelled = "\n".join(f"[{who}] {' '.join(parts)}" for who, parts in turns)
+    customer = " ".join(" ".join(parts) for who, parts in turns if who == CUSTOMER)
+    return labelled, customer
+
+def customer_turns(transcript: str) -> str:
+    """Customer lines of a speaker-labelled transcript; the whole text when it isn't labelled."""
+    tags = {f"[{CUSTOMER}] ", f"[{CHANNEL_LABELS[min(CUSTOMER_CHANNEL, len(CHANNEL_LABELS) - 1)]}] "}
+    lines = [line[len(tag):] for line in (transcript or "").splitlines() for tag in tags if line.startswith(tag)]
+    return " ".join(lines) if lines else transcript
+
+def analyze_audio(recording, stop_reason: str, segment: bool = SPEAKER_SEGMENTATION):
     """
     If stop_reason indicates silence → return ('Not Speaking','N/A','N/A').
     Otherwise transcribe and classify normally.
+    With segment=True the call is split into agent/customer turns on the CPU first;
+    the transcript comes back labelled and only customer turns are classified.
     """
     # ✅ Your requested rule:
     if isinstance(stop_reason, str) and stop_reason.lower().startswith("silent"):
@@ -51,50 +107,115 @@ def analyze_audio(recording, stop_reason: str):
     if pcm.size == 0:
         return "Not Speaking", "N/A", "N/A"
 
+    # 🗣️ Agent / customer turns (before transcription; [] when it isn't a clear two-speaker call)
+    segments = segment_speakers(pcm) if segment else []
+
     # Write temp WAV
     wav_file = _save_wav_int16(pcm)
+    client = get_groq_client()
 
-    # Transcribe
+    # Transcribe on the routed model (segment timestamps are needed to attribute text to speakers)
+    def _transcribe(model):
+        def call(timeout):
+            with open(wav_file, "rb") as f:
+                return client.audio.transcriptions.create(
+                    model=model,
+                    file=f,
+                    timeout=timeout,
+                    **({"response_format": "verbose_json"} if segments else {}),
+                )
+        return run_stage("stt", "groq", call)
     try:
-        with open(wav_file, "rb") as f:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-large-v3",
-                file=f
-            )
+        transcription, _ = transcribe_routed(pcm, _transcribe, _looks_like_empty_text)
         text = (getattr(transcription, "text", "") or "").strip()
+    except DeadlineExceeded:
+        return "[STT timed out]", "N/A", "N/A"
     except Exception as e:
         return f"[STT error: {e}]", "N/A", "N/A"
+    finally:
+        try: os.remove(wav_file)
+        except OSError: pass
 
     # If transcript is essentially empty, treat as no speech
     if _looks_like_empty_text(text):
         return "Not Speaking", "N/A", "N/A"
 
-    # Sentiment
+    # Classify the customer's words only (fewer tokens, no agent script in the label)
+    classify_text = text
+    if segments:
+        labelled, customer_text = _label_turns(transcription, segments)
+        if labelled:
+            text = labelled
+        if not _looks_like_empty_text(customer_text):
+            classify_text = customer_text
+
+    # Sentiment (a missed deadline keeps the transcript and marks the label "Timeout")
+    raise_if_cancelled()
     try:
-        sentiment = client.chat.completions.create(
+        sentiment = run_stage("sentiment", "groq", lambda timeout: client.chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[
                 {"role": "system", "content": "Reply with only one word: Positive, Negative, or Neutral."},
-                {"role": "user", "content": text}
+                {"role": "user", "content": classify_text}
             ],
             temperature=0.0,
-        )
+            timeout=timeout,
+        ))
         sentiment_result = (sentiment.choices[0].message.content or "").strip().split()[0]
+    except DeadlineExceeded:
+        sentiment_result = "Timeout"
     except Exception as e:
         sentiment_result = f"Error:{e}"
 
     # Emotion
+    raise_if_cancelled()
     try:
-        emotion = client.chat.completions.create(
+        emotion = run_stage("emotion", "groq", lambda timeout: client.chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[
                 {"role": "system", "content": "Reply with only one word: Joy, Sadness, Anger, Fear, or Surprise."},
-                {"role": "user", "content": text}
+                {"role": "user", "content": classify_text}
             ],
             temperature=0.0,
-        )
+            timeout=timeout,
+        ))
         emotion_result = (emotion.choices[0].message.content or "").strip().split()[0]
+    except DeadlineExceeded:
+        emotion_result = "Timeout"
     except Exception as e:
         emotion_result = f"Error:{e}"
 
     return text, sentiment_result, emotion_result
+
+
+def analyze_channels(recording, stop_reasons, labels=None):
+    """
+    Analyze each channel of an (N, C) recording in parallel.
+    stop_reasons is one reason per channel (see record_channels_until_silence).
+    Returns {label: (text, sentiment, emotion)} in channel order.
+    """
+    views = split_channels(recording)
+    labels = list(labels or CHANNEL_LABELS)
+    labels += [f"Line {i + 1}" for i in range(len(labels), len(views))]
+    if isinstance(stop_reasons, str):
+        stop_reasons = [stop_reasons] * len(views)
+    with ThreadPoolExecutor(max_workers=max(len(views), 1), thread_name_prefix="channel") as pool:
+        # each channel is already one line/speaker, so no speaker segmentation here
+        futures = [pool.submit(bind_cancel(analyze_audio), v, r, False) for v, r in zip(views, stop_reasons)]
+        return {labels[i]: f.result() for i, f in enumerate(futures)}
+
+
+def combine_channels(per_channel, customer_label=None):
+    """
+    Collapse analyze_channels() output into one (transcript, sentiment, emotion) row:
+    the transcript keeps every line, labelled; sentiment/emotion come from the customer.
+    """
+    labels = list(per_channel)
+    if not labels:
+        return "Not Speaking", "N/A", "N/A"
+    if customer_label not in per_channel:
+        customer_label = labels[min(CUSTOMER_CHANNEL, len(labels) - 1)]
+    lines = [f"[{label}] {text}" for label, (text, _, _) in per_channel.items()
+             if text != "Not Speaking" and not _looks_like_empty_text(text)]
+    _, sentiment, emotion = per_channel[customer_label]
+    return ("\n".join(lines) or "Not Speaking"), sentiment, emotion
@@ -0,0 +1,342 @@
+import os
+import time
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+from call_log import count_rows, _col_letter
+from google_sheets import HEADERS, SUMMARIES_HEADERS, SUMMARIES_SHEET_NAME
+
+# 🗂️ Worksheet sharding for the call log and Summaries.
+# New rows go to one worksheet per month ("Calls 2024-06", "Summaries 2024-06"); a month
+# that passes SHARD_MAX_ROWS rolls over to "Calls 2024-06 (2)". The "Shards" worksheet is
+# the manifest: one row per shard with its dataset, the timestamp range it covers
+# (monthly shards store the "YYYY-MM" prefix) and, for Summaries, the CustomerPhone range
+# it holds (KeyMin/KeyMax, widened before each append; "-" = no rows yet, blank = not
+# tracked, e.g. shards registered before key ranges existed). Rows already in sheet1 / Summaries are
+# registered as legacy shards with their first and last timestamps the first time the
+# manifest is created, so nothing has to be migrated.
+# Readers ask the router for the shards overlapping a time range (History paging,
+# exports, rebuilds) or scan one key column per shard and fetch only the matching rows
+# (Purchasing History by exact phone skips shards whose key range can't hold it; Agent
+# Summary's substring search scans every shard's phone column). SHEETS_SHARDING=off keeps everything
+# in the two original worksheets.
+SHEETS_SHARDING = os.getenv("SHEETS_SHARDING", "monthly").lower()
+SHARD_MAX_ROWS = int(os.getenv("SHARD_MAX_ROWS", "200000"))
+SHARD_INITIAL_ROWS = 2000
+MANIFEST_TTL_S = 60  # re-read the manifest this often to see shards other processes created
+MANIFEST_SHEET_NAME = "Shards"
+MANIFEST_HEADERS = ["Dataset", "Title", "Start", "End", "KeyMin", "KeyMax"]
+RETRY_TAIL_ROWS = 200  # rows at the end of a shard checked for a failed write that landed anyway
+
+DATASETS = {"calls": ("Calls", HEADERS), "summaries": ("Summaries", SUMMARIES_HEADERS)}
+KEY_COLUMNS = {"summaries": "CustomerPhone"}  # datasets whose shards record a key range
+_HI = "\uffff"  # pads a prefix bound so "2024-06" compares after every "2024-06-…" timestamp
+_NO_KEYS = "-"    # KeyMin/KeyMax of a tracked shard with no rows yet
+
+
+@dataclass(frozen=True)
+class Shard:
+    dataset: str
+    title: str
+    start: str = ""  # first timestamp covered, or a prefix ("" = unbounded)
+    end: str = ""
+    key_min: str = ""  # key range ("" = not tracked, _NO_KEYS = empty)
+    key_max: str = ""
+
+    def may_hold(self, key: str) -> bool:
+        """Could this shard hold rows with exactly this key?"""
+        if self.key_min == _NO_KEYS:
+            return False
+        if not self.key_min or not self.key_max:
+            return True
+        return self.key_min <= key <= self.key_max
+
+    def overlaps(self, start: Optional[str], end: Optional[str]) -> bool:
+        """Could this shard hold timestamps in [start, end] (prefix bounds, inclusive)?"""
+        if start and self.end and self.end + _HI < start:
+            return False
+        if end and self.start and self.start > end + _HI:
+            return False
+        return True
+
+
+class ShardRouter:
+    """Maps datasets and time ranges to worksheets; creates monthly shards on write."""
+
+    def __init__(self, ss, sharding: str = SHEETS_SHARDING, max_rows: int = SHARD_MAX_ROWS):
+        self.ss = ss
+        self.sharding = sharding
+        self.max_rows = max_rows
+        self._lock = threading.RLock()
+        self._ws: Dict[str, object] = {}
+        self._rows: Dict[str, int] = {}  # data rows per shard as last seen by this process
+        self._manifest: Optional[List[Shard]] = None
+        self._loaded_at = 0.0
+        self.on_append: List[Callable[[str, List[list]], None]] = []  # (title, rows) after each write
+        self._manifest_rows: Dict[str, int] = {}  # shard title → its manifest sheet row
+        self._unconfirmed: Dict[tuple, str] = {}  # (dataset, ts, col B) of rows a failed append may have written → shard
+
+    # ---- manifest ----
+    def _legacy_ws(self, dataset: str, create: bool = False):
+        if dataset == "calls":
+            return self.ss.sheet1
+        try:
+            return self.ss.worksheet(SUMMARIES_SHEET_NAME)
+        except Exception:
+            if not create:
+                return None
+            ws = self.ss.add_worksheet(title=SUMMARIES_SHEET_NAME, rows=SHARD_INITIAL_ROWS, cols=len(SUMMARIES_HEADERS))
+            ws.update("A1", [SUMMARIES_HEADERS])
+            self._manifest = None
+            return ws
+
+    def _legacy_shard(self, dataset: str) -> Optional[Shard]:
+        """sheet1 / Summaries as a shard spanning its first..last timestamp (None if empty)."""
+        ws = self._legacy_ws(dataset)
+        if ws is None:
+            return None
+        stamps = [t for t in ws.col_values(1)[1:] if t]
+        if not stamps:
+            return None
+        self._ws[ws.title] = ws
+        keys = self._key_range(dataset, ws)
+        return Shard(dataset, ws.title, min(stamps), max(stamps), *keys)
+
+    def _key_range(self, dataset: str, ws) -> tuple:
+        if dataset not in KEY_COLUMNS:
+            return "", ""
+        keys = [k for k in ws.col_values(self.headers(dataset).index(KEY_COLUMNS[dataset]) + 1)[1:] if k]
+        return (min(keys), max(keys)) if keys else (_NO_KEYS, _NO_KEYS)
+
+    def _manifest_ws(self):
+        if MANIFEST_SHEET_NAME in self._ws:
+            return self._ws[MANIFEST_SHEET_NAME]
+        try:
+            ws = self.ss.worksheet(MANIFEST_SHEET_NAME)
+        except Exception:
+            ws = self.ss.add_worksheet(title=MANIFEST_SHEET_NAME, rows=200, cols=len(MANIFEST_HEADERS))
+            legacy = [s for s in (self._legacy_shard(d) for d in DATASETS) if s is not None]
+            ws.update("A1", [MANIFEST_HEADERS] + [[s.dataset, s.title, s.start, s.end, s.key_min, s.key_max]
+                                                  for s in legacy])
+        self._ws[MANIFEST_SHEET_NAME] = ws
+        return ws
+
+    def manifest(self) -> List[Shard]:
+        """All shards, oldest first (cached for MANIFEST_TTL_S; refresh() re-reads now)."""
+        with self._lock:
+            if self._manifest is None or time.time() - self._loaded_at > MANIFEST_TTL_S:
+                self._loaded_at = time.time()
+                if self.sharding == "off":
+                    self._manifest = [Shard(d, ws.title) for d, ws in
+                                      ((d, self._legacy_ws(d)) for d in DATASETS) if ws is not None]
+                else:
+                    ws = self._manifest_ws()
+                    values = ws.get_all_values()
+                    if values and len(values[0]) < len(MANIFEST_HEADERS):  # manifest from before key ranges
+                        if ws.col_count < len(MANIFEST_HEADERS):
+                            ws.resize(cols=len(MANIFEST_HEADERS))
+                        ws.update("A1", [MANIFEST_HEADERS])
+                    # first row per title wins (two processes may register the same new shard)
+                    self._manifest, seen = [], set()
+                    self._manifest_rows = {}
+                    for n, r in enumerate(values[1:], start=2):
+                        if len(r) > 1 and r[0] in DATASETS and r[1] not in seen:
+                            seen.add(r[1])
+                            self._manifest.append(Shard(*(r + [""] * 6)[:6]))
+                            self._manifest_rows[r[1]] = n
+            return list(self._manifest)
+
+    def refresh(self):
+        with self._lock:
+            self._manifest = None
+            self._rows.clear()
+
+    def shards(self, dataset: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Shard]:
+        """Shards of `dataset` that may hold rows in [start, end], oldest first."""
+        return [s for s in self.manifest() if s.dataset == dataset and s.overlaps(start, end)]
+
+    def worksheet(self, shard):
+        title = shard.title if isinstance(shard, Shard) else shard
+        with self._lock:
+            if title not in self._ws:
+                self._ws[title] = self.ss.worksheet(title)
+            return self._ws[title]
+
+    def headers(self, dataset: str) -> List[str]:
+        return list(DATASETS[dataset][1])
+
+    # ---- writes ----
+    def _row_count(self, title: str) -> int:
+        if title not in self._rows:
+            self._rows[title] = count_rows(self.worksheet(title))
+        return self._rows[title]
+
+    def _writable(self, dataset: str, timestamp: str) -> str:
+        """Title of the shard a row stamped `timestamp` goes to (created if needed)."""
+        if self.sharding == "off":
+            return self._legacy_ws(dataset, create=True).title
+        prefix, headers = DATASETS[dataset]
+        period = (timestamp or "")[:7]
+        base = f"{prefix} {period}"
+        current = [s for s in self.manifest() if s.dataset == dataset and s.title.startswith(base)]
+        if current and self._row_count(current[-1].title) < self.max_rows:
+            return current[-1].title
+        title = base if not current else f"{base} ({len(current) + 1})"
+        try:
+            ws = self.ss.add_worksheet(title=title, rows=SHARD_INITIAL_ROWS, cols=len(headers))
+            ws.update("A1", [headers])
+        except Exception:
+            ws = self.ss.worksheet(title)  # another process created it first
+            self._manifest = None
+        self._ws[title] = ws
+        self._rows[title] = count_rows(ws)
+        if not any(s.title == title for s in self.manifest()):
+            keys = [_NO_KEYS, _NO_KEYS] if dataset in KEY_COLUMNS else ["", ""]
+            self._manifest_ws().append_row([dataset, title, period, period] + keys)
+            self._manifest = None
+        return title
+
+    def _key(self, dataset: str, row) -> tuple:
+        return (dataset, str(row[0]), str(row[1]) if len(row) > 1 else "")
+
+    def _already_written(self, dataset: str, rows: List[list]) -> set:
+        """Keys of `rows` that an earlier failed append landed after all (tail of its shard)."""
+        keys = {self._key(dataset, r) for r in rows}
+        with self._lock:
+            pending = {k: t for k, t in self._unconfirmed.items() if k in keys}
+            for k in pending:
+                del self._unconfirmed[k]
+        found = set()
+        try:
+            for title in set(pending.values()):
+                ws = self.worksheet(title)
+                n = count_rows(ws) + 1  # last sheet row (header is row 1)
+                for r in ws.get(f"A{max(n - RETRY_TAIL_ROWS + 1, 2)}:B{n}"):
+                    found.add(self._key(dataset, (r + ["", ""])[:2]))
+                with self._lock:
+                    self._rows[title] = n - 1
+        except Exception:
+            with self._lock:
+                self._unconfirmed.update(pending)
+            raise
+        return found
+
+    def _widen_key_range(self, dataset: str, title: str, group: List[list]):
+        """Grow the shard's manifest key range to cover `group` (before the rows are written)."""
+        column = KEY_COLUMNS.get(dataset)
+        if column is None or self.sharding == "off":
+            return
+        i = self.headers(dataset).index(column)
+        keys = [str(r[i]) for r in group if i < len(r) and str(r[i])]
+        if not keys:
+            return
+        shard = next((s for s in self.manifest() if s.title == title), None)
+        row = self._manifest_rows.get(title)
+        if shard is None or row is None or not shard.key_min:  # untracked shard: always scanned
+            return
+        lo, hi = min(keys), max(keys)
+        if shard.key_min != _NO_KEYS and shard.key_min <= lo and hi <= shard.key_max:
+            return
+        ws = self._manifest_ws()
+        current = ((ws.get(f"E{row}:F{row}") or [[]])[0] + ["", ""])[:2]  # another process may have widened it
+        if not current[0]:
+            return
+        if current[0] != _NO_KEYS:
+            lo, hi = min(lo, current[0]), max(hi, current[1])
+        ws.update(f"E{row}:F{row}", [[lo, hi]])
+        with self._lock:
+            self._manifest = None
+
+    def append_rows(self, dataset: str, rows: List[list]):
+        """Append rows (timestamp first) to their monthly shards, one request per shard.
+        Rows that a previous, failed call may have written are checked for first. The
+        router lock covers only the shard bookkeeping, never the append requests."""
+        if self._unconfirmed:
+            landed = self._already_written(dataset, rows)
+            rows = [r for r in rows if self._key(dataset, r) not in landed]
+        with self._lock:
+            groups: Dict[str, List[list]] = {}
+            for r in rows:
+                title = self._writable(dataset, str(r[0]))
+                groups.setdefault(title, []).append(list(r))
+                self._rows[title] = self._row_count(title) + 1  # counted as grouped, so one batch can roll over
+        written: List[tuple] = []
+        for title, group in groups.items():
+            try:
+                self._widen_key_range(dataset, title, group)
+                self.worksheet(title).append_rows(group)
+            except Exception:
+                # a timed-out request may still land: remember where, for the retry
+                with self._lock:
+                    for t, g in written + [(title, group)]:
+                        for r in g:
+                            self._unconfirmed[self._key(dataset, r)] = t
+                    self._rows.pop(title, None)  # recount on the next write
+                raise
+            written.append((title, group))
+            for listener in self.on_append:
+                listener(title, group)
+
+    # ---- reads ----
+    def get_all_values(self, dataset: str, start: Optional[str] = None, end: Optional[str] = None) -> List[List[str]]:
+        """Header + data rows of every shard overlapping [start, end], oldest shard first."""
+        out = [self.headers(dataset)]
+        for shard in self.shards(dataset, start, end):
+            out.extend(self.worksheet(shard).get_all_values()[1:])
+        return out
+
+    def key_shards(self, dataset: str, column: str, key: Optional[str] = None) -> List[Shard]:
+        """Shards of `dataset`, minus those whose key range can't hold `key` (an exact
+        value of the dataset's key column)."""
+        shards = self.shards(dataset)
+        if key is not None and KEY_COLUMNS.get(dataset) == column:
+            shards = [s for s in shards if s.may_hold(key)]
+        return shards
+
+    def find_rows(self, dataset: str, column: str, match: Callable[[str], bool],
+                  key: Optional[str] = None, shards: Optional[List[Shard]] = None) -> List[List[str]]:
+        """Header + rows whose `column` satisfies `match`: one key-column read per shard,
+        full rows fetched only where something matched. `shards` defaults to key_shards()."""
+        headers = self.headers(dataset)
+        last = _col_letter(len(headers) - 1)
+        out = [headers]
+        for shard in (self.key_shards(dataset, column, key) if shards is None else shards):
+            ws = self.worksheet(shard)
+            keys = ws.col_values(headers.index(column) + 1)
+            hits = [i + 1 for i, v in enumerate(keys) if i > 0 and match(v)]
+            if not hits:
+                continue
+            for vr in ws.batch_get([f"A{r}:{last}{r}" for r in hits]):
+                row = vr[0] if vr else []
+                out.append(row + [""] * (len(headers) - len(row)))
+        return out
+
+
+def iter_chunks(router: ShardRouter, dataset: str, start: Optional[str] = None, end: Optional[str] = None,
+                chunk_rows: int = 5000, progress: Optional[Callable[[int, int], None]] = None
+                ) -> Iterator[List[Dict[str, str]]]:
+    """export.iter_sheet_chunks over every shard overlapping [start, end], oldest first."""
+    from export import iter_sheet_chunks
+    shards = router.shards(dataset, start, end)
+    sizes = [count_rows(router.worksheet(s)) for s in shards]
+    total, done = sum(sizes), 0
+    for shard, size in zip(shards, sizes):
+        shard_progress = (lambda d, t, base=done: progress(base + d, total)) if progress else None
+        yield from iter_sheet_chunks(router.worksheet(shard), chunk_rows, shard_progress)
+        done += size
+
+
+_routers: Dict[int, ShardRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(ss=None) -> ShardRouter:
+    """Process-wide router for `ss` (default: the call-log spreadsheet)."""
+    if ss is None:
+        from config import get_sheet
+        ss = get_sheet().spreadsheet
+    with _routers_lock:
+        if id(ss) not in _routers:
+            _routers[id(ss)] = ShardRouter(ss)
+        return _routers[id(ss)]
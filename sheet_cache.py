@@ -0,0 +1,240 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from shards import ShardRouter, get_router
+from google_sheets import CRM_SHEET_NAME
+
+# 🔥 Warm read cache for the worksheets the tabs read: CRM plus the call-log and
+# Summaries shards. Every missing range is fetched in ONE values_batch_get request
+# instead of one get_all_values per worksheet. A background thread warms CRM and the
+# shards of the last SHEET_PREFETCH_MONTHS months when the server starts (and on
+# ↻ Refresh), so tab switches read memory; older shards are fetched (together) the first
+# time a tab needs them. Appends made through the shard router are written into cached
+# snapshots right away; nothing is re-read after a save. Snapshots older than
+# SHEET_CACHE_TTL_S are re-read on access to pick up other processes' writes, and the
+# least recently used ones are dropped once the cache holds more than SHEET_CACHE_MAX_ROWS.
+# Phone lookups never download whole shards: cached ones are filtered in memory, the
+# rest go through ShardRouter.find_rows (phone column + matching rows only).
+SHEET_PREFETCH = os.getenv("SHEET_PREFETCH", "on").lower() != "off"
+SHEET_PREFETCH_MONTHS = int(os.getenv("SHEET_PREFETCH_MONTHS", "3"))
+SHEET_CACHE_TTL_S = float(os.getenv("SHEET_CACHE_TTL_S", "300"))
+SHEET_CACHE_MAX_ROWS = int(os.getenv("SHEET_CACHE_MAX_ROWS", "200000"))
+
+
+def a1_range(title: str, cells: str = "") -> str:
+    """Quoted A1 range for a worksheet ("'Calls 2024-06'" or "'CRM'!A1:H")."""
+    quoted = "'" + title.replace("'", "''") + "'"
+    return f"{quoted}!{cells}" if cells else quoted
+
+
+def _months_back(n: int) -> str:
+    """"YYYY-MM" of the month n-1 months before this one (lower bound of the prefetch window)."""
+    y, m = map(int, time.strftime("%Y-%m").split("-"))
+    m -= max(n, 1) - 1
+    while m < 1:
+        y, m = y - 1, m + 12
+    return f"{y:04d}-{m:02d}"
+
+
+class SheetCache:
+    """Per-worksheet snapshots of get_all_values(), filled by batched multi-range reads."""
+
+    def __init__(self, ss, router: Optional[ShardRouter] = None, ttl_s: float = SHEET_CACHE_TTL_S,
+                 max_rows: int = SHEET_CACHE_MAX_ROWS):
+        self.ss = ss
+        self.router = router or get_router(ss)
+        self.ttl_s = ttl_s
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._values: "OrderedDict[str, List[List[str]]]" = OrderedDict()  # least recently used first
+        self._cached_rows = 0
+        self._loaded: Dict[str, float] = {}
+        self._gen: Dict[str, int] = {}  # bumped by writes so an in-flight fetch can't overwrite them
+        self._warming = False
+        self._rewarm = False
+        self.stats = {"batches": 0, "ranges": 0, "hits": 0, "misses": 0, "warms": 0, "evictions": 0}
+        self.router.on_append.append(self._appended)
+
+    # ---- fetching ----
+    def fetch(self, titles: Iterable[str]) -> Dict[str, List[List[str]]]:
+        """Read `titles` in one batched request and store the snapshots."""
+        titles = list(dict.fromkeys(titles))
+        if not titles:
+            return {}
+        with self._lock:
+            gens = {t: self._gen.get(t, 0) for t in titles}
+        resp = self.ss.values_batch_get([a1_range(t) for t in titles])
+        now = time.time()
+        out = {}
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["ranges"] += len(titles)
+            for title, vr in zip(titles, resp.get("valueRanges", [])):
+                rows = vr.get("values", [])
+                width = max((len(r) for r in rows), default=0)
+                rows = [r + [""] * (width - len(r)) if len(r) < width else r for r in rows]  # like get_all_values
+                out[title] = rows
+                if self._gen.get(title, 0) == gens[title]:
+                    self._store(title, rows)
+                    self._loaded[title] = now
+            self._evict()
+        return out
+
+    def _store(self, title: str, rows: List[List[str]]):
+        """Replace a snapshot and mark it most recently used (caller holds the lock)."""
+        self._cached_rows += len(rows) - len(self._values.get(title, ()))
+        self._values[title] = rows
+        self._values.move_to_end(title)
+
+    def _drop(self, title: str):
+        self._cached_rows -= len(self._values.pop(title, ()))
+        self._loaded.pop(title, None)
+
+    def _evict(self):
+        """Drop least recently used snapshots until the cache is within max_rows (caller holds the lock)."""
+        while self._cached_rows > self.max_rows and self._values:
+            self._drop(next(iter(self._values)))
+            self.stats["evictions"] += 1
+
+    def _fresh(self, title: str) -> bool:
+        return title in self._values and time.time() - self._loaded[title] <= self.ttl_s
+
+    def _get_many(self, titles: List[str]) -> Dict[str, List[List[str]]]:
+        with self._lock:
+            missing = [t for t in titles if not self._fresh(t)]
+            for t in titles:
+                if t in self._values:
+                    self._values.move_to_end(t)
+            self.stats["hits"] += len(titles) - len(missing)
+            self.stats["misses"] += len(missing)
+        fetched = self.fetch(missing)
+        with self._lock:
+            return {t: fetched[t] if t in fetched else self._values.get(t, []) for t in titles}
+
+    # ---- reads (returned rows are shared: treat them as read-only) ----
+    def values(self, title: str) -> List[List[str]]:
+        """get_all_values() of one worksheet, from the cache when fresh."""
+        return self._get_many([title])[title]
+
+    def dataset_values(self, dataset: str, start: Optional[str] = None, end: Optional[str] = None) -> List[List[str]]:
+        """Header + rows of every shard overlapping [start, end] (ShardRouter.get_all_values, cached)."""
+        titles = [s.title for s in self.router.shards(dataset, start, end)]
+        snapshots = self._get_many(titles)
+        out = [self.router.headers(dataset)]
+        for t in titles:
+            out.extend(snapshots[t][1:])
+        return out
+
+    def find_rows(self, dataset: str, column: str, match: Callable[[str], bool],
+                  key: Optional[str] = None) -> List[List[str]]:
+        """Header + rows whose `column` satisfies `match`, oldest shard first. Fresh cached
+        shards are filtered in memory; the others go through ShardRouter.find_rows, which
+        reads only their key column and the matching rows (and caches nothing)."""
+        headers = self.router.headers(dataset)
+        i = headers.index(column)
+        out = [headers]
+        for shard in self.router.key_shards(dataset, column, key):
+            with self._lock:
+                rows = self._values.get(shard.title) if self._fresh(shard.title) else None
+                self.stats["hits" if rows is not None else "misses"] += 1
+            if rows is None:
+                out.extend(self.router.find_rows(dataset, column, match, shards=[shard])[1:])
+            else:
+                out.extend(r for r in rows[1:] if i < len(r) and match(r[i]))
+        return out
+
+    # ---- writes / invalidation ----
+    def _appended(self, title: str, rows: List[list]):
+        """Router write hook: append to the cached snapshot (copy-on-write), if there is one."""
+        with self._lock:
+            self._gen[title] = self._gen.get(title, 0) + 1
+            if title in self._values:
+                self._store(title, self._values[title] + [[str(v) for v in r] for r in rows])
+                self._evict()
+
+    def invalidate(self, title: Optional[str] = None):
+        with self._lock:
+            for t in ([title] if title else list(self._values)):
+                self._drop(t)
+                self._gen[t] = self._gen.get(t, 0) + 1
+
+    def refresh(self):
+        """Drop everything (manifest included) and re-warm in the background."""
+        self.router.refresh()
+        self.invalidate()
+        self.warm_async()
+
+    # ---- prefetch ----
+    def warm_titles(self) -> List[str]:
+        """CRM (if it exists) and the recent call-log / Summaries shards."""
+        existing = {ws.title for ws in self.ss.worksheets()}
+        since = _months_back(SHEET_PREFETCH_MONTHS)
+        titles = [CRM_SHEET_NAME] if CRM_SHEET_NAME in existing else []
+        for dataset in ("calls", "summaries"):
+            titles += [s.title for s in self.router.shards(dataset, since) if s.title in existing]
+        return titles
+
+    def warm(self) -> int:
+        """Re-read every prefetch range in one batched request → number of ranges."""
+        titles = self.warm_titles()
+        self.fetch(titles)
+        with self._lock:
+            self.stats["warms"] += 1
+        return len(titles)
+
+    def warm_async(self):
+        """Warm on a daemon thread; calls while one is running coalesce into one more pass."""
+        if not SHEET_PREFETCH:
+            return
+        with self._lock:
+            if self._warming:
+                self._rewarm = True
+                return
+            self._warming = True
+        threading.Thread(target=self._warm_loop, name="sheet-prefetch", daemon=True).start()
+
+    def _warm_loop(self):
+        while True:
+            try:
+                self.warm()
+            except Exception as e:
+                print(f"⚠️ sheet prefetch: {e}")
+            with self._lock:
+                if not self._rewarm:
+                    self._warming = False
+                    return
+                self._rewarm = False
+
+
+_cache: Optional[SheetCache] = None
+_cache_lock = threading.Lock()
+_prefetch_started = False
+
+
+def get_sheet_cache() -> SheetCache:
+    """Process-wide cache for the call-log spreadsheet."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from config import get_sheet
+            _cache = SheetCache(get_sheet().spreadsheet)
+        return _cache
+
+
+def start_prefetch():
+    """Connect and warm the cache on a background thread, once per process (server start)."""
+    global _prefetch_started
+    with _cache_lock:
+        if _prefetch_started or not SHEET_PREFETCH:
+            return
+        _prefetch_started = True
+
+    def _run():
+        try:
+            get_sheet_cache().warm_async()
+        except Exception as e:
+            print(f"⚠️ sheet prefetch: {e}")
+    threading.Thread(target=_run, name="sheet-prefetch-start", daemon=True).start()
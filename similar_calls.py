@@ -0,0 +1,283 @@
+import os
+import zlib
+import json
+import sqlite3
+import threading
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+from search_index import tokenize
+
+# 🧭 "Similar past calls": local vector index, no network.
+#   embed()          → hashed unigram + bigram features (signed feature hashing), log tf, L2-normalised
+#   vectors.f16      → append-only float16 matrix, one row per call (row number = item id)
+#   lists.i32        → IVF list (nearest centroid) per row, -1 while the index is untrained
+#   centroids.npy    → spherical k-means centroids over a sample of the rows
+#   meta.sqlite      → id → timestamp, phone, summary, action items, sentiment, products
+# Queries score the centroids, scan only the SIMILAR_NPROBE closest lists plus the rows
+# added since the lists were last loaded, and rank those candidates by cosine similarity.
+# Until SIMILAR_TRAIN_MIN calls exist every query is an exact scan. The centroids are
+# retrained when the corpus has grown SIMILAR_RETRAIN_GROWTH× since the last training, on a
+# background thread (one at a time); searches keep using the old lists until it swaps in.
+SIMILAR_INDEX_DIR = os.getenv("SIMILAR_INDEX_DIR", "similar_index")
+SIMILAR_DIM = int(os.getenv("SIMILAR_DIM", "256"))
+SIMILAR_NPROBE = int(os.getenv("SIMILAR_NPROBE", "8"))
+SIMILAR_TRAIN_MIN = int(os.getenv("SIMILAR_TRAIN_MIN", "5000"))
+SIMILAR_RETRAIN_GROWTH = 4.0
+_PENDING_MAX = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    action_items TEXT NOT NULL,
+    sentiment TEXT NOT NULL,
+    products TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (k TEXT PRIMARY KEY, v TEXT NOT NULL);
+"""
+
+
+def embed(text: str, dim: int = SIMILAR_DIM) -> np.ndarray:
+    """Fixed-size float32 unit vector for `text` (zeros if it has no terms)."""
+    toks = tokenize(text)
+    feats = Counter(toks + [a + " " + b for a, b in zip(toks, toks[1:])])
+    v = np.zeros(dim, np.float32)
+    for f, c in feats.items():
+        h = zlib.crc32(f.encode())
+        v[h % dim] += (1.0 + np.log(c)) * (1.0 if h >> 31 else -1.0)
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (cosine) → (k, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    cents = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, cents)
+        sums = np.zeros_like(cents)
+        np.add.at(sums, assign, x)
+        empty = ~sums.any(axis=1)
+        sums[empty] = x[rng.choice(len(x), int(empty.sum()))]  # re-seed empty clusters
+        cents = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-9)
+    return cents.astype(np.float32)
+
+
+def _nearest(x: np.ndarray, cents: np.ndarray, block: int = 16384) -> np.ndarray:
+    out = np.empty(len(x), np.int32)
+    for i in range(0, len(x), block):
+        out[i:i + block] = (np.asarray(x[i:i + block], np.float32) @ cents.T).argmax(axis=1)
+    return out
+
+
+class SimilarCalls:
+    """Append-only IVF index of call embeddings with SQLite metadata."""
+
+    def __init__(self, root: str = SIMILAR_INDEX_DIR, dim: int = SIMILAR_DIM):
+        self.root, self.dim = root, dim
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._train_lock = threading.Lock()  # single flight: one training at a time
+        self._db = sqlite3.connect(os.path.join(root, "meta.sqlite"), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._vec_path = os.path.join(root, "vectors.f16")
+        self._list_path = os.path.join(root, "lists.i32")
+        self._cent_path = os.path.join(root, "centroids.npy")
+        self._load()
+
+    # ---- storage ----
+    def _load(self):
+        """(Re)map the vector file and rebuild the in-memory IVF lists."""
+        n = os.path.getsize(self._vec_path) // (2 * self.dim) if os.path.exists(self._vec_path) else 0
+        self._vecs = np.memmap(self._vec_path, np.float16, "r", shape=(n, self.dim)) if n else np.zeros((0, self.dim), np.float16)
+        lists = np.fromfile(self._list_path, np.int32) if os.path.exists(self._list_path) else np.zeros(0, np.int32)
+        self._centroids = np.load(self._cent_path) if os.path.exists(self._cent_path) else None
+        self._n = n
+        self._pending: List[np.ndarray] = []  # rows appended since _load (scanned exactly)
+        if self._centroids is None or len(lists) != n:
+            self._order = self._offsets = None
+            return
+        self._order = np.argsort(lists, kind="stable").astype(np.int64)
+        self._offsets = np.searchsorted(lists[self._order], np.arange(len(self._centroids) + 1))
+
+    def __len__(self) -> int:
+        return self._n + len(self._pending)
+
+    def _state(self, k: str, default: str = "") -> str:
+        row = self._db.execute("SELECT v FROM state WHERE k=?", (k,)).fetchone()
+        return row[0] if row else default
+
+    # ---- writes ----
+    def add(self, timestamp: str, phone: str, text: str, summary: str = "", action_items: str = "",
+            sentiment: str = "", products: str = "") -> bool:
+        """Embed and append one call (no-op if timestamp+phone is already indexed)."""
+        vec = embed(text or f"{summary} {action_items}", self.dim)
+        if not vec.any():
+            return False
+        key = f"{timestamp}:{phone}"
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM items WHERE key=?", (key,)).fetchone():
+                return False
+            item_id = len(self)
+            self._db.execute("INSERT INTO items VALUES (?,?,?,?,?,?,?,?)",
+                             (item_id, key, timestamp, phone or "", summary or "", action_items or "",
+                              sentiment or "", products or ""))
+            with open(self._vec_path, "ab") as f:
+                f.write(vec.astype(np.float16).tobytes())
+            lst = int((vec @ self._centroids.T).argmax()) if self._centroids is not None else -1
+            with open(self._list_path, "ab") as f:
+                f.write(np.int32(lst).tobytes())
+            self._db.commit()
+            self._pending.append(vec.astype(np.float16))
+            if len(self._pending) >= _PENDING_MAX and self._centroids is not None:
+                self._load()  # new rows already carry their list ids; fold them into the IVF lists
+            trained = int(self._state("trained_on", "0"))
+            retrain = len(self) >= SIMILAR_TRAIN_MIN and len(self) >= trained * SIMILAR_RETRAIN_GROWTH
+        if retrain:
+            self.train_async()
+        return True
+
+    def train(self, sample: int = 50_000):
+        """Fit the centroids on a sample and reassign every row (seconds at 1M rows)."""
+        with self._train_lock:
+            self._train(sample)
+
+    def train_async(self, sample: int = 50_000) -> bool:
+        """train() on a background thread; False if a training is already running."""
+        if not self._train_lock.acquire(blocking=False):
+            return False
+        def run():
+            try:
+                self._train(sample)
+            except Exception as e:
+                print(f"⚠️ similar-calls training: {e}")
+            finally:
+                self._train_lock.release()
+        threading.Thread(target=run, name="similar-train", daemon=True).start()
+        return True
+
+    def _train(self, sample: int):
+        # the heavy part runs on a snapshot of the first n rows without the index lock
+        with self._lock:
+            n = len(self)
+        if n < 2:
+            return
+        vecs = np.memmap(self._vec_path, np.float16, "r", shape=(n, self.dim))
+        k = int(np.clip(np.sqrt(n), 1, 4096))
+        rng = np.random.default_rng(0)
+        idx = np.sort(rng.choice(n, min(sample, n), replace=False))
+        cents = _kmeans(np.asarray(vecs[idx], np.float32), k)
+        lists = _nearest(vecs, cents)
+        with self._lock:
+            total = len(self)
+            if total > n:  # rows added meanwhile were filed under the old centroids
+                tail = np.memmap(self._vec_path, np.float16, "r", shape=(total, self.dim))[n:]
+                lists = np.concatenate([lists, _nearest(tail, cents)])
+            lists.tofile(self._list_path + ".tmp")
+            with open(self._cent_path + ".tmp", "wb") as f:
+                np.save(f, cents)
+            os.replace(self._list_path + ".tmp", self._list_path)
+            os.replace(self._cent_path + ".tmp", self._cent_path)
+            self._db.execute("INSERT OR REPLACE INTO state VALUES ('trained_on', ?)", (str(total),))
+            self._db.commit()
+            self._load()
+
+    # ---- queries ----
+    def search(self, text: str, k: int = 5, exclude_phone: str = "", nprobe: int = SIMILAR_NPROBE) -> List[dict]:
+        """Top-k most similar past calls: [{'timestamp','phone','summary','action_items','sentiment','products','score'}]."""
+        q = embed(text, self.dim)
+        if not q.any():
+            return []
+        with self._lock:
+            cand_ids, cand_vecs = [], []
+            if self._n:
+                if self._order is None:
+                    ids = np.arange(self._n)
+                else:
+                    probe = np.argsort(-(self._centroids @ q))[:nprobe]
+                    ids = np.sort(np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in probe]))
+                cand_ids.append(ids)
+                cand_vecs.append(self._vecs[ids] if len(ids) < self._n else self._vecs)
+            if self._pending:
+                cand_ids.append(np.arange(self._n, self._n + len(self._pending)))
+                cand_vecs.append(np.stack(self._pending))
+            if not cand_ids:
+                return []
+            ids = np.concatenate(cand_ids)
+            scores = np.concatenate([np.asarray(v, np.float32) @ q for v in cand_vecs])
+            top = np.argsort(-scores)[:max(k * 4, k + 8)]  # spare rows for the phone filter
+            out = []
+            for i in top:
+                row = self._db.execute("SELECT timestamp, phone, summary, action_items, sentiment, products "
+                                       "FROM items WHERE id=?", (int(ids[i]),)).fetchone()
+                if scores[i] <= 0:
+                    break
+                if row is None or (exclude_phone and row[1] == exclude_phone):
+                    continue
+                out.append(dict(zip(("timestamp", "phone", "summary", "action_items", "sentiment", "products"), row),
+                                score=float(scores[i])))
+                if len(out) >= k:
+                    break
+            return out
+
+
+_index: Optional[SimilarCalls] = None
+_index_lock = threading.Lock()
+
+
+def get_similar_calls() -> SimilarCalls:
+    """Process-wide index at SIMILAR_INDEX_DIR."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarCalls()
+        return _index
+
+
+def index_call(timestamp: str, phone: str, transcript: str, summary: str, action_items: str,
+               sentiment: str, products: str):
+    """Save-path hook: indexing problems are reported, never raised into the save."""
+    try:
+        get_similar_calls().add(timestamp, phone, f"{transcript}\n{summary}\n{action_items}",
+                                summary, action_items, sentiment, products)
+    except Exception as e:
+        print(f"⚠️ similar-calls index: {e}")
+
+
+def rebuild_from_sheets(index: Optional[SimilarCalls] = None, progress=None) -> int:
+    """Backfill from the Summaries shards (summary + action items; transcripts aren't linked there)."""
+    from shards import get_router, iter_chunks
+    index = index or get_similar_calls()
+    added = 0
+    for chunk in iter_chunks(get_router(), "summaries", progress=progress):
+        for r in chunk:
+            added += index.add(r.get("Timestamp", ""), r.get("CustomerPhone", ""), "",
+                               r.get("Summary", ""), r.get("ActionItems", ""),
+                               r.get("Sentiment", ""), r.get("RecommendedProducts", ""))
+    index.train()
+    return added
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    ap = argparse.ArgumentParser(description="Find past calls similar to a text")
+    ap.add_argument("text", nargs="?")
+    ap.add_argument("--rebuild", action="store_true", help="backfill from the Summaries sheet")
+    ap.add_argument("-k", type=int, default=5)
+    args = ap.parse_args()
+    if args.rebuild:
+        n = rebuild_from_sheets(progress=lambda d, t: print(f" {d:,}/{t:,}", end="\r"))
+        print(f"\n✅ {n:,} calls added → {SIMILAR_INDEX_DIR}")
+    if args.text:
+        t0 = time.perf_counter()
+        hits = get_similar_calls().search(args.text, args.k)
+        print(f"🧭 {len(hits)} similar call(s) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for h in hits:
+            print(json.dumps(h, ensure_ascii=False))
@@ -1,37 +1,190 @@
-import sounddevice as sd
 import numpy as np
 import time
-from typing import List, Tuple, Optional
+from typing import Callable, List, Tuple, Optional
 from config import SAMPLE_RATE, CHANNELS, SILENCE_LIMIT
+from audio_buffer import AudioBuffer
 
-def calibrate_silence() -> float:
+def _sd():
+    """Import sounddevice on first use (PortAudio init is slow and needs a device)."""
+    import sounddevice as sd
+    return sd
+
+
+def _default_reader() -> Callable[[int], np.ndarray]:
+    """Blocking one-shot capture of n frames via sd.rec (the original behaviour)."""
+    sd = _sd()
+    def read(n: int) -> np.ndarray:
+        chunk = sd.rec(n, samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='float32')
+        sd.wait()
+        return chunk
+    return read
+
+
+def open_input_stream():
+    """A long-lived input stream; pass stream_reader(stream) as read_chunk to reuse it across calls."""
+    sd = _sd()
+    return sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='float32')
+
+
+def stream_reader(stream) -> Callable[[int], np.ndarray]:
+    def read(n: int) -> np.ndarray:
+        data, _overflowed = stream.read(n)
+        return data
+    return read
+
+
+def chunk_volume(chunk: np.ndarray) -> float:
+    """Loudness used for silence detection (L2 norm per frame)."""
+    return float(np.linalg.norm(chunk) / max(len(chunk), 1))
+
+
+def channel_volumes(chunk: np.ndarray) -> np.ndarray:
+    """Per-channel loudness of an (N, C) chunk in one vectorized pass → shape (C,)."""
+    chunk = chunk.reshape(len(chunk), -1)
+    return np.linalg.norm(chunk, axis=0) / max(len(chunk), 1)
+
+
+def split_channels(x: np.ndarray) -> List[np.ndarray]:
+    """De-interleave (N, C) audio into C strided views (no copies)."""
+    x = np.asarray(x)
+    if x.ndim == 1:
+        return [x]
+    return [x[:, i] for i in range(x.shape[1])]
+
+
+def wait_for_voice(
+    SILENCE_THRESHOLD,
+    read_chunk: Callable[[int], np.ndarray],
+    stop_event: Optional[object] = None,
+) -> Optional[np.ndarray]:
+    """
+    Read 1-second chunks until one is above the threshold; returns it (None if stopped).
+    With per-channel thresholds (calibrate_channels) any one loud channel opens the call.
+    """
+    while not (stop_event is not None and getattr(stop_event, "is_set", lambda: False)()):
+        chunk = read_chunk(int(SAMPLE_RATE))
+        if (channel_volumes(chunk) >= SILENCE_THRESHOLD).any():
+            return chunk
+    return None
+
+
+def calibrate_silence(read_chunk: Optional[Callable[[int], np.ndarray]] = None) -> float:
     """
     Record 3s of ambient audio and return a threshold slightly above baseline.
     """
     print("\n Calibrating... stay quiet for 3s...")
-    calib = sd.rec(int(3 * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='float32')
-    sd.wait()
-    baseline = np.linalg.norm(calib) / max(len(calib), 1)
+    read_chunk = read_chunk or _default_reader()
+    calib = read_chunk(int(3 * SAMPLE_RATE))
+    baseline = chunk_volume(calib)
 
     threshold = max(baseline * 1.2, 0.00005)
     print(f" Calibration done. Baseline={baseline:.6f}, Threshold={threshold:.6f}")
     return threshold
 
 
+def calibrate_channels(read_chunk: Optional[Callable[[int], np.ndarray]] = None) -> np.ndarray:
+    """Per-channel version of calibrate_silence → thresholds of shape (CHANNELS,)."""
+    print("\n Calibrating... stay quiet for 3s...")
+    read_chunk = read_chunk or _default_reader()
+    baseline = channel_volumes(read_chunk(int(3 * SAMPLE_RATE)))
+    thresholds = np.maximum(baseline * 1.2, 0.00005)
+    print(f" Calibration done. Thresholds={np.array2string(thresholds, precision=6)}")
+    return thresholds
+
+
+def record_channels_until_silence(
+    thresholds: np.ndarray,
+    stop_event: Optional[object] = None,
+    max_duration_s: int = 3600,
+    read_chunk: Optional[Callable[[int], np.ndarray]] = None,
+    first_chunk: Optional[np.ndarray] = None,
+    on_chunk: Optional[Callable[[np.ndarray], None]] = None,
+) -> Tuple[AudioBuffer, List[str], str]:
+    """
+    Multi-channel record_until_silence: silence is tracked per channel and the
+    capture ends once *every* channel has been silent for SILENCE_LIMIT seconds
+    (or on Stop / time cap).
+
+    Returns (AudioBuffer of (N, C) chunks, per_channel_stop_reasons, stop_reason). A channel
+    that never rose above its threshold gets "Silent >Ns" so analysis skips it.
+    """
+    read_chunk = read_chunk or _default_reader()
+    thresholds = np.asarray(thresholds, dtype=np.float32).reshape(-1)
+    recorded_audio = AudioBuffer()
+    if first_chunk is not None:
+        recorded_audio.append(first_chunk)
+    silence = np.zeros(thresholds.size, dtype=np.int32)
+    voiced = np.zeros(thresholds.size, dtype=bool)
+    if first_chunk is not None:
+        voiced |= channel_volumes(first_chunk) >= thresholds
+    start_time = time.time()
+    stop_reason = "User kept talking"
+
+    try:
+        while True:
+            if (time.time() - start_time) > max_duration_s:
+                stop_reason = "Time Limit Exceeded"
+                break
+
+            chunk = read_chunk(int(SAMPLE_RATE))
+            recorded_audio.append(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
+
+            vols = channel_volumes(chunk)
+            loud = vols >= thresholds
+            voiced |= loud
+            silence = np.where(loud, 0, silence + 1)
+            elapsed = int(time.time() - start_time)
+            print(f" {elapsed:02d}s | Volume={np.array2string(vols, precision=6)}", end="\r")
+
+            if stop_event is not None and getattr(stop_event, "is_set", lambda: False)():
+                stop_reason = "User Stopped"
+                break
+            if (silence >= SILENCE_LIMIT).all():
+                stop_reason = f"Silent >{SILENCE_LIMIT}s"
+                break
+    except KeyboardInterrupt:
+        stop_reason = "Stopped by user"
+
+    print(f"\n Recording stopped: {stop_reason}")
+    if len(recorded_audio) == 0:
+        recorded_audio.append(read_chunk(int(0.5 * SAMPLE_RATE)))
+
+    if stop_reason.lower().startswith("silent") and voiced.any():
+        # somebody spoke, so the shared silence means the call ended, not "no speech"
+        stop_reason = f"Call ended (silence >{SILENCE_LIMIT}s)"
+    reasons = [stop_reason if v else f"Silent >{SILENCE_LIMIT}s" for v in voiced]
+    return recorded_audio, reasons, stop_reason
+
+
 def record_until_silence(
     SILENCE_THRESHOLD: float,
     stop_event: Optional[object] = None,
     max_duration_s: int = 3600,
-) -> Tuple[List[np.ndarray], str]:
+    read_chunk: Optional[Callable[[int], np.ndarray]] = None,
+    first_chunk: Optional[np.ndarray] = None,
+    on_chunk: Optional[Callable[[np.ndarray], None]] = None,
+) -> Tuple[AudioBuffer, str]:
     """
     Record 1-second chunks until either:
       - continuous silence for SILENCE_LIMIT seconds, OR
       - stop_event is set from the UI, OR
       - max_duration_s is exceeded.
 
-    Returns (list_of_chunks, stop_reason).
+    read_chunk(n) supplies n frames (defaults to sd.rec); first_chunk is an
+    already-captured chunk that opens the call (e.g. from wait_for_voice).
+    on_chunk(chunk) is called for every captured chunk (e.g. LiveSentiment.feed).
+
+    Chunks go into an AudioBuffer, which spills to a memory-mapped file once the
+    recording passes the configured memory budget; call .array() for the audio.
+
+    Returns (AudioBuffer, stop_reason).
     """
-    recorded_audio: List[np.ndarray] = []
+    read_chunk = read_chunk or _default_reader()
+    recorded_audio = AudioBuffer()
+    if first_chunk is not None:
+        recorded_audio.append(first_chunk)
     silence_counter = 0
     start_time = time.time()
     stop_reason = "User kept talking"
@@ -44,12 +197,13 @@ def record_until_silence(
                 break
 
             # always capture a chunk first so we never return empty on quick Stop
-            chunk = sd.rec(int(SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='float32')
-            sd.wait()
+            chunk = read_chunk(int(SAMPLE_RATE))
             recorded_audio.append(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
 
             elapsed = int(time.time() - start_time)
-            volume = np.linalg.norm(chunk) / max(len(chunk), 1)
+            volume = chunk_volume(chunk)
             print(f" {elapsed:02d}s | Volume={volume:.6f}", end="\r")
 
             # if user pressed Stop, exit *after* we captured this chunk
@@ -73,8 +227,7 @@ def record_until_silence(
 
     # safety: if nothing captured (very fast stop), grab a tiny 0.5s chunk
     if len(recorded_audio) == 0:
-        tiny = sd.rec(int(0.5 * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='float32')
-        sd.wait()
+        tiny = read_chunk(int(0.5 * SAMPLE_RATE))
         if tiny is not None and len(tiny) > 0:
             recorded_audio.append(tiny)
 
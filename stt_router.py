@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from config import SAMPLE_RATE
+from jobs import DeadlineExceeded
+
+# 🧭 STT model routing: the fast model for short, clean clips, the large one for long,
+# noisy or mostly-silent ones (where turbo is likelier to drop words or hallucinate).
+# The decision uses the clip's duration, VAD speech ratio and SNR, measured on the int16
+# PCM in 30 ms frames (block by block, so long memory-mapped calls aren't copied). A fast
+# transcript that comes back empty (or a fast request that errors) is retried once on
+# the large model. Every attempt is timed per model in memory and appended to
+# STT_STATS_PATH; `python stt_router.py` summarises the log by model and clip bucket so
+# the thresholds can be tuned (`--check` routes a few synthetic clips as a sanity check).
+# STT_ROUTING=off always uses STT_ACCURATE_MODEL.
+STT_ROUTING = os.getenv("STT_ROUTING", "on").lower() != "off"
+STT_FAST_MODEL = os.getenv("STT_FAST_MODEL", "whisper-large-v3-turbo")
+STT_ACCURATE_MODEL = os.getenv("STT_ACCURATE_MODEL", "whisper-large-v3")
+STT_FAST_MAX_S = float(os.getenv("STT_FAST_MAX_S", "300"))            # longer clips → accurate model
+STT_FAST_MIN_SNR_DB = float(os.getenv("STT_FAST_MIN_SNR_DB", "15"))   # noisier clips → accurate model
+STT_FAST_MIN_SPEECH = float(os.getenv("STT_FAST_MIN_SPEECH", "0.2"))  # sparser speech → accurate model
+STT_STATS_PATH = os.getenv("STT_STATS_PATH", "stt_routing.jsonl")
+
+_FRAME = int(0.03 * SAMPLE_RATE)
+_BLOCK_FRAMES = 1 << 20
+_SPEECH_OVER_FLOOR_DB = 10.0  # a frame is speech if this far above the noise floor…
+_SPEECH_MIN_DBFS = -55.0      # …and above this absolute level
+_NOISE_REF_DBFS = -60.0       # quiet-room level: the floor never sits above it unless the quietest frames do
+
+
+@dataclass(frozen=True)
+class ClipStats:
+    duration_s: float
+    speech_ratio: float  # share of 30 ms frames that look like speech
+    snr_db: float        # median speech frame level over the noise floor
+
+
+@dataclass(frozen=True)
+class Route:
+    model: str
+    reason: str
+    stats: ClipStats
+    fallback: Optional[str] = None  # model to retry on when `model` returns nothing
+
+
+def clip_stats(pcm: np.ndarray) -> ClipStats:
+    """Duration, speech ratio and SNR of mono int16 PCM."""
+    levels = []
+    for i in range(0, len(pcm), _BLOCK_FRAMES):
+        blk = np.asarray(pcm[i:i + _BLOCK_FRAMES], np.float32) / 32768.0
+        n = len(blk) // _FRAME
+        if n:
+            power = np.square(blk[:n * _FRAME]).reshape(n, _FRAME).mean(axis=1)
+            levels.append(10.0 * np.log10(power + 1e-10))
+    duration = len(pcm) / SAMPLE_RATE
+    if not levels:
+        return ClipStats(round(duration, 2), 0.0, 0.0)
+    db = np.concatenate(levels)
+    # 10th percentile, bounded by an absolute reference: in speech-dense clips the 10th
+    # percentile is quiet speech, not noise. A genuinely noisy room still raises the floor
+    # through the 1st percentile (the gaps between words).
+    p1, p10 = np.percentile(db, [1, 10])
+    floor = float(min(p10, max(p1, _NOISE_REF_DBFS)))
+    speech = db > max(floor + _SPEECH_OVER_FLOOR_DB, _SPEECH_MIN_DBFS)
+    snr = float(np.median(db[speech]) - floor) if speech.any() else 0.0
+    return ClipStats(round(duration, 2), round(float(speech.mean()), 3), round(snr, 1))
+
+
+def choose_model(stats: ClipStats) -> Route:
+    """Fast model for short, clean, speech-dense clips; the accurate model otherwise."""
+    if not STT_ROUTING or STT_FAST_MODEL == STT_ACCURATE_MODEL:
+        return Route(STT_ACCURATE_MODEL, "routing off", stats)
+    if stats.duration_s > STT_FAST_MAX_S:
+        return Route(STT_ACCURATE_MODEL, f"long (>{STT_FAST_MAX_S:.0f}s)", stats)
+    if stats.snr_db < STT_FAST_MIN_SNR_DB:
+        return Route(STT_ACCURATE_MODEL, f"noisy (SNR<{STT_FAST_MIN_SNR_DB:.0f}dB)", stats)
+    if stats.speech_ratio < STT_FAST_MIN_SPEECH:
+        return Route(STT_ACCURATE_MODEL, f"sparse speech (<{STT_FAST_MIN_SPEECH:.0%})", stats)
+    return Route(STT_FAST_MODEL, "short and clean", stats, fallback=STT_ACCURATE_MODEL)
+
+
+class STTStats:
+    """Per-model request counts and recent latencies (plus an append-only JSONL log)."""
+
+    def __init__(self, path: str = STT_STATS_PATH, window: int = 1000):
+        self.path = path
+        self._lock = threading.Lock()
+        self._latency: Dict[str, deque] = {}
+        self._window = window
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, route: Route, latency_s: float, outcome: str):
+        """outcome: "ok", "empty" (fell back) or "error"."""
+        with self._lock:
+            c = self.counts.setdefault(model, {"requests": 0, "ok": 0, "empty": 0, "error": 0, "audio_s": 0})
+            c["requests"] += 1
+            c[outcome] += 1
+            c["audio_s"] += route.stats.duration_s
+            self._latency.setdefault(model, deque(maxlen=self._window)).append((latency_s, route.stats.duration_s))
+            if self.path:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"ts": time.strftime("%Y-%m-%d %H:%M:%S"), "model": model,
+                                            "routed_to": route.model, "reason": route.reason,
+                                            "latency_s": round(latency_s, 3), "outcome": outcome,
+                                            **asdict(route.stats)}) + "\n")
+                except OSError as e:
+                    print(f"⚠️ STT stats log: {e}")
+
+    def summary(self) -> Dict[str, dict]:
+        """{model: {requests, ok, empty, error, p50_s, p95_s, rtf}} over the recent window."""
+        out = {}
+        with self._lock:
+            for model, c in self.counts.items():
+                lat = np.array([l for l, _ in self._latency[model]])
+                audio = sum(d for _, d in self._latency[model])
+                out[model] = {**{k: v for k, v in c.items() if k != "audio_s"},
+                              "p50_s": round(float(np.percentile(lat, 50)), 3),
+                              "p95_s": round(float(np.percentile(lat, 95)), 3),
+                              "rtf": round(float(lat.sum()) / audio, 4) if audio else None}
+        return out
+
+
+_stats = STTStats()
+
+
+def get_stt_stats() -> STTStats:
+    return _stats
+
+
+def transcribe(pcm: np.ndarray, request: Callable[[str], object], is_empty: Callable[[str], bool]):
+    """
+    Route `pcm` and run request(model) → transcription; falls back to the accurate model
+    when the fast one returns empty text or fails. Returns (transcription, model used).
+    A missed deadline is not retried: there is no budget left for a second request.
+    """
+    route = choose_model(clip_stats(pcm))
+    model = route.model
+    while True:
+        t0 = time.perf_counter()
+        try:
+            result = request(model)
+        except DeadlineExceeded:
+            _stats.record(model, route, time.perf_counter() - t0, "error")
+            raise
+        except Exception:
+            _stats.record(model, route, time.perf_counter() - t0, "error")
+            if model == route.fallback or not route.fallback:
+                raise
+            model = route.fallback
+            continue
+        empty = is_empty((getattr(result, "text", "") or "").strip())
+        retry = empty and route.fallback and model != route.fallback
+        _stats.record(model, route, time.perf_counter() - t0, "empty" if retry else "ok")
+        if not retry:
+            return result, model
+        model = route.fallback
+
+
+def _synthetic_clip(seconds: float, noise: float, gaps: bool = True, seed: int = 0) -> np.ndarray:
+    """Syllable-modulated noise with an 80 ms pause every second, plus steady background noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    x = rng.standard_normal(len(t)) * 0.1 * (0.3 + 0.7 * np.sin(2 * np.pi * 4 * t) ** 2)
+    if gaps:
+        for a in np.arange(1.0, seconds, 1.0):
+            x[int(a * SAMPLE_RATE):int((a + 0.08) * SAMPLE_RATE)] = 0.0
+    x += rng.standard_normal(len(t)) * noise
+    return (np.clip(x, -1, 1) * 32767).astype(np.int16)
+
+
+def _check():
+    """Route synthetic clips and assert the expected model for each."""
+    quiet = np.zeros(10 * SAMPLE_RATE, np.int16)
+    quiet[:SAMPLE_RATE] = _synthetic_clip(1, 3e-4, gaps=False)
+    cases = [("dense clean speech", _synthetic_clip(10, 3e-4), STT_FAST_MODEL),
+             ("dense speech in a noisy room", _synthetic_clip(10, 0.02), STT_ACCURATE_MODEL),
+             ("mostly silence", quiet, STT_ACCURATE_MODEL)]
+    for name, pcm, expected in cases:
+        route = choose_model(clip_stats(pcm))
+        print(f"{'✅' if route.model == expected else '❌'} {name}: {route.model} ({route.reason}) {route.stats}")
+        assert route.model == expected, name
+
+
+def _bucket(r: dict) -> str:
+    d = r["duration_s"]
+    return ("<30s" if d < 30 else "<5m" if d < 300 else "≥5m") + (" clean" if r["snr_db"] >= STT_FAST_MIN_SNR_DB else " noisy")
+
+
+if __name__ == "__main__":
+    import sys
+    import pandas as pd
+    if sys.argv[1:] == ["--check"]:
+        _check()
+        sys.exit(0)
+    path = sys.argv[1] if len(sys.argv) > 1 else STT_STATS_PATH
+    try:
+        with open(path, encoding="utf-8") as f:
+            df = pd.DataFrame([json.loads(line) for line in f if line.strip()])
+    except FileNotFoundError:
+        print(f"No STT routing log at {path}")
+        sys.exit(1)
+    df["bucket"] = df.apply(_bucket, axis=1)
+    df["rtf"] = df["latency_s"] / df["duration_s"].clip(lower=0.1)
+    g = df.groupby(["model", "bucket"])
+    table = g["latency_s"].agg(requests="count", p50_s="median", p95_s=lambda v: v.quantile(0.95))
+    table["rtf_p50"] = g["rtf"].median()
+    table["empty_rate"] = g["outcome"].apply(lambda v: (v == "empty").mean())
+    table["error_rate"] = g["outcome"].apply(lambda v: (v == "error").mean())
+    pd.set_option("display.width", 200)
+    print(f"🧭 {len(df)} STT requests from {path}\n")
+    print(table.round(3).to_string(), "\n")
+    print(df.groupby("reason")["model"].value_counts().to_string())